@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark of the request/response models against the previous dict-backed classes.
+Measures decoding a request payload, validating it and encoding a response with logs and a body attached.
+"""
+
+import argparse
+import json
+import sys
+import timeit
+from datetime import datetime, timezone
+from json import JSONEncoder
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from selenium_worker.models import encode, decode
+from selenium_worker.Requests.MontgomeryCountyAirParkTaskRQ import MontgomeryCountyAirParkTaskRQ, parse_event_time
+from selenium_worker.Responses.MontgomeryCountyAirParkTaskRS import MontgomeryCountyAirParkTaskRS
+
+REQUIRED_FIELDS = ['Type', 'ComplaintUuid', 'ComplaintType', 'AirportIdent', 'TimeZone', 'Title', 'FirstName',
+                   'LastName', 'Email', 'Phone', 'Street', 'City', 'State', 'Zip', 'EventTime', 'AirnoiseCategory',
+                   'Registration', 'AircraftType', 'AircraftModel', 'Operator', 'Callsign', 'OperationType',
+                   'Altitude', 'Airspeed', 'DirectionOfFlight', 'CallbackUrl']
+
+PAYLOAD = {
+    'Type': 'KGAI', 'Id': 1234, 'ComplaintUuid': '5b0c2f5e-2f7a-4d0e-9a57-3c1f5d8e9a10', 'ComplaintType': 'noise',
+    'AirportIdent': 'KGAI', 'TimeZone': 'America/New_York', 'Title': 'Mr', 'FirstName': 'John', 'LastName': 'Doe',
+    'Email': 'john.doe@example.com', 'Phone': '3015550100', 'Street': '1 Main St', 'City': 'Gaithersburg',
+    'State': 'MD', 'Zip': '20879', 'EventTime': '2025-09-20 10:23:40 -0700', 'AirnoiseCategory': 'low',
+    'Registration': 'N12345', 'AircraftType': 'fixed', 'AircraftModel': 'C172', 'Operator': 'Private',
+    'Callsign': 'N12345', 'OperationType': 'departure', 'Altitude': 1200, 'Airspeed': 110,
+    'DirectionOfFlight': 'N', 'CallbackUrl': 'https://example.com/callback'
+}
+
+
+class LegacyRQ:
+    """Request class as it was before the model layer: class defaults and `__dict__.update`."""
+    Type: str = ''
+    Id: int = -1
+    EventTime: str = ''
+    StartDateTime: str = ''
+    HiddenStartDateTime: str = ''
+
+    def __init__(self, j: dict):
+        if j != '':
+            self.__dict__.update(j)
+        event_datetime = parse_event_time(self.EventTime)
+        if event_datetime is not None:
+            self.StartDateTime = event_datetime.strftime('%d-%m-%Y %H:%M')
+            self.HiddenStartDateTime = event_datetime.strftime('%m/%d/%Y %H:%M')
+
+    def validate(self) -> list[str]:
+        errors = []
+        if self.Id == -1:
+            errors.append('Missing `Id` value')
+        for name in REQUIRED_FIELDS:
+            if not getattr(self, name, ''):
+                errors.append(f'Missing `{name}` value')
+        return errors
+
+
+class LegacyRS:
+    Errors = []
+    Logs = []
+    State: int = 0
+
+    def __init__(self):
+        self.Logs = list()
+        self.Error = ''
+
+
+class LegacyEncoder(JSONEncoder):
+    def default(self, o):
+        return o.__dict__
+
+
+def fill_response(response, logs: int, body: str):
+    for index in range(logs):
+        message = f'Step {index} of the task finished'
+        if isinstance(response, LegacyRS):
+            # Formatted when logged, as TaskService.log used to do
+            timestamp = datetime.now(timezone.utc).strftime("%Y-%m-%d-%H:%M:%S.%f")[:-3]
+            response.Logs.append(f'[{timestamp}] - {message}')
+        else:
+            response.Logs.append(message)
+    response.Body = body
+    return response
+
+
+def legacy_round_trip(logs: int, body: str) -> str:
+    request = LegacyRQ(PAYLOAD)
+    request.validate()
+    LegacyEncoder().encode(request)
+    return LegacyEncoder().encode(fill_response(LegacyRS(), logs, body))
+
+
+def model_round_trip(logs: int, body: str) -> str:
+    request = decode(MontgomeryCountyAirParkTaskRQ, PAYLOAD)
+    request.validate()
+    encode(request)
+    return encode(fill_response(MontgomeryCountyAirParkTaskRS(), logs, body))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark request/response models')
+    parser.add_argument('--number', type=int, default=20000, help='Round trips per measurement')
+    parser.add_argument('--repeat', type=int, default=5, help='Number of measurements, the best one is reported')
+    parser.add_argument('--logs', type=int, default=40, help='Log records attached to each response')
+    parser.add_argument('--body-size', type=int, default=4096, help='Size of the body attached to each response')
+    args = parser.parse_args()
+
+    body = 'x' * args.body_size
+    legacy_size = len(legacy_round_trip(args.logs, body))
+    model_size = len(model_round_trip(args.logs, body))
+
+    results = {}
+    for name, function in [('legacy', legacy_round_trip), ('models', model_round_trip)]:
+        best = min(timeit.repeat(lambda: function(args.logs, body), number=args.number, repeat=args.repeat))
+        results[name] = best / args.number * 1e6
+
+    print(f'legacy: {results["legacy"]:.1f} us per round trip, {legacy_size} bytes per response')
+    print(f'models: {results["models"]:.1f} us per round trip, {model_size} bytes per response')
+    print(f'speed-up: {results["legacy"] / results["models"]:.2f}x')
+    print(json.dumps({'legacy_us': round(results['legacy'], 2), 'models_us': round(results['models'], 2)}))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
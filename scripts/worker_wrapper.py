@@ -27,7 +27,8 @@ def setup_worker_environment():
         f"{downloads_path}/.browser",
         f"{downloads_path}/.data",
         f"{downloads_path}/.disk",
-        f"{downloads_path}/.globalcache"
+        f"{downloads_path}/.globalcache",
+        f"{downloads_path}/.templates"
     ]
     
     for directory in directories:
@@ -1,114 +1,51 @@
-from json import JSONEncoder
+from selenium_worker.models import Model, ModelEncoder, Field
 
-class ComplaintTaskRQ:
-    Type: str = ''
+
+class ComplaintTaskRQ(Model):
+    Type: str = Field('', required=True)
     SessionUID: str = ''
-    
+
     # Complaint-specific fields
-    Id: int = -1
-    ComplaintUuid: str = ''
-    ComplaintType: str = ''
-    AirportIdent: str = ''
-    TimeZone: str = ''
-    Title: str = ''
-    FirstName: str = ''
-    LastName: str = ''
-    Email: str = ''
-    Phone: str = ''
-    Street: str = ''
+    Id: int = Field(-1, required=True, missing=-1)
+    ComplaintUuid: str = Field('', required=True)
+    ComplaintType: str = Field('', required=True)
+    AirportIdent: str = Field('', required=True)
+    TimeZone: str = Field('', required=True)
+    Title: str = Field('', required=True)
+    FirstName: str = Field('', required=True)
+    LastName: str = Field('', required=True)
+    Email: str = Field('', required=True)
+    Phone: str = Field('', required=True)
+    Street: str = Field('', required=True)
     ParsedStreet: str = ''
-    City: str = ''
-    State: str = ''
-    Zip: str = ''
+    City: str = Field('', required=True)
+    State: str = Field('', required=True)
+    Zip: str = Field('', required=True)
     Comments: str = ''
-    EventTime: str = ''
+    EventTime: str = Field('', required=True)
     Remarks: str = ''
-    AirnoiseCategory: str = ''
-    Registration: str = ''
-    AircraftType: str = ''
+    AirnoiseCategory: str = Field('', required=True)
+    Registration: str = Field('', required=True)
+    AircraftType: str = Field('', required=True)
     EngineCount: int = 0
-    AircraftModel: str = ''
-    Operator: str = ''
-    Callsign: str = ''
-    OperationType: str = ''
-    Altitude: int = 0
-    Airspeed: int = 0
-    DirectionOfFlight: str = ''
+    AircraftModel: str = Field('', required=True)
+    Operator: str = Field('', required=True)
+    Callsign: str = Field('', required=True)
+    OperationType: str = Field('', required=True)
+    Altitude: int = Field(0, required=True)
+    Airspeed: int = Field(0, required=True)
+    DirectionOfFlight: str = Field('', required=True)
     RequestReplyToComplaint: bool = False
     ApiKey: str = ''
-    CallbackUrl: str = ''
+    CallbackUrl: str = Field('', required=True)
 
     # Task retry parameters
     Countdown: int = 0
     DefaultRetryDelay: int = 10
     MaxRetries: int = 3
-    RetryBackoff = True
-    RetryBackoffMax = 600
-    RetryJitter = True
-
-    def __init__(self, j: dict):
-        if j != '':
-            self.__dict__.update(j)
-
-    def validate(self) -> list[str]:
-        Errors = []
-        if not self.Type:
-            Errors.append('Missing `Type` value')
-        if self.Id == -1:
-            Errors.append('Missing `Id` value')
-        if not self.ComplaintUuid:
-            Errors.append('Missing `ComplaintUuid` value')
-        if not self.ComplaintType:
-            Errors.append('Missing `ComplaintType` value')
-        if not self.AirportIdent:
-            Errors.append('Missing `AirportIdent` value')
-        if not self.TimeZone:
-            Errors.append('Missing `TimeZone` value')
-        if not self.Title:
-            Errors.append('Missing `Title` value')
-        if not self.FirstName:
-            Errors.append('Missing `FirstName` value')
-        if not self.LastName:
-            Errors.append('Missing `LastName` value')
-        if not self.Email:
-            Errors.append('Missing `Email` value')
-        if not self.Phone:
-            Errors.append('Missing `Phone` value')
-        if not self.Street:
-            Errors.append('Missing `Street` value')
-        if not self.City:
-            Errors.append('Missing `City` value')
-        if not self.State:
-            Errors.append('Missing `State` value')
-        if not self.Zip:
-            Errors.append('Missing `Zip` value')
-        if not self.EventTime:
-            Errors.append('Missing `EventTime` value')
-        if not self.AirnoiseCategory:
-            Errors.append('Missing `AirnoiseCategory` value')
-        if not self.Registration:
-            Errors.append('Missing `Registration` value')
-        if not self.AircraftType:
-            Errors.append('Missing `AircraftType` value')
-        if not self.AircraftModel:
-            Errors.append('Missing `AircraftModel` value')
-        if not self.Operator:
-            Errors.append('Missing `Operator` value')
-        if not self.Callsign:
-            Errors.append('Missing `Callsign` value')
-        if not self.OperationType:
-            Errors.append('Missing `OperationType` value')
-        if not self.Altitude:
-            Errors.append('Missing `Altitude` value')
-        if not self.Airspeed:
-            Errors.append('Missing `Airspeed` value')
-        if not self.DirectionOfFlight:
-            Errors.append('Missing `DirectionOfFlight` value')
-        if not self.CallbackUrl:
-            Errors.append('Missing `CallbackUrl` value')
-
-        return Errors
+    RetryBackoff: bool = True
+    RetryBackoffMax: int = 600
+    RetryJitter: bool = True
 
-class ComplaintTaskRQEncoder(JSONEncoder):
-    def default(self, o):
-        return o.__dict__
+class ComplaintTaskRQEncoder(ModelEncoder):
+    pass
@@ -1,7 +1,6 @@
-from json import JSONEncoder
 from datetime import datetime
 from typing import Optional
-from selenium_worker.Requests.ComplaintTaskRQ import ComplaintTaskRQ
+from selenium_worker.Requests.ComplaintTaskRQ import ComplaintTaskRQ, ComplaintTaskRQEncoder
 
 def parse_event_time(event_time_str: str) -> Optional[datetime]:
     """
@@ -29,15 +28,12 @@ def parse_event_time(event_time_str: str) -> Optional[datetime]:
 
 
 class MontgomeryCountyAirParkTaskRQ(ComplaintTaskRQ):
-    # Computed properties (will be set in __init__)
+    # Computed properties (will be set in __post_init__)
     StartDateTime: str = ''
     HiddenStartDateTime: str = ''
 
-    def __init__(self, j: dict):
-        # Call parent constructor first
-        super().__init__(j)
-
-        # Compute derived properties
+    def __post_init__(self):
+        # Compute derived properties once the fields are set
         self._compute_properties()
 
     def _compute_properties(self):
@@ -52,6 +48,5 @@ class MontgomeryCountyAirParkTaskRQ(ComplaintTaskRQ):
             self.StartDateTime = ''
             self.HiddenStartDateTime = ''
 
-class MontgomeryCountyAirParkTaskRQEncoder(JSONEncoder):
-    def default(self, o):
-        return o.__dict__
+class MontgomeryCountyAirParkTaskRQEncoder(ComplaintTaskRQEncoder):
+    pass
@@ -1,39 +1,20 @@
-from json import JSONEncoder
 from selenium_worker import config as cfg
+from selenium_worker.models import Model, ModelEncoder, Field
 
-class SubmissionVerificationTaskRQ:
-    ApiKey: str = cfg.AirnoiseSettings.SUBMISSION_VERIFIER_API_KEY
-    Id: str = ''
-    SubmissionVerified: bool = False
-    SubmitterIp: str = ''
+class SubmissionVerificationTaskRQ(Model):
+    ApiKey: str = Field(cfg.AirnoiseSettings.SUBMISSION_VERIFIER_API_KEY, required=True)
+    Id: str = Field('', required=True)
+    SubmissionVerified: bool = Field(False, required=True, missing=None)
+    SubmitterIp: str = Field('', required=True)
     SubmissionError: str = ''
     ErrorBacktrace: str = ''
-    SubmissionDetails: dict = None
+    SubmissionDetails: dict = Field(factory=dict)
 
-    def __init__(self, j: dict):
-        # Set default for SubmissionDetails before updating from dict
-        if self.SubmissionDetails is None:
-            self.SubmissionDetails = {}
-        if j != '':
-            self.__dict__.update(j)
+    def __post_init__(self):
         # Ensure SubmissionDetails is always a dict after initialization
         if not isinstance(self.SubmissionDetails, dict):
             self.SubmissionDetails = {}
 
-    def validate(self) -> list[str]:
-        Errors = []
-
-        if not self.ApiKey:
-            Errors.append('Missing `ApiKey` value')
-        if not self.Id:
-            Errors.append('Missing `Id` value')
-        if self.SubmissionVerified is None:
-            Errors.append('Missing `SubmissionVerified` value')
-        if not self.SubmitterIp:
-            Errors.append('Missing `SubmitterIp` value')
-
-        return Errors
-
     def to_snake_case_dict(self) -> dict:
         """Convert PascalCase properties to snake_case for Ruby API submission"""
         return {
@@ -64,6 +45,5 @@ class SubmissionVerificationTaskRQ:
         }
 
 
-class SubmissionVerificationTaskRQEncoder(JSONEncoder):
-    def default(self, o):
-        return o.__dict__
+class SubmissionVerificationTaskRQEncoder(ModelEncoder):
+    pass
@@ -0,0 +1,102 @@
+"""
+Validation of task requests, usable without the worker runtime.
+
+Only the request models are imported, not Selenium, Redis or the worker configuration, so producers can check a
+payload before enqueueing it:
+
+    errors = validate_request(payload)
+
+or from the command line, with the payload on standard input and the errors printed as a JSON list:
+
+    python -m selenium_worker.Requests.validation < payload.json
+"""
+
+import json
+import sys
+import urllib.parse
+from typing import Callable, Optional, Union
+
+from selenium_worker.Requests.ComplaintTaskRQ import ComplaintTaskRQ
+from selenium_worker.Requests.MontgomeryCountyAirParkTaskRQ import MontgomeryCountyAirParkTaskRQ, parse_event_time
+from selenium_worker.enums import WorkerType
+
+# Request model of every worker type, in step with `task_type_classes` of `selenium_worker.vars`
+REQUEST_TYPES: dict[WorkerType, type] = {
+    WorkerType.Montgomery: MontgomeryCountyAirParkTaskRQ
+}
+
+
+def _is_number(value) -> bool:
+    if isinstance(value, bool):
+        return False
+    if isinstance(value, (int, float)):
+        return True
+    try:
+        float(value)
+        return True
+    except (TypeError, ValueError):
+        return False
+
+
+def _is_http_url(value) -> bool:
+    parsed = urllib.parse.urlparse(str(value))
+    return parsed.scheme in ('http', 'https') and bool(parsed.netloc)
+
+
+# Checks of present values by field name; missing values are reported by the `validate` method of the model
+FIELD_VALIDATORS: dict[str, tuple[Callable[[object], bool], str]] = {
+    'EventTime': (lambda value: parse_event_time(str(value)) is not None, 'is not a supported date and time'),
+    'CallbackUrl': (_is_http_url, 'is not an HTTP(S) URL'),
+    'Altitude': (_is_number, 'is not a number'),
+    'Airspeed': (_is_number, 'is not a number'),
+    'EngineCount': (_is_number, 'is not a number')
+}
+
+
+def parse_request(payload: Union[str, bytes, dict, None]) -> tuple[ComplaintTaskRQ, list[str]]:
+    """
+    Decode a task request into the model of its worker type and validate it.
+
+    Args:
+        payload: JSON document or already decoded payload of the request
+
+    Returns:
+        tuple: The request, a plain `ComplaintTaskRQ` if its worker type is unknown, and the validation errors
+    """
+    if isinstance(payload, (str, bytes)):
+        try:
+            payload = json.loads(payload) if payload else None
+        except ValueError as e:
+            return ComplaintTaskRQ(None), [f'Request is not valid JSON: {e}']
+    if payload is not None and not isinstance(payload, dict):
+        return ComplaintTaskRQ(None), ['Request is not a JSON object']
+
+    request = ComplaintTaskRQ(payload)
+    try:
+        request_type: Optional[type] = REQUEST_TYPES.get(WorkerType(request.Type))
+    except ValueError:
+        request_type = None
+    if request_type is None:
+        errors = request.validate()
+        if request.Type:
+            errors.insert(0, f'Unknown worker type `{request.Type}`')
+        return request, errors
+
+    request = request_type(payload)
+    errors = request.validate()
+    for name, (check, message) in FIELD_VALIDATORS.items():
+        value = getattr(request, name, None)
+        if value not in (None, '') and not check(value):
+            errors.append(f'`{name}` value {message}')
+    return request, errors
+
+
+def validate_request(payload: Union[str, bytes, dict, None]) -> list[str]:
+    """Return the validation errors of a task request, an empty list if it can be enqueued."""
+    return parse_request(payload)[1]
+
+
+if __name__ == '__main__':
+    validation_errors = validate_request(sys.stdin.read())
+    print(json.dumps(validation_errors))
+    sys.exit(1 if validation_errors else 0)
@@ -1,13 +1,22 @@
-from json import JSONEncoder
+from selenium_worker import config as cfg
+from selenium_worker.logbuffer import LogBuffer
+from selenium_worker.models import Model, ModelEncoder, Field
 
-class ComplaintTaskRS:
-    Errors = []
-    Logs = []
-    State: int = 0
 
-    def __init__(self):
-        pass
+def _log_buffer() -> LogBuffer:
+    return LogBuffer(cfg.GeneralSettings.RESPONSE_LOG_LIMIT)
+
+
+class ComplaintTaskRS(Model):
+    State: int = 0
+    Stage: int = 0
+    Error: str = ''
+    Errors: list = Field(factory=list)
+    Logs: LogBuffer = Field(factory=_log_buffer)
+    Body: str = ''
+    BodyRef: str = ''
+    # Milliseconds spent in the phases of the job, see `JobTimeline.summary`
+    Timeline: dict = Field(factory=dict)
 
-class ComplaintTaskRSEncoder(JSONEncoder):
-    def default(self, o):
-        return o.__dict__
+class ComplaintTaskRSEncoder(ModelEncoder):
+    pass
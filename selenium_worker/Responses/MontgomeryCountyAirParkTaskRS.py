@@ -1,11 +1,8 @@
-from json import JSONEncoder
-
-from selenium_worker.Responses.ComplaintTaskRS import ComplaintTaskRS
+from selenium_worker.Responses.ComplaintTaskRS import ComplaintTaskRS, ComplaintTaskRSEncoder
 
 
 class MontgomeryCountyAirParkTaskRS(ComplaintTaskRS):
     pass
 
-class MontgomeryCountyAirParkTaskRSEncoder(JSONEncoder):
-    def default(self, o):
-        return o.__dict__
+class MontgomeryCountyAirParkTaskRSEncoder(ComplaintTaskRSEncoder):
+    pass
@@ -1,14 +1,15 @@
 import logging
+import time
 
-from selenium.common.exceptions import WebDriverException
+from selenium.common.exceptions import TimeoutException, WebDriverException
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.support.ui import WebDriverWait
 
 from selenium_worker.Requests.MontgomeryCountyAirParkTaskRQ import MontgomeryCountyAirParkTaskRQ
 from selenium_worker.Responses.MontgomeryCountyAirParkTaskRS import MontgomeryCountyAirParkTaskRS
-from selenium_worker.Services.TaskService import TaskService, PageSetupConfig
-from selenium_worker.constants import STAGE_OBTAINED_PAGE
+from selenium_worker.Services.TaskService import TaskService, PageSetupConfig, FormField
+from selenium_worker.constants import STAGE_OBTAINED_PAGE, STAGE_OBTAINED_RESULTS
+from selenium_worker.exceptions import BrowserHungException, DeadlineExceededException
+from selenium_worker.timeline import FIELDS_FILLED
 
 logger = logging.getLogger(__name__)
 
@@ -50,6 +51,7 @@ class MontgomeryCountyAirParkTask(TaskService):
                 self.driver.execute_cdp_cmd('Network.enable', {})
 
             # Prepare the page for submission
+            self.page_ready_at = None
             self.RS = self.prepare(config.initial_url, config.downloads_path)
 
             # Re-enable loading of blocked URLS like recaptcha or google tag
@@ -57,7 +59,7 @@ class MontgomeryCountyAirParkTask(TaskService):
                 self.driver.execute_cdp_cmd('Network.setBlockedURLs', {"urls": []})
                 self.driver.execute_cdp_cmd('Network.enable', {})
 
-            return self.RS.Logs
+            return self.RS.Logs.messages()
 
         raise Exception(f'Failed to obtain Maryland page during {method_name} after {config.attempts} attempts')
 
@@ -88,10 +90,11 @@ class MontgomeryCountyAirParkTask(TaskService):
     def prepare(self, initial_url: str, downloads_path: str) -> MontgomeryCountyAirParkTaskRS:
         try:
             self.log('Obtaining initial page URL')
-            self.SB.get(initial_url)
+            # A detached browser has no SeleniumBase wrapper
+            (self.SB or self.driver).get(initial_url)
         except WebDriverException as wex:
             self.error('Error obtaining the initial page URL: ' + str(wex))
-            self.RS.Body = self.driver.page_source
+            self.capture_snapshot(wex)
             return self.RS
 
         self.log('Initial page URL obtained')
@@ -99,19 +102,25 @@ class MontgomeryCountyAirParkTask(TaskService):
 
         try:
             self.wait_for_page_to_load(20000)
+        except (DeadlineExceededException, BrowserHungException):
+            raise
         except BaseException as e:
             self.error('Failed to load the page: ' + str(e))
-            self.RS.Body = self.driver.page_source
+            self.capture_snapshot(e)
             return self.RS
 
-        wait_five = WebDriverWait(self.driver, 5, poll_frequency=0.5)
         try:
-            wait_five.until(EC.visibility_of_element_located((By.ID, 'First Name')))
+            result = self.wait_for_elements('first_name', [(By.ID, 'First Name')], 'visible', 5000)
+            if not result.ready:
+                raise TimeoutException('First Name field is not visible')
+        except (DeadlineExceededException, BrowserHungException):
+            raise
         except BaseException as ex:
-            self.log('Failed to find first name field and/or scroll it into view: ' + str(ex))
-            self.RS.Body = self.driver.page_source
+            self.error('Failed to find first name field and/or scroll it into view: ' + str(ex))
+            self.capture_snapshot(ex)
             return self.RS
 
+        self.page_ready_at = time.monotonic()
         return self.RS
 
     def process(self, initial_url: str, downloads_path: str) -> MontgomeryCountyAirParkTaskRS:
@@ -119,14 +128,18 @@ class MontgomeryCountyAirParkTask(TaskService):
         
         try:
             # Fill all the basic form fields
-            self.fill_form_field(By.ID, 'First Name', 'first name', self.RQ.FirstName)
-            self.fill_form_field(By.ID, 'Last Name', 'last name', self.RQ.LastName)
-            self.fill_form_field(By.ID, 'email', 'e-mail address', self.RQ.Email)
-        #     self.fill_form_field(By.ID, 'Phone Number', 'phone number', self.RQ.Phone)
-        #     self.fill_form_field(By.ID, 'Street Address Cross Streets', 'street address', self.RQ.Street)
-        #     self.fill_form_field(By.ID, 'City', 'city address', self.RQ.City)
-        #     self.fill_form_field(By.ID, 'State', 'state address', self.RQ.State)
-        #     self.fill_form_field(By.ID, 'ZIP', 'ZIP address', self.RQ.Zip)
+            report = self.fill_form([
+                FormField(By.ID, 'First Name', 'first name', self.RQ.FirstName),
+                FormField(By.ID, 'Last Name', 'last name', self.RQ.LastName),
+                FormField(By.ID, 'email', 'e-mail address', self.RQ.Email),
+            #     FormField(By.ID, 'Phone Number', 'phone number', self.RQ.Phone),
+            #     FormField(By.ID, 'Street Address Cross Streets', 'street address', self.RQ.Street),
+            #     FormField(By.ID, 'City', 'city address', self.RQ.City),
+            #     FormField(By.ID, 'State', 'state address', self.RQ.State),
+            #     FormField(By.ID, 'ZIP', 'ZIP address', self.RQ.Zip),
+            ])
+            if not report.ok:
+                return self.RS
 
             # Fill date/time fields using JavaScript with computed properties
             script = ("(function(){"
@@ -136,6 +149,7 @@ class MontgomeryCountyAirParkTask(TaskService):
                       f"document.getElementsByName('hidden[3_Approximate End Date Time]')[0].value = '{self.RQ.HiddenStartDateTime}';"
                       "})()")
             self.driver.execute_script(script)
+            self.mark(FIELDS_FILLED)
             
         #     # Fill the remaining fields
         #     self.fill_form_field(By.ID, 'Airport source name code', 'airport source name code', self.RQ.AirportIdent)
@@ -143,7 +157,11 @@ class MontgomeryCountyAirParkTask(TaskService):
         #     self.fill_form_field(By.ID, 'Description Question', 'description/question', self.RQ.DescriptionOrQuestion + ' (' + self.RQ.SessionUID + ')')
         #     self.fill_form_field(By.ID, 'Response requested', 'response request', self.RQ.ResponseRequested)
 
+        except (DeadlineExceededException, BrowserHungException):
+            raise
         except BaseException as ex:
+            self.error('Failed to fill the form: ' + str(ex))
+            self.capture_snapshot(ex)
             return self.RS
 
         # for retries in range(3):
@@ -154,6 +172,7 @@ class MontgomeryCountyAirParkTask(TaskService):
         #             self.driver.execute_script("arguments[0].click();", element)
         #             time.sleep(5)
         #             self.wait_for_page_to_load(10000)
+        #             self.mark(SUBMITTED)
         #         except BaseException as ex:
         #             self.log('Failed to click on the `Send` button on the page: ' + str(ex))
         #             self.RS.Body = self.driver.page_source
@@ -171,6 +190,8 @@ class MontgomeryCountyAirParkTask(TaskService):
 
         if not callback_success:
             self.error('Failed to send verification callback')
-        
+        else:
+            self.RS.Stage = STAGE_OBTAINED_RESULTS
+
         self.RS.Body = "All done successfully"
         return self.RS
@@ -1,23 +1,18 @@
-import json
 import logging
 import os
 import random
-import shutil
+import threading
 import time
 import urllib.parse
-from dataclasses import dataclass
-from datetime import datetime, timezone
+from dataclasses import dataclass, field
 from typing import Optional
 from uuid import uuid4
-from zipfile import is_zipfile
 
-import requests
 import undetected_chromedriver as uc
 from redis import Redis
+from selenium.common import TimeoutException
 from selenium.webdriver import ChromeOptions, FirefoxOptions
 from selenium.webdriver.common.action_chains import ActionChains
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.support.wait import WebDriverWait
 from seleniumbase import SB
 from urllib3.exceptions import MaxRetryError
 
@@ -27,8 +22,20 @@ from selenium_worker.Requests.ComplaintTaskRQ import ComplaintTaskRQ
 from selenium_worker.Requests.MontgomeryCountyAirParkTaskRQ import MontgomeryCountyAirParkTaskRQ
 from selenium_worker.Requests.SubmissionVerificationTaskRQ import SubmissionVerificationTaskRQ
 from selenium_worker.Responses.ComplaintTaskRS import ComplaintTaskRS
+from selenium_worker.deadline import Deadline
+from selenium_worker.exceptions import BrowserHungException, DeadlineExceededException
+from selenium_worker.detached import BrowserState, attach_driver, check_endpoint, kill_browser, \
+    launch_detached_chrome
+from selenium_worker import metrics
 from selenium_worker.enums import BrowserDriverType
+from selenium_worker.outbox import enqueue_callback, post_callback
+from selenium_worker.profiles import ensure_profile_template, clone_profile
+from selenium_worker.reaper import claim_directory, get_reaper
+from selenium_worker.snapshots import store_snapshot
+from selenium_worker.timeline import CALLBACK, JobTimeline
 from selenium_worker.utils import get_actual_ip_address, get_proxied_ip_address
+from selenium_worker.waiters import WaitResult, ElementWaitResult, wait_for_ready_state, wait_for_elements, \
+    resolve_elements
 
 logger = logging.getLogger(__name__)
 
@@ -36,6 +43,12 @@ logger = logging.getLogger(__name__)
 TYPING_DELAY_FROM = 0.05
 TYPING_DELAY_TO = 0.20
 
+# Deadline for the task page to start loading during tear-up/tear-down (milliseconds)
+PAGE_START_TIMEOUT_MS = 20000
+
+# Shortest timeout of a verification callback sent directly, even once the job deadline has passed (milliseconds)
+CALLBACK_MIN_TIMEOUT_MS = 5000
+
 # Proxy change wait time constants (seconds)
 PROXY_CHANGE_WAIT_LOWER_BOUND = 0.25
 PROXY_CHANGE_WAIT_UPPER_BOUND = 1.25
@@ -58,6 +71,38 @@ class PageSetupConfig:
     proxy_variation: Optional[str] = None
     rds: Optional[Redis] = None
 
+@dataclass
+class FormField:
+    """A form field to be filled by `TaskService.fill_form`."""
+    locator_type: str
+    locator_value: str
+    field_name: str
+    value: str
+
+
+@dataclass
+class FormFieldReport:
+    """Outcome of filling a single form field."""
+    field_name: str
+    elapsed_ms: int = 0
+    error: str = ''
+
+
+@dataclass
+class FormFillReport:
+    """Outcome of `TaskService.fill_form`: time spent resolving the elements and a report per field."""
+    resolve_ms: int = 0
+    fields: list[FormFieldReport] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return all(not report.error for report in self.fields)
+
+    @property
+    def errors(self) -> list[str]:
+        return [f'{report.field_name}: {report.error}' for report in self.fields if report.error]
+
+
 class ProxyConfig:
     proxy_ip: str = ''
     proxy_change_attempts: int = 0
@@ -77,11 +122,37 @@ class TaskService:
     driver = None
     user_data_dir: str = ''
     proxy_config: ProxyConfig
+    # Detached browser the driver is attached to, if BrowserSettings.REATTACH is enabled
+    browser_state: Optional[BrowserState] = None
+    # Time budget of the job in progress; step timeouts are cut down to what is left of it
+    deadline: Optional[Deadline] = None
+    # Timeline of the job in progress
+    timeline: Optional[JobTimeline] = None
+    # Monotonic time the task page was last prepared at, None if its preparation failed
+    page_ready_at: Optional[float] = None
+
+    # Attributes that make up a running browser; exchanged as a whole when a standby browser is swapped in
+    BROWSER_STATE_ATTRIBUTES = ('_sb_gen', 'SB', 'driver', 'user_data_dir', 'proxy_config', 'tasks_since_launch',
+                                'browser_state', 'page_ready_at')
 
     def __init__(self):
         self.RQ = ComplaintTaskRQ({})
         self.RS = ComplaintTaskRS()
         self.proxy_config = ProxyConfig()
+        self.tasks_since_launch = 0
+        self.wait_timings: list[tuple[str, int]] = []
+        self._snapshot_count = 0
+        self._snapshot_failure: Optional[BaseException] = None
+        self._standby: Optional['TaskService'] = None
+        self._standby_thread: Optional[threading.Thread] = None
+        # Preparation state of a service that is itself a standby; owned by the standby, so that a discarded
+        # standby whose thread is still running never touches the state of its successor
+        self._preparation_lock = threading.Lock()
+        self._preparation_done = False
+        self._preparation_error: Optional[BaseException] = None
+        self._discarded = False
+        # Name of the state file recording the detached browser of this service
+        self.state_name = cfg.GeneralSettings.WORKER_UID
 
     def shutdown(self, remove_user_data: bool = True):
         """Shutdown browser and cleanup resources"""
@@ -107,6 +178,20 @@ class TaskService:
             except Exception as e:
                 self.log(f"Error during SeleniumBase shutdown: {e}")
 
+        if self.browser_state is not None:
+            try:
+                if self.driver:
+                    try:
+                        self.driver.quit()
+                    except Exception as e:
+                        self.log(f"Error during driver.quit(): {e}")
+                kill_browser(self.browser_state)
+                self.browser_state.remove(self.state_name)
+            except Exception as e:
+                self.log(f"Error during detached browser shutdown: {e}")
+            self.browser_state = None
+            self.driver = None
+
         # # Force kill any remaining Chrome processes that might be orphaned
         # try:
         #     current_pid = os.getpid()
@@ -150,8 +235,9 @@ class TaskService:
 
         if remove_user_data and self.user_data_dir:
             try:
-                shutil.rmtree(os.path.join(cfg.CacheSettings.DATA_PATH, self.user_data_dir), ignore_errors=True)
-                self.log(f"User data directory deleted: {self.user_data_dir}")
+                # Deletion happens on the reaper thread so that large profiles do not delay the next task
+                get_reaper().schedule(os.path.join(cfg.CacheSettings.DATA_PATH, self.user_data_dir))
+                self.log(f"User data directory scheduled for deletion: {self.user_data_dir}")
 
             except Exception as e:
                 self.log(f"Failed to remove user data directory '{self.user_data_dir}': {e}")
@@ -231,39 +317,102 @@ class TaskService:
                     extensions_list.append(os.path.abspath(os.path.join("plugins", extension)))
 
                 driver_options.add_argument('--disable-infobars')
-                self._sb_gen = SB(browser='chrome', uc=cfg.BrowserSettings.CHROME_UNDETECTED,
-                                  incognito=cfg.BrowserSettings.CHROME_INCOGNITO, window_size="1920, 1080",
-                                  position="0, 0", extension_dir=','.join(extensions_list),
-                                  headless=cfg.BrowserSettings.CHROME_HEADLESS,
-                                  test=False, chromium_arg=','.join(driver_options.arguments)).gen
-                self.SB = next(self._sb_gen)
-                self.driver = self.SB.driver
+                if cfg.BrowserSettings.REATTACH:
+                    self.launch_detached(browser_driver_type, driver_options, extensions, browser_binary_path)
+                else:
+                    self._sb_gen = SB(browser='chrome', uc=cfg.BrowserSettings.CHROME_UNDETECTED,
+                                      incognito=cfg.BrowserSettings.CHROME_INCOGNITO, window_size="1920, 1080",
+                                      position="0, 0", extension_dir=','.join(extensions_list),
+                                      headless=cfg.BrowserSettings.CHROME_HEADLESS,
+                                      test=False, chromium_arg=','.join(driver_options.arguments)).gen
+                    self.SB = next(self._sb_gen)
+                    self.driver = self.SB.driver
 
         if self.driver is None:
             raise RuntimeError('Cannot find any browser driver')
-        
+        self.tasks_since_launch = 0
+
         logger.info(f'Browser {browser_driver_type} was created successfully')
 
+    def launch_detached(self, browser_driver_type: BrowserDriverType, driver_options: ChromeOptions,
+                        extensions: list[str], browser_binary_path: str = None):
+        """
+        Launch Chrome outside of the worker process group and attach a driver to its remote debugging endpoint.
+
+        The browser is recorded in the state file of the service, so a worker process that replaces this one can
+        re-attach to it with `reattach_browser`. Its user data directory is owned by the browser process rather than
+        the worker, so the reaper leaves it alone for as long as the browser runs.
+        """
+        self.load_extensions(browser_driver_type, driver_options, extensions)
+        driver_options.add_argument('--ignore-certificate-errors')
+        state = launch_detached_chrome(browser_binary_path or cfg.BrowserSettings.BROWSER_BINARY_PATH,
+                                       self.user_data_dir, driver_options.arguments)
+        try:
+            self.driver = attach_driver(state)
+        except BaseException:
+            kill_browser(state)
+            raise
+
+        claim_directory(self.user_data_dir, state.pid)
+        self.browser_state = state
+        state.save(self.state_name)
+
+    def reattach_browser(self) -> bool:
+        """
+        Attach to the detached browser recorded in the state file of the service, left behind by a previous worker
+        process. A browser that does not pass the health check is shut down and its user data directory reaped.
+
+        Returns:
+            bool: True if the driver is attached to a healthy browser, False if a new browser has to be launched
+        """
+        state = BrowserState.load(self.state_name)
+        if state is None:
+            return False
+
+        started = time.monotonic()
+        self.browser_state = state
+        self.user_data_dir = state.user_data_dir
+        try:
+            if state.process() is not None and check_endpoint(state.port):
+                self.driver = attach_driver(state)
+                if self.health_check():
+                    self.tasks_since_launch = 0
+                    logger.info(f'Re-attached to browser with PID of {state.pid} in '
+                                f'{round((time.monotonic() - started) * 1000)} ms')
+                    return True
+        except BaseException as e:
+            logger.warning(f'Failed to re-attach to browser with PID of {state.pid}: {e}')
+
+        logger.warning(f'Browser with PID of {state.pid} failed the health check, launching a new one')
+        self.shutdown(True)
+        return False
+
     def init_browser(self, browser_driver_type: BrowserDriverType, task_type: str):
         logger.info('Initializing browser ...')
+        if cfg.BrowserSettings.REATTACH and browser_driver_type == BrowserDriverType.Chrome and self.reattach_browser():
+            metrics.browser_launches.inc(mode='reattached')
+            return self.user_data_dir
+
         self.user_data_dir = os.path.join(cfg.CacheSettings.DATA_PATH, uuid4().__str__())
         logger.info(f'User data directory is {self.user_data_dir}')
-        
+
+        archive_path = os.path.join(cfg.CacheSettings.GLOBALCACHE_PATH, f'{task_type}.zip')
         if browser_driver_type == BrowserDriverType.Chrome and os.path.exists(
-                os.path.join(cfg.CacheSettings.GLOBALCACHE_PATH,
-                             f'{task_type}.zip')) and cfg.CacheSettings.CACHE_USE is True:  # Check before copying
-            # Copy from global cache into user data
-            if is_zipfile(os.path.join(cfg.CacheSettings.GLOBALCACHE_PATH, f'{task_type}.zip')):
-                try:
-                    logger.info('Unpacking archive ' + os.path.join(cfg.CacheSettings.GLOBALCACHE_PATH,
-                                                              f'{task_type}.zip') + f' into {self.user_data_dir}')
-                    shutil.unpack_archive(os.path.join(cfg.CacheSettings.GLOBALCACHE_PATH, f'{task_type}.zip'),
-                                          self.user_data_dir)
-                except Exception as e:
-                    logger.error(f"{e}")
-            else:
-                logger.info(f"Skipping using cache from ZIP file {task_type}.zip")
+                archive_path) and cfg.CacheSettings.CACHE_USE is True:  # Check before copying
+            # Clone the template extracted from global cache into user data
+            try:
+                template_dir = ensure_profile_template(archive_path, cfg.CacheSettings.TEMPLATE_PATH, task_type)
+                if template_dir:
+                    method = clone_profile(template_dir, self.user_data_dir)
+                    logger.info(f'Cloned profile template {template_dir} into {self.user_data_dir} using {method}')
+                else:
+                    logger.info(f"Skipping using cache from ZIP file {task_type}.zip")
+            except Exception as e:
+                logger.error(f"{e}")
+
+        claim_directory(self.user_data_dir)
 
+        metrics.browser_launches.inc(mode='launched')
         self.create_driver(
             browser_driver_type,
             browser_binary_path=cfg.BrowserSettings.BROWSER_BINARY_PATH,
@@ -276,10 +425,236 @@ class TaskService:
             self.driver.delete_all_cookies()
         except BaseException as e:
             self.log('Failed to cleanup cookies after browser start-up: ' + str(e))
-            self.RS.Body = self.driver.page_source
+            self.capture_snapshot(e)
 
         return self.user_data_dir
 
+    def start_task(self, request: ComplaintTaskRQ, response: ComplaintTaskRS):
+        """Bind the request and response of a new task and reset the per-task state."""
+        self.RQ = request
+        self.RS = response
+        self.wait_timings.clear()
+        self._snapshot_count = 0
+        self._snapshot_failure = None
+
+    def capture_snapshot(self, failure: Optional[BaseException] = None):
+        """
+        Put the page source of a failure into the response.
+
+        The same failure is captured only once even when it is handled by several nested helpers, and at most
+        `SnapshotSettings.MAX_PER_TASK` snapshots are taken per task. Large page sources are written compressed to
+        the snapshot directory; the response then carries a size-capped excerpt in `Body` and the path in `BodyRef`.
+
+        Args:
+            failure: Exception that caused the failure, if any
+        """
+        if failure is not None and failure is self._snapshot_failure:
+            return
+        if self._snapshot_count >= cfg.SnapshotSettings.MAX_PER_TASK:
+            return
+
+        self._snapshot_failure = failure
+        self._snapshot_count += 1
+        try:
+            source = self.driver.page_source
+        except BaseException as e:
+            logger.warning(f'Failed to capture page source: {e}')
+            return
+
+        snapshot = store_snapshot(source, cfg.SnapshotSettings.PATH,
+                                  f'{self.RQ.SessionUID or uuid4()}-{self._snapshot_count}',
+                                  cfg.SnapshotSettings.INLINE_LIMIT, cfg.SnapshotSettings.EXCERPT_SIZE,
+                                  cfg.SnapshotSettings.MAX_FILES)
+        self.RS.Body = snapshot.body
+        self.RS.BodyRef = snapshot.ref
+
+    def start_standby(self, browser_driver_type: BrowserDriverType, task_type: str, config: PageSetupConfig):
+        """
+        Launch and prepare a second browser in the background while the current one keeps serving tasks.
+
+        The standby is a separate service instance that runs `init_browser` and `teardown` on its own thread,
+        so that `swap_standby` can later replace the current browser with one that is already on the task page.
+
+        Args:
+            browser_driver_type: Type of browser driver to launch
+            task_type: Task name used to look up the global cache archive
+            config: Page setup configuration passed to `teardown` of the standby
+        """
+        if self._standby_thread is not None:
+            logger.debug('Standby browser already exists')
+            return
+
+        self._standby = self.__class__()
+        self._standby.state_name = f'{self.state_name}.standby'
+        self._standby_thread = threading.Thread(target=self._prepare_standby,
+                                                args=(self._standby, browser_driver_type, task_type, config),
+                                                name='standby-browser', daemon=True)
+        self._standby_thread.start()
+        logger.info('Started preparing standby browser in the background')
+
+    def _prepare_standby(self, standby: 'TaskService', browser_driver_type: BrowserDriverType, task_type: str,
+                         config: PageSetupConfig):
+        try:
+            standby.init_browser(browser_driver_type, task_type)
+            standby.driver.switch_to.window(standby.driver.current_window_handle)
+            standby.teardown(config)
+            logger.info('Standby browser is ready')
+        except BaseException as e:
+            logger.error(f'Failed to prepare standby browser: {e}')
+            standby._preparation_error = e
+
+        with standby._preparation_lock:
+            standby._preparation_done = True
+            discarded = standby._discarded
+        if standby._preparation_error is not None or discarded:
+            standby.shutdown()
+
+    def swap_standby(self, timeout: float) -> bool:
+        """
+        Replace the current browser with the prepared standby one.
+
+        The previous browser is shut down on a background thread, so its teardown stays off the critical path.
+
+        Args:
+            timeout: Maximum number of seconds to wait for the standby browser to finish its preparation
+
+        Returns:
+            bool: True if the standby browser was swapped in, False if there was no usable standby browser
+        """
+        if self._standby_thread is None:
+            return False
+
+        self._standby_thread.join(timeout)
+        if self._standby_thread.is_alive():
+            logger.warning(f'Standby browser was not ready within {timeout} seconds')
+            self.discard_standby()
+            return False
+
+        standby = self._standby
+        self._standby = None
+        self._standby_thread = None
+        if standby is None or standby._preparation_error is not None or standby.driver is None:
+            return False
+
+        for attribute in self.BROWSER_STATE_ATTRIBUTES:
+            current = getattr(self, attribute)
+            setattr(self, attribute, getattr(standby, attribute))
+            setattr(standby, attribute, current)
+
+        if self.browser_state is not None:
+            # The swapped-in browser is now the one a restarted worker re-attaches to
+            self.browser_state.save(self.state_name)
+            self.browser_state.remove(standby.state_name)
+
+        threading.Thread(target=standby.shutdown, args=(True,), name='retired-browser', daemon=True).start()
+        self.log('Swapped in standby browser')
+        return True
+
+    def discard_standby(self):
+        """Drop the standby browser, shutting it down once its preparation has finished."""
+        if self._standby_thread is None:
+            return
+
+        standby = self._standby
+        if standby is not None:
+            with standby._preparation_lock:
+                standby._discarded = True
+                prepared = standby._preparation_done
+            # A standby that is still being prepared is shut down by its own thread
+            if prepared and standby._preparation_error is None:
+                standby.shutdown()
+
+        self._standby = None
+        self._standby_thread = None
+
+    def health_check(self) -> bool:
+        """
+        Check that the browser still responds to commands and has an open window.
+
+        Returns:
+            bool: True if the browser is usable, False otherwise
+        """
+        if self.driver is None:
+            return False
+
+        try:
+            return self.driver.execute_script('return 1;') == 1 and len(self.driver.window_handles) > 0
+        except BaseException as e:
+            self.log(f'Browser health check failed: {e}')
+            return False
+
+    def soft_reset(self, config: PageSetupConfig) -> bool:
+        """
+        Reset the running browser in place instead of relaunching it.
+
+        Closes all tabs but the first one, clears cookies and storage of the task page origin over CDP and then runs
+        `teardown` to get back to the task page.
+
+        Args:
+            config: Configuration object containing all setup parameters
+
+        Returns:
+            bool: True if the browser was reset, False if it has to be relaunched
+        """
+        url = urllib.parse.urlsplit(config.initial_url)
+        origin = f'{url.scheme}://{url.netloc}'
+
+        try:
+            handles = self.driver.window_handles
+            for handle in handles[1:]:
+                self.driver.switch_to.window(handle)
+                self.driver.close()
+            self.driver.switch_to.window(handles[0])
+
+            # Session storage belongs to the tab and is not covered by Storage.clearDataForOrigin
+            current_url = urllib.parse.urlsplit(self.driver.current_url)
+            if f'{current_url.scheme}://{current_url.netloc}' == origin:
+                self.driver.execute_script('window.sessionStorage.clear();')
+
+            cookies = self.driver.execute_cdp_cmd('Network.getCookies', {'urls': [config.initial_url]})
+            for cookie in cookies.get('cookies', []):
+                self.driver.execute_cdp_cmd('Network.deleteCookies', {
+                    'name': cookie['name'], 'domain': cookie['domain'], 'path': cookie['path']
+                })
+            self.driver.execute_cdp_cmd('Storage.clearDataForOrigin', {'origin': origin, 'storageTypes': 'all'})
+            self.driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': []})
+
+            self.teardown(config)
+        except BaseException as e:
+            self.error(f'Failed to soft reset the browser: {e}')
+            metrics.soft_resets.inc(result='failed')
+            return False
+
+        self.log(f'Browser was soft reset after {self.tasks_since_launch} task(s) since launch')
+        metrics.soft_resets.inc(result='succeeded')
+        return True
+
+    def browser_rss(self) -> int:
+        """Resident memory of chromedriver and the browser processes in bytes."""
+        import psutil
+
+        processes = {}
+        service_process = getattr(getattr(self.driver, 'service', None), 'process', None)
+        browser_pid = self.browser_state.pid if self.browser_state is not None else None
+        # undetected-chromedriver starts the browser itself, not as a child of chromedriver
+        for pid in (getattr(service_process, 'pid', None), browser_pid, getattr(self.driver, 'browser_pid', None)):
+            if pid is None:
+                continue
+            try:
+                process = psutil.Process(pid)
+                for item in [process] + process.children(recursive=True):
+                    processes[item.pid] = item
+            except psutil.Error:
+                continue
+
+        rss = 0
+        for process in processes.values():
+            try:
+                rss += process.memory_info().rss
+            except psutil.Error:
+                continue
+        return rss
+
     # Prepare the state page before submitting form data with ID/DL data
     def tearup(self, config: PageSetupConfig) -> list[str]:
         """
@@ -295,18 +670,12 @@ class TaskService:
         self.driver.get(config.initial_url)
         self.log(f'Waiting for {config.initial_url} to load ...')
 
-        while True:
-            try:
-                ready_state = self.driver.execute_script('return document.readyState')
-                logger.debug(f'document.readyState: {ready_state}')
-                if ready_state in ['loading', 'interactive', 'complete']:
-                    logger.debug('Page started loading')
-                    break
-            except Exception:
-                pass
-            time.sleep(0.1)
-        self.log(f'Page {config.initial_url} has loaded')
-        return self.RS.Logs
+        result = self.wait_for_ready_state('tearup', 'loading', PAGE_START_TIMEOUT_MS)
+        if result.ready:
+            self.log(f'Page {config.initial_url} has loaded')
+        else:
+            self.log(f'Page {config.initial_url} did not start loading within {PAGE_START_TIMEOUT_MS} ms.')
+        return self.RS.Logs.messages()
 
     # Prepare the state page after ID/DL data was obtained
     def teardown(self, config: PageSetupConfig) -> list[str]:
@@ -325,17 +694,11 @@ class TaskService:
 
         logs.append(f'Waiting for {config.initial_url} to load ...')
 
-        while True:
-            try:
-                ready_state = self.driver.execute_script('return document.readyState')
-                logger.debug(f'document.readyState: {ready_state}')
-                if ready_state in ['loading', 'interactive', 'complete']:
-                    logger.debug('Page started loading')
-                    break
-            except Exception:
-                pass
-            time.sleep(0.1)
-        logs.append(f'Page {config.initial_url} has loaded')
+        result = self.wait_for_ready_state('teardown', 'loading', PAGE_START_TIMEOUT_MS)
+        if result.ready:
+            logs.append(f'Page {config.initial_url} has loaded')
+        else:
+            logs.append(f'Page {config.initial_url} did not start loading within {PAGE_START_TIMEOUT_MS} ms.')
         return logs
 
     # Enters the data and obtains driver license validation results
@@ -350,44 +713,135 @@ class TaskService:
         response.Error = "Not Implemented"
         return response
 
+    def step_timeout(self, timeout_in_ms: int) -> int:
+        """
+        Timeout of the next step of the job, cut down to what is left of its deadline.
+
+        Raises:
+            DeadlineExceededException: If the deadline of the job has passed
+        """
+        if self.deadline is None:
+            return timeout_in_ms
+        return self.deadline.step(timeout_in_ms, self.RS.Stage)
+
+    def record_step(self, allotted_ms: int, elapsed_ms: int):
+        """Account the time a step took to the current stage of the job."""
+        if self.deadline is not None:
+            self.deadline.record(self.RS.Stage, allotted_ms, elapsed_ms)
+
+    def mark(self, point: str):
+        """Record a point of the timeline of the job in progress."""
+        if self.timeline is not None:
+            self.timeline.mark(point)
+
+    def restore_page_load_timeout(self, timeout: Optional[float]):
+        """Put back the page load timeout a step replaced, so later page loads do not inherit a step timeout."""
+        if timeout is None:
+            return
+        try:
+            self.driver.set_page_load_timeout(timeout)
+        except Exception as e:
+            logger.warning(f'Failed to restore the page load timeout: {e}')
+
     # Load a page with a timeout
     def load_page(self, initial_url: str, timeout_in_ms: int) -> ComplaintTaskRS:
+        timeout_in_ms = self.step_timeout(timeout_in_ms)
+        started = time.monotonic()
+        previous_timeout = None
         try:
             if timeout_in_ms > 0:
+                previous_timeout = self.driver.timeouts.page_load
                 self.driver.set_page_load_timeout(timeout_in_ms / 1000)
             self.log(f'Obtaining page URL of {initial_url} for {self.__class__.__name__}')
             self.driver.get(initial_url)
+        except BrowserHungException:
+            raise
         except BaseException as e:
             self.log(f'Failed to load the page URL {initial_url}: ' + str(e))
-            self.RS.Body = self.driver.page_source
+            self.capture_snapshot(e)
+        finally:
+            self.restore_page_load_timeout(previous_timeout)
+        self.record_step(timeout_in_ms, round((time.monotonic() - started) * 1000))
 
         return self.RS
 
+    def wait_for_ready_state(self, label: str, target: str = 'complete', timeout_in_ms: int = 5000) -> WaitResult:
+        """
+        Wait for the current document to reach the `target` readyState and record how long it took.
+
+        Args:
+            label: Name of the wait, used in logs and `wait_timings`
+            target: One of `loading`, `interactive` or `complete`
+            timeout_in_ms: Deadline for the wait in milliseconds
+
+        Returns:
+            WaitResult: Outcome of the wait
+        """
+        timeout_in_ms = self.step_timeout(timeout_in_ms)
+        result = wait_for_ready_state(self.driver, target, timeout_in_ms)
+        self.wait_timings.append((label, result.elapsed_ms))
+        self.record_step(timeout_in_ms, result.elapsed_ms)
+        logger.debug(f'Wait {label} for readyState {target}: ready={result.ready}, {result.elapsed_ms} ms.')
+        return result
+
     def wait_for_page_to_load(self, timeout_in_ms: int = 5000) -> ComplaintTaskRS:
+        timeout_in_ms = self.step_timeout(timeout_in_ms)
+        previous_timeout = None
         try:
-            self.RS.Body = self.driver.page_source
             if timeout_in_ms > 0:
+                previous_timeout = self.driver.timeouts.page_load
                 self.driver.set_page_load_timeout(timeout_in_ms / 1000)
-            while self.driver.execute_script("return document.readyState") != "complete":
-                pass
+            result = self.wait_for_ready_state('page_load', 'complete', timeout_in_ms)
+            if not result.ready:
+                raise TimeoutException(f'document.readyState is {result.state or "unknown"}')
+        except (DeadlineExceededException, BrowserHungException):
+            raise
         except BaseException as e:
             self.log(f'Failed to load the page within timeout of {timeout_in_ms} ms.: ' + str(e))
-            self.RS.Body = self.driver.page_source
+            self.capture_snapshot(e)
+        finally:
+            self.restore_page_load_timeout(previous_timeout)
 
         return self.RS
 
+    def wait_for_elements(self, label: str, locators: list[tuple[str, str]], condition: str = 'visible',
+                          timeout_in_ms: int = 5000, match: str = 'any') -> ElementWaitResult:
+        """
+        Wait for one or several elements and record how long it took.
+
+        Args:
+            label: Name of the wait, used in logs and `wait_timings`
+            locators: List of (By, value) locator pairs
+            condition: One of `present`, `visible` or `clickable`
+            timeout_in_ms: Deadline for the wait in milliseconds
+            match: `any` to resolve on the first matching locator, `all` to wait for every locator
+
+        Returns:
+            ElementWaitResult: Outcome of the wait with the matched elements
+        """
+        timeout_in_ms = self.step_timeout(timeout_in_ms)
+        result = wait_for_elements(self.driver, locators, condition, timeout_in_ms, match)
+        self.wait_timings.append((label, result.elapsed_ms))
+        self.record_step(timeout_in_ms, result.elapsed_ms)
+        logger.debug(f'Wait {label} for {condition} {locators}: ready={result.ready}, {result.elapsed_ms} ms.')
+        return result
+
     # Wait for element to appear on the page and be clickable, with the timeout
     def wait_for_element_to_be_clickable(self, element: str, selector: str,
                                          timeout_in_ms: int = 5000) -> ComplaintTaskRS:
         if timeout_in_ms == 0:
             return self.RS
 
-        wait_timeout = WebDriverWait(self.driver, timeout_in_ms / 1000, poll_frequency=0.5)
+        timeout_in_ms = self.step_timeout(timeout_in_ms)
         try:
-            wait_timeout.until(EC.element_to_be_clickable((selector, element)))
+            result = self.wait_for_elements(element, [(selector, element)], 'clickable', timeout_in_ms)
+            if not result.ready:
+                raise TimeoutException(f'{element} is not clickable')
+        except (DeadlineExceededException, BrowserHungException):
+            raise
         except BaseException as e:
             self.log(f'Failed to locate element {element} on the page in {timeout_in_ms} ms. timeout: ' + str(e))
-            self.RS.Body = self.driver.page_source
+            self.capture_snapshot(e)
 
         return self.RS
 
@@ -397,12 +851,16 @@ class TaskService:
         if timeout_in_ms == 0:
             return self.RS
 
-        wait_timeout = WebDriverWait(self.driver, timeout_in_ms / 1000, poll_frequency=0.5)
+        timeout_in_ms = self.step_timeout(timeout_in_ms)
         try:
-            wait_timeout.until(EC.visibility_of_element_located((selector, element)))
+            result = self.wait_for_elements(element, [(selector, element)], 'visible', timeout_in_ms)
+            if not result.ready:
+                raise TimeoutException(f'{element} is not visible')
+        except (DeadlineExceededException, BrowserHungException):
+            raise
         except BaseException as e:
             self.log(f'Failed to locate element {element} on the page in {timeout_in_ms} ms. timeout: ' + str(e))
-            self.RS.Body = self.driver.page_source
+            self.capture_snapshot(e)
 
         return self.RS
 
@@ -510,14 +968,12 @@ class TaskService:
         return []
 
     def log(self, logs: str):
-        log_message = f'[{datetime.now(timezone.utc).strftime("%Y-%m-%d-%H:%M:%S.%f")[:-3]}] - {logs}'
+        log_message = self.RS.Logs.record(logging.INFO, logs).format()
         logger.info(log_message)
-        self.RS.Logs.append(log_message)
 
     def error(self, logs: str):
-        log_message = f'[{datetime.now(timezone.utc).strftime("%Y-%m-%d-%H:%M:%S.%f")[:-3]}] - {logs}'
+        log_message = self.RS.Logs.record(logging.ERROR, logs).format()
         logger.error(log_message)
-        self.RS.Logs.append(log_message)
         self.RS.Error = log_message
 
     def human_like_typing(self,
@@ -538,6 +994,8 @@ class TaskService:
         """
         Send a submission verification callback to the CallbackUrl from self.RQ.
         Creates a SubmissionVerificationTaskRQ using data from self.RQ and the provided parameters.
+        With `CallbackSettings.OUTBOX` the callback is written to the outbox and delivered by the callback sender;
+        it is posted directly only when the outbox cannot be written.
 
         Args:
             verified: Whether the submission was verified successfully
@@ -547,7 +1005,7 @@ class TaskService:
             submission_details: Additional submission details
 
         Returns:
-            bool: True if callback was sent successfully, False otherwise
+            bool: True if callback was queued or sent successfully, False otherwise
         """
         try:
             # Create verification request using data from self.RQ
@@ -561,22 +1019,29 @@ class TaskService:
             verification_request.SubmissionDetails['recaptcha_score'] = self.proxy_config.recaptcha_score
             verification_request.SubmissionDetails['proxy_change_attempts'] = self.proxy_config.proxy_change_attempts
 
-            # Send POST request
-            headers = {
-                'Content-Type': 'application/json',
-                'Accept': 'application/json'
-            }
+            body = verification_request.to_request_body()
+            if cfg.CallbackSettings.OUTBOX:
+                try:
+                    entry_id = enqueue_callback(cfg.RedisSettings.rds(), self.RQ.CallbackUrl, body,
+                                                self.RQ.SessionUID)
+                    self.log(f'Verification callback to {self.RQ.CallbackUrl} queued as {entry_id}')
+                    self.mark(CALLBACK)
+                    return True
+                except Exception as e:
+                    logger.warning(f'Failed to queue verification callback, sending it directly: {e}')
 
+            timeout = cfg.CallbackSettings.TIMEOUT
+            if self.deadline is not None:
+                # The callback reports the outcome of the job, it is sent even if the deadline has passed
+                timeout = self.deadline.clamp(round(timeout * 1000), CALLBACK_MIN_TIMEOUT_MS) / 1000
             self.log(f'Sending verification callback to {self.RQ.CallbackUrl}')
-            response = requests.post(
-                self.RQ.CallbackUrl,
-                data=json.dumps(verification_request.to_request_body()),
-                headers=headers,
-                timeout=30
-            )
+            started = time.monotonic()
+            response = post_callback(self.RQ.CallbackUrl, body, timeout)
+            self.record_step(round(timeout * 1000), round((time.monotonic() - started) * 1000))
 
             if response.status_code in [200, 201, 202]:
                 self.log(f'Callback sent successfully. Status: {response.status_code}')
+                self.mark(CALLBACK)
                 return True
             else:
                 self.error(f'Callback failed with status {response.status_code}: {response.text}')
@@ -586,74 +1051,78 @@ class TaskService:
             self.error(f'Failed to send verification callback: {str(e)}')
             return False
 
-    def find_and_verify_element(self, locator_type, locator_value: str, field_name: str) -> WebElement:
+    def fill_form_field(self, locator_type, locator_value: str, field_name: str, text_value: str):
         """
-        Verify an element is visible and find it.
+        Complete form field interaction: find, verify, scroll, click, and type.
 
         Args:
             locator_type: The type of locator (e.g., By.ID, By.CLASS_NAME)
             locator_value: The value of the locator
             field_name: Human-readable name for the field (used in error messages)
-
-        Returns:
-            WebElement: The found element
+            text_value: The text to type into the field
 
         Raises:
-            Exception: If element is not visible or cannot be found
-        """
-        try:
-            if EC.visibility_of_element_located((locator_type, locator_value)):
-                element = self.SB.find_element(locator_type, locator_value)
-                return element
-            else:
-                raise Exception(f'{field_name} field is not visible')
-        except BaseException as ex:
-            self.error(f'Failed to find {field_name} field and/or scroll it into view: ' + str(ex))
-            self.RS.Body = self.driver.page_source
-            raise ex
-
-    def scroll_and_interact_with_element(self, element: WebElement, field_name: str):
+            Exception: If any step of the interaction fails
         """
-        Scroll element into view, move to it, and click it.
-
-        Args:
-            element: The WebElement to interact with
-            field_name: Human-readable name for the field (used in error messages)
+        report = self.fill_form([FormField(locator_type, locator_value, field_name, text_value)])
+        if not report.ok:
+            raise Exception(f'Failed to fill {field_name} field: {report.fields[0].error}')
 
-        Raises:
-            Exception: If interaction fails
+    def fill_form(self, fields: list[FormField], timeout_in_ms: int = 5000,
+                  stop_on_error: bool = True) -> FormFillReport:
         """
-        try:
-            self.driver.execute_script("arguments[0].scrollIntoView(true);", element)
-            actions = ActionChains(self.driver)
-            actions.move_to_element(element)
-            actions.click()
-            actions.perform()
-        except BaseException as ex:
-            self.error(f'Failed to scroll and interact with {field_name} field: ' + str(ex))
-            self.RS.Body = self.driver.page_source
-            raise ex
+        Fill several form fields, resolving and validating all of their elements in a single script round trip.
 
-    def fill_form_field(self, locator_type, locator_value: str, field_name: str, text_value: str):
-        """
-        Complete form field interaction: find, verify, scroll, click, and type.
+        Each field is then scrolled to, clicked and typed into using the element handles obtained up front.
 
         Args:
-            locator_type: The type of locator (e.g., By.ID, By.CLASS_NAME)
-            locator_value: The value of the locator
-            field_name: Human-readable name for the field (used in error messages)
-            text_value: The text to type into the field
+            fields: Fields to fill, in order
+            timeout_in_ms: How long to wait for all the fields to become visible
+            stop_on_error: Whether to skip the remaining fields after the first one that fails
+
+        Returns:
+            FormFillReport: Time spent resolving the elements and the timing and error of every field
 
         Raises:
-            Exception: If any step of the interaction fails
+            DeadlineExceededException: If the deadline of the job passes before all fields are filled
         """
-        try:
-            element = self.find_and_verify_element(locator_type, locator_value, field_name)
-            self.scroll_and_interact_with_element(element, field_name)
-            self.human_like_typing(element, text_value)
-
-        except BaseException as ex:
-            self.error(f'Failed to fill {field_name} field: ' + str(ex))
-            self.RS.Body = self.driver.page_source
-            raise ex
+        report = FormFillReport(fields=[FormFieldReport(form_field.field_name) for form_field in fields])
+        locators = [(form_field.locator_type, form_field.locator_value) for form_field in fields]
+
+        result = self.wait_for_elements('form', locators, 'visible', timeout_in_ms, match='all')
+        report.resolve_ms = result.elapsed_ms
+        if result.ready:
+            resolved = [(element, '') for element in result.elements]
+        else:
+            resolved = resolve_elements(self.driver, locators, 'visible')
+
+        for form_field, (element, reason), field_report in zip(fields, resolved, report.fields):
+            if stop_on_error and not report.ok:
+                field_report.error = 'skipped after a previous error'
+                continue
+
+            # Typing is not bounded by a timeout of its own, only by the deadline of the job
+            self.step_timeout(0)
+            started = time.monotonic()
+            try:
+                if element is None:
+                    raise Exception(f'{form_field.field_name} field is {reason}')
+                # Scrolling, moving and clicking are sent as one action sequence
+                ActionChains(self.driver).scroll_to_element(element).move_to_element(element).click().perform()
+                self.human_like_typing(element, form_field.value)
+            except BrowserHungException:
+                raise
+            except BaseException as ex:
+                field_report.error = str(ex)
+                self.error(f'Failed to fill {form_field.field_name} field: ' + str(ex))
+            field_report.elapsed_ms = round((time.monotonic() - started) * 1000)
+            self.record_step(0, field_report.elapsed_ms)
+
+        if not report.ok:
+            self.capture_snapshot()
+
+        self.log('Form filled in {} ms. ({} ms. resolving): {}'.format(
+            report.resolve_ms + sum(field_report.elapsed_ms for field_report in report.fields), report.resolve_ms,
+            ', '.join(f'{field_report.field_name}={field_report.elapsed_ms} ms.' for field_report in report.fields)))
+        return report
 
@@ -1,5 +1,5 @@
-import json
 import logging
+import math
 import os
 import platform
 import signal
@@ -13,22 +13,38 @@ from typing import Optional
 import celery
 from celery import signals
 from celery.concurrency import asynpool
-from celery.exceptions import MaxRetriesExceededError
+from celery.exceptions import Ignore, MaxRetriesExceededError, Retry
 from dotenv import load_dotenv
 from pyvirtualdisplay import Display
 from pyvirtualdisplay.abstractdisplay import XStartTimeoutError
 from requests.exceptions import ProxyError
-from selenium.common import TimeoutException, WebDriverException
+from selenium.common import WebDriverException
 import selenium_worker.config as cfg
-from selenium_worker.Requests.ComplaintTaskRQ import ComplaintTaskRQ, ComplaintTaskRQEncoder
-from selenium_worker.Responses.ComplaintTaskRS import ComplaintTaskRS, ComplaintTaskRSEncoder
+from selenium_worker import metrics
+from selenium_worker.Requests.ComplaintTaskRQ import ComplaintTaskRQ
+from selenium_worker.Requests.validation import parse_request
+from selenium_worker.Responses.ComplaintTaskRS import ComplaintTaskRS
 from selenium_worker.Services.TaskService import TaskService, PageSetupConfig
-from selenium_worker.exceptions import RetryException
+from selenium_worker.constants import STAGE_OBTAINED_RESULTS
+from selenium_worker.deadline import Deadline
+from selenium_worker.deadletter import DEAD_LETTER_STREAM, dead_letter
+from selenium_worker.drain import get_drain
+from selenium_worker.exceptions import BrowserHungException, DeadlineExceededException, RetryException
+from selenium_worker.idempotency import Claim, JobClaims, DONE, get_job_claims
+from selenium_worker.jobmeta import get_job_store, get_job_archiver
+from selenium_worker.models import encode
+from selenium_worker.outbox import get_callback_sender, stop_callback_sender
+from selenium_worker.profiler import CommandProfiler
+from selenium_worker.recovery import Escalation, get_recovery_policy
+from selenium_worker.reaper import get_reaper
+from selenium_worker.routing import route_job
+from selenium_worker.timeline import BROWSER_READY, ENQUEUED_HEADER, FINISHED, PAGE_READY, TEARDOWN_COMPLETE, \
+    JobTimeline
+from selenium_worker.watchdog import BrowserWatchdog, get_watchdog
 from selenium_worker.vars import task_type_classes, task_page_urls, task_type_names, \
     worker_type_minimum_recaptcha_scores, task_queues, task_names
-from selenium_worker.enums import WorkerType
-from selenium_worker.utils import date_parser, date_encoder, build_pypasser_config_json, build_nopecha_config, \
-    time_diff_ms
+from selenium_worker.enums import WorkerType, RecoveryAction
+from selenium_worker.utils import build_pypasser_config_json, build_nopecha_config, time_diff_ms
 
 # Disable SeleniumBase colored tracebacks to prevent terminal issues during shutdown
 os.environ['DISABLE_COLORED_TRACEBACK'] = '1'
@@ -39,6 +55,12 @@ task_service: Optional[TaskService] = None
 display: Optional[Display] = None
 worker_started_at: Optional[datetime] = None
 last_task_finished_at: Optional[datetime] = None
+# Claim held by the job that is currently running
+current_claim: Optional[Claim] = None
+# Set once the resources of the process were released for a drain
+drain_finished = False
+# Timeline of the last job that ran in the browser, completed by its post-run tear-down
+job_timeline: Optional[JobTimeline] = None
 
 logger.info('Creating Celery application ...')
 app = celery.Celery(
@@ -51,10 +73,223 @@ app = celery.Celery(
 
 logger.info('Celery application was created successfully')
 
+
+def page_setup_config() -> PageSetupConfig:
+    minimum_recaptcha_score = cfg.ProxySettings.MIN_RECAPTCHA_SCORE
+    if cfg.GeneralSettings.worker_type() in worker_type_minimum_recaptcha_scores.keys():
+        minimum_recaptcha_score = worker_type_minimum_recaptcha_scores[cfg.GeneralSettings.worker_type()]
+
+    return PageSetupConfig(
+        initial_url=task_page_urls[cfg.GeneralSettings.worker_type()],
+        downloads_path=cfg.CacheSettings.DOWNLOADS_PATH,
+        recaptcha_score_threshold=minimum_recaptcha_score,
+        rds=rds
+    )
+
+
+def relaunch_browser(config: PageSetupConfig, tearup: bool = False):
+    """
+    Replace the browser with a freshly launched one and bring it to the task page.
+
+    Args:
+        config: Setup of the task page
+        tearup: Set the browser up as during worker initialization instead of as after a job
+    """
+    # Shutdown browser so that it is re-created to continue from cached state
+    task_service.shutdown(True)
+
+    # Prepare driver and user data directory
+    task_service.init_browser(cfg.GeneralSettings.browser_driver_type(), task_names[cfg.GeneralSettings.worker_type()])
+    if tearup:
+        task_service.driver.set_page_load_timeout(20.0)
+    task_service.driver.switch_to.window(task_service.driver.current_window_handle)
+    if tearup:
+        logger.info(f'=== {task_type_names[cfg.GeneralSettings.worker_type()]} TEAR-UP BEGIN ===')
+        task_service.tearup(config)
+        logger.info(f'=== {task_type_names[cfg.GeneralSettings.worker_type()]} TEAR-UP COMPLETE ===')
+    else:
+        logger.info(f'=== {task_type_names[cfg.GeneralSettings.worker_type()]} TEAR-DOWN BEGIN ===')
+        task_service.teardown(config)
+
+
+def restart_process(reason: str):
+    """Last resort of the recovery policy: shut the browser down and let supervisor start a new process."""
+    # A redelivery of the running job must not wait for the lease of a process that is gone
+    release_claim()
+    try:
+        if task_service is not None:
+            task_service.discard_standby()
+            task_service.shutdown()
+        if not get_reaper().flush(cfg.RecoverySettings.REAPER_FLUSH_TIMEOUT):
+            logger.warning('User data directories are still being deleted, the reaper sweep will finish them')
+    except Exception as e:
+        logger.error(f'Failed to clean up before restarting the process: {e}')
+
+    logger.error(f'Terminating process with ID of {os.getpid()} due to {reason}')
+    os.kill(os.getpid(), signal.SIGKILL)
+
+
+def claim_job(request: ComplaintTaskRQ, job_uid: str) -> Optional[Claim]:
+    """Claim the complaint of a job; returns None if claims are disabled or the request has no complaint key."""
+    global current_claim
+    key = JobClaims.key(request)
+    if not cfg.IdempotencySettings.ENABLED or key is None:
+        return None
+
+    claim = get_job_claims().claim(key, job_uid)
+    if claim.acquired:
+        current_claim = claim
+    return claim
+
+
+def complete_claim(response: ComplaintTaskRS, encoded_response: str):
+    """
+    Store the response of a successful job with its claim; failed jobs keep the claim until it is released.
+
+    Only a response that reached STAGE_OBTAINED_RESULTS, i.e. whose verification callback was queued or delivered,
+    counts as a success: a redelivery of a job stored as done is answered from the claim without the browser.
+    """
+    global current_claim
+    if current_claim is None or response.Error or response.Errors or response.Stage != STAGE_OBTAINED_RESULTS:
+        return
+
+    claim, current_claim = current_claim, None
+    try:
+        get_job_claims().complete(claim, encoded_response)
+    except Exception as e:
+        logger.error(f'Failed to store the outcome of job {claim.job_uid}: {e}')
+
+
+def release_claim():
+    global current_claim
+    claim, current_claim = current_claim, None
+    if claim is None:
+        return
+
+    try:
+        get_job_claims().release(claim)
+    except Exception as e:
+        logger.error(f'Failed to release the claim of job {claim.job_uid}: {e}')
+
+
+def record_failure(job_uid: str, error: BaseException):
+    """Keep the error and the snapshot of a failure with the job, for the dead-letter entry if it gets quarantined."""
+    try:
+        get_job_store().update(job_uid, {
+            'last_error': f'{type(error).__name__}: {error}',
+            'snapshot_ref': (task_service.RS.BodyRef or None) if task_service is not None else None
+        })
+    except Exception as e:
+        logger.error(f'Failed to record the failure of job {job_uid}: {e}')
+
+
+def quarantine_job(job_uid: str, payload, crashes: int):
+    """Move a job that keeps crashing its workers to the dead-letter stream."""
+    job_store = get_job_store()
+    last_failure = job_store.load(job_uid, ['last_error', 'snapshot_ref'])
+    dead_letter(cfg.RedisSettings.rds(), job_uid, payload, f'Job did not finish in {crashes} executions',
+                last_failure.get('last_error', ''), last_failure.get('snapshot_ref', ''), crashes)
+    job_store.update(job_uid, {'quarantined': True, 'crashes': crashes})
+
+
+def browser_pid(service: TaskService) -> Optional[int]:
+    """PID of a detached browser, which the watchdog cannot find among the children of chromedriver."""
+    return service.browser_state.pid if service.browser_state is not None else None
+
+
+def record_escalation(escalation: Escalation, job_uid: str = '', escalations: Optional[list[Escalation]] = None):
+    logger.warning(f'Recovery action {escalation.action} for {escalation.error} at level {escalation.level} '
+                   f'{"succeeded" if escalation.succeeded else "failed"} in {escalation.elapsed_ms} ms.')
+    metrics.recoveries.inc(action=str(escalation.action), result='succeeded' if escalation.succeeded else 'failed')
+    if escalations is None or not job_uid:
+        return
+
+    escalations.append(escalation)
+    try:
+        get_job_store().update(job_uid, {'recovery': [item.to_list() for item in escalations]})
+    except Exception as e:
+        logger.error(f'Failed to record recovery of job {job_uid}: {e}')
+
+
+def recover(error: BaseException, job_uid: str = '', escalations: Optional[list[Escalation]] = None,
+            relaunch_only: bool = False, tearup: bool = False) -> Escalation:
+    """
+    Apply the recovery action the policy picks for a failure, escalating further while actions fail.
+
+    Args:
+        error: The failure
+        job_uid: UID of the job the escalations are recorded for, if any
+        escalations: Escalations of the job so far, extended in place
+        relaunch_only: Relaunch the browser for every action short of a restart, for failures during browser setup
+        tearup: Set relaunched browsers up as during worker initialization
+
+    Returns:
+        Escalation: The action that succeeded; a restart does not return
+    """
+    policy = get_recovery_policy()
+    while True:
+        escalation = policy.escalate(error)
+        if escalation.action == RecoveryAction.RESTART:
+            record_escalation(escalation, job_uid, escalations)
+            restart_process(f'{escalation.error} persisting after {escalation.level} recovery attempts')
+            return escalation
+
+        started = time.monotonic()
+        try:
+            if relaunch_only or escalation.action == RecoveryAction.RELAUNCH:
+                escalation.action = RecoveryAction.RELAUNCH
+                relaunch_browser(page_setup_config(), tearup)
+                escalation.succeeded = True
+            elif escalation.action == RecoveryAction.SOFT_RESET:
+                escalation.succeeded = task_service.health_check() and task_service.soft_reset(page_setup_config())
+            else:
+                escalation.succeeded = task_service.health_check()
+        except Exception as e:
+            logger.error(f'Recovery action {escalation.action} failed: {e} - {traceback.format_exc()}')
+            error = e
+
+        escalation.elapsed_ms = round((time.monotonic() - started) * 1000)
+        record_escalation(escalation, job_uid, escalations)
+        if escalation.succeeded:
+            return escalation
+
+def seconds_since_last_task() -> float:
+    since = last_task_finished_at or worker_started_at
+    return (datetime.now(timezone.utc) - since).total_seconds() if since is not None else 0
+
+
+def start_metrics():
+    """Serve the metrics of the worker process, if `MetricsSettings.PORT` is set."""
+    if cfg.MetricsSettings.PORT <= 0:
+        return
+
+    metrics.worker_info.set(1, worker=cfg.GeneralSettings.WORKER_UID, type=cfg.GeneralSettings.WORKER_TYPE)
+    metrics.browser_rss.set_function(lambda: task_service.browser_rss() if task_service is not None else 0)
+    metrics.since_last_task.set_function(seconds_since_last_task)
+    if cfg.WatchdogSettings.ENABLED:
+        metrics.watchdog_aborts.set_function(lambda: get_watchdog().aborts)
+        metrics.watchdog_reclaimed.set_function(lambda: get_watchdog().reclaimed_seconds)
+    metrics.start_metrics_server(cfg.MetricsSettings.PORT, cfg.MetricsSettings.HOST)
+
+
+def recover_init(error: BaseException):
+    """Recover from a failed worker initialization, finishing it as `init` would have."""
+    if task_service is None:
+        # There is no browser to recover
+        restart_process(f'{type(error).__name__} before the task service was created: {error}')
+        return
+
+    escalation = recover(error, relaunch_only=True, tearup=True)
+    if escalation.succeeded and cfg.BrowserSettings.WARM_STANDBY:
+        task_service.start_standby(cfg.GeneralSettings.browser_driver_type(),
+                                   task_names[cfg.GeneralSettings.worker_type()], page_setup_config())
+
+
 @signals.worker_process_init.connect
 def init(**args):
     global display
     global task_service
+    global worker_started_at
     logger.info('Begin worker initialization ...')
 
     worker_started_at = datetime.now(timezone.utc)
@@ -75,6 +310,16 @@ def init(**args):
                 os.kill(os.getpid(), signal.SIGKILL)
                 return None
 
+        # Start the reaper early so that directories left behind by killed worker processes are swept
+        get_reaper()
+        if cfg.JobMetaSettings.archiving() or cfg.JobMetaSettings.TTL > 0:
+            get_job_archiver()
+        if cfg.CallbackSettings.OUTBOX and cfg.CallbackSettings.SENDER:
+            get_callback_sender()
+        if cfg.WatchdogSettings.ENABLED:
+            get_watchdog()
+        start_metrics()
+
         logger.info('Starting worker initialization ...')
         initial_url = task_page_urls[cfg.GeneralSettings.worker_type()]
         task_type = task_names[cfg.GeneralSettings.worker_type()]
@@ -92,44 +337,30 @@ def init(**args):
             return None
 
         response = response_type()
-        response.Logs = list()
         response.Error = ''
         task_service.RS = response
         response_encoder = response_encoder_type()
 
-        minimum_recaptcha_score = cfg.ProxySettings.MIN_RECAPTCHA_SCORE
-        if cfg.GeneralSettings.worker_type() in worker_type_minimum_recaptcha_scores.keys():
-            minimum_recaptcha_score = worker_type_minimum_recaptcha_scores[cfg.GeneralSettings.worker_type()]
-
         task_service.init_browser(cfg.GeneralSettings.browser_driver_type(), task_type)
         task_service.driver.set_page_load_timeout(20.0)
         task_service.driver.switch_to.window(task_service.driver.current_window_handle)
 
         logger.info(f'=== {task_type_names[cfg.GeneralSettings.worker_type()]} TEAR-UP BEGIN ===')
-        tearup_config = PageSetupConfig(
-            initial_url=initial_url,
-            downloads_path=cfg.CacheSettings.DOWNLOADS_PATH,
-            recaptcha_score_threshold=minimum_recaptcha_score,
-            rds=rds
-        )
+        tearup_config = page_setup_config()
         task_service.tearup(tearup_config)
         logger.info(f'=== {task_type_names[cfg.GeneralSettings.worker_type()]} TEAR-UP COMPLETE ===')
+
+        if cfg.BrowserSettings.WARM_STANDBY:
+            task_service.start_standby(cfg.GeneralSettings.browser_driver_type(), task_type, tearup_config)
         return None
 
     except ProxyError as pe:
         logger.error('Proxy exception during worker initialization: {}: {}'.format(pe, traceback.format_exc()))
-        if task_service is not None and task_service.driver is not None:
-            task_service.shutdown()
-        logger.error(
-            f'Terminating {cfg.GeneralSettings.WORKER_TYPE} worker process with UID of {os.getpid()} due to proxy error')
-        os.kill(os.getpid(), signal.SIGKILL)
+        recover_init(pe)
         return None
     except Exception as e:
         logger.error('General exception during worker initialization: {}: {}'.format(e, traceback.format_exc()))
-        if task_service is not None and task_service.driver is not None:
-            task_service.shutdown()
-        logger.error(f'Terminating worker process with UID of {os.getpid()} due to Exception')
-        os.kill(os.getpid(), signal.SIGKILL)
+        recover_init(e)
         return None
 
 @signals.worker_process_shutdown.connect
@@ -141,6 +372,7 @@ def deinit(**args):
         logger.info('De-initializing worker process with ID {}'.format(os.getpid()))
         if not (display is None):
             display.stop()
+        task_service.discard_standby()
         task_service.shutdown()
     except Exception as e:
         logger.error('General exception during worker de-initialization: {} - {}'.format(e, traceback.format_exc()))
@@ -148,69 +380,89 @@ def deinit(**args):
         os.kill(os.getpid(), signal.SIGKILL)
 
 
+@signals.before_task_publish.connect
+def stamp_enqueue_time(headers=None, **kwargs):
+    """Record the publish time of jobs published by the worker itself, e.g. rerouted ones."""
+    if headers is not None:
+        headers.setdefault(ENQUEUED_HEADER, time.time())
+
+
 @signals.task_postrun.connect
 def should_restart(**args):
     global display
     global task_service
     global last_task_finished_at
+    global job_timeline
 
-    meta = rds.get('job.{}'.format(args['task_id'])) or '{}'
-    meta = json.loads(meta, object_hook=date_parser)
+    job_store = get_job_store()
+    task_post_run = job_store.get(args['task_id'], 'task_post_run')
 
     last_task_finished_at = datetime.now(timezone.utc)
+    idle_started = time.monotonic()
+
+    # The process exits after this job, preparing the browser for another one is wasted
+    if get_drain().draining:
+        return None
 
     # If no value specified, exit and do not do postrun
-    if 'task_post_run' not in meta or meta['task_post_run'] is None or meta['task_post_run'] == '':
+    if task_post_run is None or task_post_run == '':
         return None
 
+    if task_service is not None:
+        task_service.tasks_since_launch += 1
+
     try:
         for retry in range(3):
             try:
                 if cfg.GeneralSettings.WORKER_TYPE != -1 and cfg.GeneralSettings.worker_type() in task_page_urls.keys():
                     service_type, request_type, request_encoder_type, response_type, response_encoder_type = task_type_classes[cfg.GeneralSettings.worker_type()][:]
                     initial_url = task_page_urls[cfg.GeneralSettings.worker_type()]
+                    task_type = task_names[cfg.GeneralSettings.worker_type()]
                     request = request_type({})
                     request.Type = cfg.GeneralSettings.WORKER_TYPE
                     if task_service is None:
                         task_service = service_type(RQ=request)
 
+                    teardown_config = page_setup_config()
+
                     logger.info(f'Performing tear-down - {retry + 1} out of 3...')
-                    # Shutdown browser so that it is re-created to continue from cached state
-                    task_service.shutdown(True)
-                    
-                    minimum_recaptcha_score = 3
-                    if cfg.GeneralSettings.worker_type() not in worker_type_minimum_recaptcha_scores:
-                        logger.warning(
-                            f'Missing minimum reCAPTCHA score for state with WorkerType of {cfg.GeneralSettings.WORKER_TYPE}, using default of 1')
+                    if cfg.BrowserSettings.SOFT_RESET and \
+                            task_service.tasks_since_launch < cfg.BrowserSettings.SOFT_RESET_MAX_TASKS and \
+                            task_service.health_check() and task_service.soft_reset(teardown_config):
+                        logger.info('Browser was soft reset, skipping relaunch')
+                    elif cfg.BrowserSettings.WARM_STANDBY and task_service.swap_standby(
+                            cfg.BrowserSettings.WARM_STANDBY_WAIT):
+                        logger.info('Standby browser was swapped in, previous browser is shut down in the background')
                     else:
-                        minimum_recaptcha_score = worker_type_minimum_recaptcha_scores[cfg.GeneralSettings.worker_type()]
-                    
-                    # Prepare driver and user data directory
-                    task_service.init_browser(cfg.GeneralSettings.browser_driver_type(),
-                                              cfg.GeneralSettings.worker_type())
-                    task_service.driver.switch_to.window(task_service.driver.current_window_handle)
-                    logger.info(f'=== {task_type_names[cfg.GeneralSettings.worker_type()]} TEAR-DOWN BEGIN ===')
-
-                    teardown_config = PageSetupConfig(
-                        initial_url=initial_url,
-                        downloads_path=cfg.CacheSettings.DOWNLOADS_PATH,
-                        recaptcha_score_threshold=minimum_recaptcha_score,
-                        rds=rds
-                    )
-                    task_service.teardown(teardown_config)
+                        relaunch_browser(teardown_config)
 
                     response = ComplaintTaskRS()
-                    response.Logs = list()
                     response.Error = ''
                     task_service.RS = response
 
+                    # Time between the end of the task and the moment the browser is ready for the next one
+                    idle_ready_gap = round((time.monotonic() - idle_started) * 1000)
+                    logger.info(f'Idle-ready gap after job {args["task_id"]} is {idle_ready_gap} ms.')
+                    job_store.update(args['task_id'], {'idle_ready_gap': idle_ready_gap})
+
+                    if cfg.BrowserSettings.WARM_STANDBY:
+                        task_service.start_standby(cfg.GeneralSettings.browser_driver_type(), task_type,
+                                                   teardown_config)
+
+                    if job_timeline is not None:
+                        job_timeline.mark(TEARDOWN_COMPLETE)
+                        job_store.update(args['task_id'], {'timeline': job_timeline.to_meta()})
+                        metrics.observe_timeline({'teardown_ms': job_timeline.summary().get('teardown_ms', 0)})
+                        job_timeline = None
+
                     logger.info(f'=== {task_type_names[cfg.GeneralSettings.worker_type()]} TEAR-DOWN COMPLETE ===')
                     return None
                 return None
             except Exception as e:
-                task_service.shutdown()
-                logger.error(f'Terminating process with ID of {os.getpid()} due to Exception in should_restart')
-                os.kill(os.getpid(), signal.SIGKILL)
+                logger.error(f'Exception in should_restart: {e} - {traceback.format_exc()}')
+                # Appended to the escalations the job itself went through
+                escalations = [Escalation.from_list(item) for item in job_store.get(args['task_id'], 'recovery') or []]
+                recover(e, args['task_id'], escalations, relaunch_only=True)
                 return None
     except:
         pass
@@ -219,18 +471,23 @@ def should_restart(**args):
 
 
 @app.task(name='task_worker.work', bind=True, TASK_REJECT_ON_WORKER_LOST=cfg.task_reject_on_worker_lost)
-def work(self, request, job_uid: str):
+def work(self, request, job_uid: str, hops: int = 0):
     global display
     global task_service
+    global job_timeline
 
     meta = None
+    crash_counted = False
+    outcome = 'error'
+    profiler: Optional[CommandProfiler] = None
+    watchdog: Optional[BrowserWatchdog] = None
+    deadline: Optional[Deadline] = None
+    escalations: list[Escalation] = []
 
-    request_encoder = ComplaintTaskRQEncoder()
-    rq = ComplaintTaskRQ(request)
     response = ComplaintTaskRS()
-    response.Logs = list()
     response.Error = ''
-    response_encoder = ComplaintTaskRSEncoder()
+    timeline = JobTimeline(self.request.get(ENQUEUED_HEADER))
+    job_timeline = None
 
     try:
         if task_service is None:
@@ -241,128 +498,252 @@ def work(self, request, job_uid: str):
         if cfg.GeneralSettings.WORKER_TYPE == -1:
             raise Exception('Missing worker type value')
 
-        meta = rds.get('job.{}'.format(job_uid)) or '{}'
-        meta = json.loads(meta, object_hook=date_parser)
-        meta['started_at'] = datetime.now(timezone.utc)
-        meta['task_post_run'] = job_uid  # This is to indicate that task' post-run signal needs to execute
-        rds.set('job.{}'.format(job_uid), json.dumps(meta, default=date_encoder))
-
-        if rq.Type is None:
-            response.Error = 'Missing worker type parameter'
-            if meta is not None:
-                rds.set('job.{}'.format(job_uid), json.dumps(meta, default=date_encoder))
-            return response_encoder.encode(response)
-
-        if rq.Type != cfg.GeneralSettings.WORKER_TYPE:
-            raise Exception('Worker is processing worker type of {}, not {}', cfg.GeneralSettings.WORKER_TYPE,
-                            rq.Type)
-        service_type, request_type, request_encoder_type, response_type, response_encoder_type = \
-            task_type_classes[WorkerType(rq.Type)][:]
-        initial_url = task_page_urls[WorkerType(rq.Type)]
-
-        request: ComplaintTaskRQ = request_type(request)
-        request_encoder = request_encoder_type()
+        job_store = get_job_store()
 
-        response = response_type()
-        response_encoder = response_encoder_type()
+        payload = request
+        request, validation_errors = parse_request(payload)
 
-        request.SessionUID = job_uid
-        task_service.RQ = request
-        task_service.RS = response
+        # Jobs of another worker type go back to their own queue, without touching the browser
+        if request.Type and request.Type != cfg.GeneralSettings.WORKER_TYPE:
+            destination = route_job(self, payload, job_uid, request.Type, hops)
+            job_store.update(job_uid, {'rerouted_to': destination, 'hops': hops + 1})
+            if destination != DEAD_LETTER_STREAM:
+                # The job lives on under the same task ID in its own queue
+                outcome = 'rerouted'
+                raise Ignore()
+            outcome = 'dead_lettered'
+            response.Error = f'Job of worker type {request.Type} cannot be routed to a worker'
+            return encode(response)
 
-        validation_errors = request.validate()
+        # Validate before anything is recorded, so that a rejected job leaves no post-run tear-down behind
         if validation_errors:
             logger.error('Errors in the request: {}'.format(validation_errors))
             response.Errors = validation_errors
-            if meta is not None:
-                rds.set('job.{}'.format(job_uid), json.dumps(meta, default=date_encoder))
-            return response_encoder.encode(response)
-
-        logger.info(f'Processing worker type task for {rq.Type} and data {request_encoder.encode(request)} ...')
-
-        with tempfile.TemporaryDirectory() as temp_dir:
-            # task_service.driver.execute_script("window.stop();")
-            time.sleep(1.5 / 10)
-            time_started = datetime.now()
-            task_service.RQ = request
-
-            # Disable loading of blocked URLS like recaptcha or google tag
-            blocked_urls = task_service.get_process_block_urls()
-            if len(blocked_urls) > 0:
-                task_service.driver.execute_cdp_cmd('Network.setBlockedURLs', {"urls": blocked_urls})
-                task_service.driver.execute_cdp_cmd('Network.enable', {})
-            
-            # Process the request using the task service
-            response = task_service.process(initial_url, temp_dir)
-            
-            # Re-enable loading of blocked URLS like recaptcha or google tag
-            if len(blocked_urls) > 0:
-                task_service.driver.execute_cdp_cmd('Network.setBlockedURLs', {"urls": []})
-                task_service.driver.execute_cdp_cmd('Network.enable', {})
-                
-            processing_total = time_diff_ms(datetime.now(), time_started)
-            logger.info(f'Total processing execution time for job {job_uid} is ' + str(
-                processing_total) + ' ms.')
-            meta['processing_total'] = processing_total
-        
+            outcome = 'rejected'
+            job_store.update(job_uid, {'started_at': datetime.now(timezone.utc), 'rejected': validation_errors})
+            return encode(response)
+
+        # Counted as a crash until the execution finishes, so executions that take the process down stay counted
+        if cfg.DeadLetterSettings.MAX_CRASHES > 0:
+            crashes = job_store.increment(job_uid, 'crashes')
+            crash_counted = True
+            if crashes > cfg.DeadLetterSettings.MAX_CRASHES:
+                crash_counted = False
+                quarantine_job(job_uid, payload, crashes - 1)
+                outcome = 'quarantined'
+                response.Error = f'Job was quarantined after {crashes - 1} executions that did not finish'
+                return encode(response)
+
+        claim = claim_job(request, job_uid)
+        if claim is not None and not claim.acquired:
+            # Nothing runs in the browser, so there is no post-run tear-down either
+            job_store.update(job_uid, {'started_at': datetime.now(timezone.utc), 'duplicate_of': claim.owner})
+            if claim.state == DONE:
+                logger.info(f'Job {job_uid} duplicates completed job {claim.owner}, returning its stored response')
+                outcome = 'duplicate'
+                return claim.response
+
+            outcome = 'retried'
+
+            # Polls until the running job completes or its lease runs out, when the claim can be taken over; one
+            # poll more than the remaining lease needs, independently of the retries of the request itself
+            poll_interval = max(cfg.IdempotencySettings.POLL_INTERVAL, 1)
+            countdown = min(max(claim.ttl, 1), poll_interval)
+            logger.warning(f'Complaint of job {job_uid} is being processed by job {claim.owner}, checking again in '
+                           f'{countdown} s.')
+            raise self.retry(countdown=countdown,
+                             max_retries=self.request.retries + math.ceil(claim.ttl / poll_interval) + 1)
+
+        job_store.update(job_uid, {
+            'started_at': datetime.now(timezone.utc),
+            'task_post_run': job_uid  # This is to indicate that task' post-run signal needs to execute
+        })
+        meta = {}
+        get_drain().job_started(job_uid)
+        deadline = task_service.deadline = Deadline(cfg.DeadlineSettings.JOB_BUDGET_MS)
+        job_timeline = task_service.timeline = timeline
+
+        service_type, request_type, request_encoder_type, response_type, response_encoder_type = \
+            task_type_classes[WorkerType(request.Type)][:]
+        initial_url = task_page_urls[WorkerType(request.Type)]
+        response = response_type()
+
+        request.SessionUID = job_uid
+        task_service.start_task(request, response)
+        mark_browser_ready(timeline)
+
+        logger.info(f'Processing worker type task for {request.Type} and data {encode(request)} ...')
+
+        if cfg.ProfilerSettings.ENABLED:
+            profiler = CommandProfiler(trace=bool(cfg.ProfilerSettings.TRACE_PATH)).attach(task_service.driver)
+        if cfg.WatchdogSettings.ENABLED:
+            watchdog = get_watchdog().attach(task_service.driver, job_uid, browser_pid(task_service))
+
+        for attempt in range(cfg.RecoverySettings.MAX_ATTEMPTS + 1):
+            try:
+                response = process_request(request, initial_url, job_uid, meta, profiler)
+                get_recovery_policy().reset()
+                break
+            except (RetryException, MaxRetriesExceededError):
+                raise
+            except DeadlineExceededException as e:
+                # The browser is fine, there is just no time left for another attempt
+                logger.error(f'Job {job_uid} ran out of time: {e}')
+                record_failure(job_uid, e)
+                response = task_service.RS
+                response.Error = str(e)
+                break
+            except Exception as e:
+                logger.error(f'{type(e).__name__} caught for job {job_uid}, attempt {attempt + 1}: {e} - '
+                             f'{traceback.format_exc()}')
+                record_failure(job_uid, e)
+                if attempt == cfg.RecoverySettings.MAX_ATTEMPTS:
+                    # The post-run tear-down replaces the browser anyway
+                    response = task_service.RS
+                    response.Error = f'{type(e).__name__}: {e}'
+                    break
+                recover(e, job_uid, escalations)
+
+                # The recovery may have replaced the driver the profiler was attached to
+                if profiler is not None:
+                    profiler.detach()
+                    profiler.attach(task_service.driver)
+                if watchdog is not None:
+                    watchdog.detach(finished=False)
+                    watchdog.attach(task_service.driver, job_uid, browser_pid(task_service))
+                task_service.deadline = deadline
+                task_service.timeline = timeline
+                task_service.start_task(request, response_type())
+                mark_browser_ready(timeline)
+
+        timeline.mark(FINISHED)
+        meta['timeline'] = timeline.to_meta()
+        response.Timeline = timeline.summary()
+        metrics.observe_timeline(response.Timeline)
+        if deadline.exceeded_stage is not None:
+            outcome = 'deadline_exceeded'
+        else:
+            outcome = 'failed' if response.Error or response.Errors else 'succeeded'
+        meta['deadline'] = deadline.summary()
+        if meta['deadline']['overruns']:
+            logger.warning(f'Job {job_uid} overran its step timeouts in milliseconds: {meta["deadline"]["overruns"]}')
+
         # Job complete, encode the result
-        if meta is not None:
-            rds.set('job.{}'.format(job_uid), json.dumps(meta, default=date_encoder))
+        if meta:
+            job_store.update(job_uid, meta)
 
-        return response_encoder.encode(response)
+        encoded_response = encode(response)
+        complete_claim(response, encoded_response)
+        return encoded_response
 
-    except TimeoutException as e:
-        logger.error(f"TimeoutException caught for job {job_uid}: {e} - {traceback.format_exc()}")
-        task_service.shutdown()
-        logger.error(f'Terminating process with ID of {os.getpid()} due to Timeout exception')
-        os.kill(os.getpid(), signal.SIGKILL)
-        return None
-    except NameError as e:
-        logger.error("Name error, please try again: {} - {}".format(e, traceback.format_exc()))
-        task_service.shutdown()
-        logger.error(f'Terminating process with ID of {os.getpid()} due to NameError exception')
-        os.kill(os.getpid(), signal.SIGKILL)
-        return None
-    except WebDriverException as e:
-        logger.error("Error with webdriver, please try again: {} - {}".format(e, traceback.format_exc()))
-        task_service.shutdown()
-        logger.error(f'Terminating process with ID of {os.getpid()} due to WebDriver exception')
-        os.kill(os.getpid(), signal.SIGKILL)
-        return None
+    except (Retry, Ignore):
+        raise
     except RetryException as re:
         logger.warning('Failed to obtain results, retrying')
+        outcome = 'retried'
         raise self.retry(countdown=request.Countdown, max_retries=request.MaxRetries)
     except MaxRetriesExceededError as mree:
         logger.error("Failed to obtain results after exhausting all retries: {} - {}".format(mree, traceback.format_exc()))
-        task_service.shutdown()
-        logger.error(f'Terminating process with ID of {os.getpid()} due to maximum retries reached exception')
-        os.kill(os.getpid(), signal.SIGKILL)
-        return None
+        response.Error = 'Failed to obtain results after exhausting all retries'
+        outcome = 'failed'
+        return encode(response)
     except Exception as e:
         logger.error("General exception, please try again: {} - {}".format(e, traceback.format_exc()))
-        task_service.shutdown()
-        logger.error(f'Terminating process with ID of {os.getpid()} due to Exception')
-        os.kill(os.getpid(), signal.SIGKILL)
-        return None
+        record_failure(job_uid, e)
+        # Failures of Redis, the claims or the encoding leave the browser alone
+        if task_service is not None and isinstance(e, (WebDriverException, BrowserHungException)):
+            recover(e, job_uid, escalations)
+        response.Error = f'{type(e).__name__}: {e}'
+        return encode(response)
     except BaseException as be:
         logger.critical("Unexpected base exception: {} - {}".format(be, traceback.format_exc()))
-        task_service.shutdown()
-        logger.critical(f'Terminating process with ID of {os.getpid()} due to BaseException')
-        os.kill(os.getpid(), signal.SIGKILL)
+        record_failure(job_uid, be)
+        restart_process('BaseException')
         return None
+    finally:
+        metrics.tasks.inc(outcome=outcome)
+        get_drain().job_finished()
+        if profiler is not None:
+            profiler.detach()
+        if watchdog is not None:
+            watchdog.detach()
+        if task_service is not None:
+            task_service.deadline = None
+            task_service.timeline = None
+        release_claim()
+        if crash_counted:
+            try:
+                get_job_store().increment(job_uid, 'crashes', -1)
+            except Exception as e:
+                logger.error(f'Failed to update the crash count of job {job_uid}: {e}')
 
-def signal_handler(signum, frame):
-    """Handle shutdown signals gracefully"""
+
+def mark_browser_ready(timeline: JobTimeline):
+    """Mark the browser, and the page it prepared, as ready for the job."""
+    timeline.mark(BROWSER_READY)
+    if task_service.page_ready_at is not None:
+        timeline.mark(PAGE_READY, task_service.page_ready_at)
+
+
+def process_request(request: ComplaintTaskRQ, initial_url: str, job_uid: str, meta: dict,
+                    profiler: Optional[CommandProfiler]) -> ComplaintTaskRS:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        # task_service.driver.execute_script("window.stop();")
+        time.sleep(1.5 / 10)
+        time_started = datetime.now()
+        task_service.RQ = request
+
+        # Disable loading of blocked URLS like recaptcha or google tag
+        blocked_urls = task_service.get_process_block_urls()
+        if len(blocked_urls) > 0:
+            task_service.driver.execute_cdp_cmd('Network.setBlockedURLs', {"urls": blocked_urls})
+            task_service.driver.execute_cdp_cmd('Network.enable', {})
+
+        # Process the request using the task service
+        response = task_service.process(initial_url, temp_dir)
+
+        # Re-enable loading of blocked URLS like recaptcha or google tag
+        if len(blocked_urls) > 0:
+            task_service.driver.execute_cdp_cmd('Network.setBlockedURLs', {"urls": []})
+            task_service.driver.execute_cdp_cmd('Network.enable', {})
+
+        processing_total = time_diff_ms(datetime.now(), time_started)
+        logger.info(f'Total processing execution time for job {job_uid} is ' + str(
+            processing_total) + ' ms.')
+        meta['processing_total'] = processing_total
+        meta['wait_timings'] = task_service.wait_timings
+        if profiler is not None:
+            meta['webdriver_profile'] = profiler.summary()
+            if cfg.ProfilerSettings.TRACE_PATH:
+                profiler.dump(os.path.join(cfg.ProfilerSettings.TRACE_PATH, f'{job_uid}.jsonl'))
+
+    return response
+
+def finish_drain():
+    """
+    Flush callbacks and pending deletions and release the browser before the process exits; while draining, the
+    flushes only wait for what is left of the drain budget.
+    """
     global task_service
     global display
+    global drain_finished
 
-    logger.info(f'Received signal {signum}, shutting down gracefully...')
+    if drain_finished:
+        return
+    drain_finished = True
 
     try:
+        # Job metadata is written synchronously; only a callback delivery may still be in progress
+        drain = get_drain()
+        stop_callback_sender(drain.remaining(cfg.DrainSettings.FLUSH_TIMEOUT))
+
         # Cleanup browser and task service
         if task_service is not None:
             logger.info('Shutting down task service...')
+            task_service.discard_standby()
             task_service.shutdown()
+        if not get_reaper().flush(drain.remaining(cfg.RecoverySettings.REAPER_FLUSH_TIMEOUT)):
+            logger.warning('User data directories are still being deleted, the reaper sweep will finish them')
 
         # Cleanup display
         if display is not None:
@@ -370,8 +751,60 @@ def signal_handler(signum, frame):
             display.stop()
 
     except Exception as e:
-        logger.error(f'Error during signal handler cleanup: {e}')
+        logger.error(f'Error during drain cleanup: {e}')
+
+
+def expire_drain(job_uid: str):
+    """
+    Record where the job in flight was interrupted once the drain budget ran out and stop the process before
+    supervisor kills it. The job is not resumed; the broker redelivers it and it starts over.
+
+    Runs on the timer thread while the job still drives the browser, so the browser is not shut down here; it is
+    killed with the process group, and the reaper sweep deletes its user data directory.
+    """
+    try:
+        job_store = get_job_store()
+        job_store.update(job_uid, {
+            'interrupted_at': datetime.now(timezone.utc),
+            'interrupted_stage': task_service.RS.Stage if task_service is not None else None
+        })
+        # The redelivered job must neither wait for the lease nor count the interrupted execution as a crash
+        release_claim()
+        if cfg.DeadLetterSettings.MAX_CRASHES > 0:
+            job_store.increment(job_uid, 'crashes', -1)
+    except Exception as e:
+        logger.error(f'Failed to record the interruption of job {job_uid}: {e}')
+
+    stop_callback_sender(get_drain().remaining(cfg.DrainSettings.FLUSH_TIMEOUT))
+    logger.error(f'Terminating process with ID of {os.getpid()} after the drain budget ran out')
+    if os.getpgid(0) == os.getpid():
+        # Started as a group leader by supervisor, so the group holds the browser and driver processes
+        os.killpg(os.getpid(), signal.SIGKILL)
+    os.kill(os.getpid(), signal.SIGKILL)
+
 
+@signals.worker_shutting_down.connect
+def on_worker_shutting_down(sig=None, how=None, **args):
+    # Warm shutdown by the signal handlers of Celery; the job in flight gets the drain budget, less the time the
+    # callback flush after an interrupted job may take
+    if how == 'Warm':
+        get_drain().request(cfg.DrainSettings.BUDGET, expire_drain, cfg.DrainSettings.FLUSH_TIMEOUT)
+
+
+@signals.worker_shutdown.connect
+def on_worker_shutdown(**args):
+    finish_drain()
+
+
+def signal_handler(signum, frame):
+    """
+    Handle shutdown signals gracefully.
+
+    Only covers the start-up before `worker_main`, which installs the signal handlers of Celery; shutdowns of a
+    running worker are drained through `on_worker_shutting_down`.
+    """
+    logger.info(f'Received signal {signum}, shutting down gracefully...')
+    finish_drain()
     logger.info('Graceful shutdown complete')
     sys.exit(0)
 
@@ -403,6 +836,8 @@ if __name__ == '__main__' or __name__ == 'main':
         os.mkdir(cfg.CacheSettings.DISK_PATH)
     if not os.path.exists(cfg.CacheSettings.BROWSER_PATH):
         os.mkdir(cfg.CacheSettings.BROWSER_PATH)
+    if not os.path.exists(cfg.CacheSettings.TEMPLATE_PATH):
+        os.mkdir(cfg.CacheSettings.TEMPLATE_PATH)
     if not os.path.exists(cfg.CacheSettings.GLOBALCACHE_PATH):
         raise Exception(f'Missing mount for {cfg.CacheSettings.GLOBALCACHE_PATH}')
 
@@ -57,6 +57,17 @@ def get_config():
         'cache': CacheSettings.to_string(),
         'nopecha': NopeCHASettings.to_string(), 
         'browser': BrowserSettings.to_string(),
+        'profiler': ProfilerSettings.to_string(),
+        'snapshot': SnapshotSettings.to_string(),
+        'jobmeta': JobMetaSettings.to_string(),
+        'callback': CallbackSettings.to_string(),
+        'recovery': RecoverySettings.to_string(),
+        'idempotency': IdempotencySettings.to_string(),
+        'deadletter': DeadLetterSettings.to_string(),
+        'drain': DrainSettings.to_string(),
+        'watchdog': WatchdogSettings.to_string(),
+        'deadline': DeadlineSettings.to_string(),
+        'metrics': MetricsSettings.to_string(),
         'airnoise': AirnoiseSettings.to_string()
     }
 
@@ -72,6 +83,8 @@ class GeneralSettings(BaseConfig):
     WORKER_UID = uuid.uuid4().__str__() if not os.getenv("WORKER_UID") else os.getenv("WORKER_UID")
     BROWSER_DRIVER_TYPE = 'chrome' if not os.getenv('BROWSER_DRIVER_TYPE') else os.getenv('BROWSER_DRIVER_TYPE')
     WORKER_TYPE = 'KGAI' if not os.getenv('WORKER_TYPE') else os.getenv('WORKER_TYPE')
+    # Number of log records kept per task response, older records are dropped
+    RESPONSE_LOG_LIMIT: int = int(os.getenv('RESPONSE_LOG_LIMIT', '200'))
 
     @staticmethod
     def browser_driver_type() -> BrowserDriverType:
@@ -93,9 +106,9 @@ class GeneralSettings(BaseConfig):
 
     @staticmethod
     def to_string():
-        return "ENV={}, WORKER_UID={}, BROWSER_DRIVER_TYPE={}".format(
+        return "ENV={}, WORKER_UID={}, BROWSER_DRIVER_TYPE={}, RESPONSE_LOG_LIMIT={}".format(
             GeneralSettings.ENVIRONMENT, GeneralSettings.WORKER_UID,
-            GeneralSettings.BROWSER_DRIVER_TYPE)
+            GeneralSettings.BROWSER_DRIVER_TYPE, GeneralSettings.RESPONSE_LOG_LIMIT)
 
 
 class NopeCHASettings(BaseConfig):
@@ -135,26 +148,55 @@ class BrowserSettings(BaseConfig):
         'FIREFOX_BROWSER_INCOGNITO').lower() in ('true', '1', 't')
     FIREFOX_HEADLESS = False if not os.getenv('FIREFOX_BROWSER_HEADLESS') else os.getenv(
         'FIREFOX_BROWSER_HEADLESS').lower() in ('true', '1', 't')
+    # Keep a second, fully prepared browser launching in the background and swap it in after each task
+    WARM_STANDBY = False if not os.getenv('BROWSER_WARM_STANDBY') else os.getenv(
+        'BROWSER_WARM_STANDBY').lower() in ('true', '1', 't')
+    WARM_STANDBY_WAIT: float = float(os.getenv('BROWSER_WARM_STANDBY_WAIT', '90'))
+    # Reset the browser in place between tasks and relaunch it only every SOFT_RESET_MAX_TASKS tasks
+    SOFT_RESET = False if not os.getenv('BROWSER_SOFT_RESET') else os.getenv(
+        'BROWSER_SOFT_RESET').lower() in ('true', '1', 't')
+    SOFT_RESET_MAX_TASKS: int = int(os.getenv('BROWSER_SOFT_RESET_MAX_TASKS', '10'))
+    # Launch Chrome detached with a remote debugging endpoint, so a restarted worker can re-attach to it
+    REATTACH = False if not os.getenv('BROWSER_REATTACH') else os.getenv(
+        'BROWSER_REATTACH').lower() in ('true', '1', 't')
+    REATTACH_STATE_PATH: str = os.path.join(os.getenv('DOWNLOADS_PATH') or '/var/tmp/cache', '.browsers') if not os.getenv(
+        'BROWSER_REATTACH_STATE_PATH') else os.getenv('BROWSER_REATTACH_STATE_PATH')
 
     @staticmethod
     def to_string():
         return ("BROWSER_BINARY_PATH={}, DRIVER_BINARY_PATH={}, CHROME_UNDETECTED={}, CHROME_INCOGNITO={}, "
-                "CHROME_HEADLESS={}, FIREFOX_INCOGNITO={}, FIREFOX_HEADLESS={}").format(
+                "CHROME_HEADLESS={}, FIREFOX_INCOGNITO={}, FIREFOX_HEADLESS={}, WARM_STANDBY={}, "
+                "WARM_STANDBY_WAIT={}, SOFT_RESET={}, SOFT_RESET_MAX_TASKS={}, REATTACH={}, REATTACH_STATE_PATH={}").format(
             BrowserSettings.BROWSER_BINARY_PATH, BrowserSettings.DRIVER_BINARY_PATH, BrowserSettings.CHROME_UNDETECTED,
             BrowserSettings.CHROME_INCOGNITO, BrowserSettings.CHROME_HEADLESS, BrowserSettings.FIREFOX_INCOGNITO,
-            BrowserSettings.FIREFOX_HEADLESS)
+            BrowserSettings.FIREFOX_HEADLESS, BrowserSettings.WARM_STANDBY, BrowserSettings.WARM_STANDBY_WAIT,
+            BrowserSettings.SOFT_RESET, BrowserSettings.SOFT_RESET_MAX_TASKS, BrowserSettings.REATTACH,
+            BrowserSettings.REATTACH_STATE_PATH)
 
 class RedisSettings(BaseConfig):
     REDIS_HOST: Optional[str] = '127.0.0.1' if not os.getenv('REDIS_HOST') else os.getenv('REDIS_HOST')
     REDIS_PORT: Optional[int] = 6379 if not os.getenv('REDIS_PORT') else int(os.getenv('REDIS_PORT'))
+    # Connections shared by all Redis clients of the process
+    MAX_CONNECTIONS: int = int(os.getenv('REDIS_MAX_CONNECTIONS', '8'))
+
+    _pool: Optional[redis.ConnectionPool] = None
+
+    @staticmethod
+    def pool() -> redis.ConnectionPool:
+        if RedisSettings._pool is None:
+            RedisSettings._pool = redis.ConnectionPool(host=RedisSettings.REDIS_HOST, port=RedisSettings.REDIS_PORT,
+                                                       max_connections=RedisSettings.MAX_CONNECTIONS,
+                                                       socket_keepalive=True, health_check_interval=30)
+        return RedisSettings._pool
 
     @staticmethod
     def rds() -> redis.client.Redis:
-        return redis.Redis(host=RedisSettings.REDIS_HOST, port=RedisSettings.REDIS_PORT)
+        return redis.Redis(connection_pool=RedisSettings.pool())
 
     @staticmethod
     def to_string():
-        return "HOST={}, PORT={}".format(RedisSettings.REDIS_HOST, RedisSettings.REDIS_PORT)
+        return "HOST={}, PORT={}, MAX_CONNECTIONS={}".format(RedisSettings.REDIS_HOST, RedisSettings.REDIS_PORT,
+                                                             RedisSettings.MAX_CONNECTIONS)
 
 class APISettings(BaseConfig):
     # Stores external URL to the API
@@ -213,18 +255,31 @@ class CacheSettings(BaseConfig):
         DOWNLOADS_PATH, os.getenv('CACHE_DISK_PATH'))
     GLOBALCACHE_PATH: Optional[str] = os.path.join(DOWNLOADS_PATH, '.globalcache') if not os.getenv(
         'CACHE_GLOBALCACHE_PATH') else os.path.join(DOWNLOADS_PATH, os.getenv('CACHE_GLOBALCACHE_PATH'))
+    # Read-only profiles extracted once per global cache archive version, cloned for every browser launch
+    TEMPLATE_PATH: Optional[str] = os.path.join(DOWNLOADS_PATH, '.templates') if not os.getenv(
+        'CACHE_TEMPLATE_PATH') else os.path.join(DOWNLOADS_PATH, os.getenv('CACHE_TEMPLATE_PATH'))
     CACHE_USE = False if not os.getenv('CACHE_USE') else os.getenv('CACHE_USE', 'False').lower() in ('true', '1', 't')
+    # Disk quota for DATA/DISK/BROWSER paths in megabytes, enforced by removing orphaned user data directories before
+    # their grace period ends; 0 disables it
+    QUOTA_MB: int = int(os.getenv('CACHE_QUOTA_MB', '0'))
+    # Seconds between sweeps for orphaned user data directories and grace period before an orphan is removed
+    REAPER_INTERVAL: float = float(os.getenv('CACHE_REAPER_INTERVAL', '300'))
+    ORPHAN_GRACE: float = float(os.getenv('CACHE_ORPHAN_GRACE', '300'))
 
     @staticmethod
     def to_string():
         return ("DOWNLOADS_PATH={}, BROWSER_PATH={}, DATA_PATH={}, DISK_PATH={}, GLOBALCACHE_PATH={}, "
-                "CACHE_USE={}").format(
+                "TEMPLATE_PATH={}, CACHE_USE={}, QUOTA_MB={}, REAPER_INTERVAL={}, ORPHAN_GRACE={}").format(
                     CacheSettings.DOWNLOADS_PATH, 
                     CacheSettings.BROWSER_PATH,
                     CacheSettings.DATA_PATH,
                     CacheSettings.DISK_PATH, 
                     CacheSettings.GLOBALCACHE_PATH, 
-                    CacheSettings.CACHE_USE
+                    CacheSettings.TEMPLATE_PATH,
+                    CacheSettings.CACHE_USE,
+                    CacheSettings.QUOTA_MB,
+                    CacheSettings.REAPER_INTERVAL,
+                    CacheSettings.ORPHAN_GRACE
                 )
 
 class ExtensionSettings(BaseConfig):
@@ -238,6 +293,190 @@ class ExtensionSettings(BaseConfig):
             'background.js'))
     )
 
+class ProfilerSettings(BaseConfig):
+    # Record count, total time and p50/p99 of every WebDriver command per job into the job metadata
+    ENABLED = False if not os.getenv('WEBDRIVER_PROFILER') else os.getenv(
+        'WEBDRIVER_PROFILER').lower() in ('true', '1', 't')
+    # Directory for full per-job command traces, empty disables them
+    TRACE_PATH: str = os.getenv('WEBDRIVER_PROFILER_TRACE_PATH', '')
+
+    @staticmethod
+    def to_string():
+        return "ENABLED={}, TRACE_PATH={}".format(ProfilerSettings.ENABLED, ProfilerSettings.TRACE_PATH)
+
+class SnapshotSettings(BaseConfig):
+    # Page sources captured on failures that are larger than INLINE_LIMIT bytes are written gzip-compressed to PATH,
+    # the response then only carries the first EXCERPT_SIZE characters and a reference to the file
+    PATH: str = os.path.join(CacheSettings.DOWNLOADS_PATH, '.snapshots') if not os.getenv(
+        'SNAPSHOT_PATH') else os.getenv('SNAPSHOT_PATH')
+    INLINE_LIMIT: int = int(os.getenv('SNAPSHOT_INLINE_LIMIT', '16384'))
+    EXCERPT_SIZE: int = int(os.getenv('SNAPSHOT_EXCERPT_SIZE', '4096'))
+    # Number of snapshot files kept in PATH, 0 keeps all of them
+    MAX_FILES: int = int(os.getenv('SNAPSHOT_MAX_FILES', '200'))
+    # Number of snapshots taken per task
+    MAX_PER_TASK: int = int(os.getenv('SNAPSHOT_MAX_PER_TASK', '2'))
+
+    @staticmethod
+    def to_string():
+        return "PATH={}, INLINE_LIMIT={}, EXCERPT_SIZE={}, MAX_FILES={}, MAX_PER_TASK={}".format(
+            SnapshotSettings.PATH,
+            SnapshotSettings.INLINE_LIMIT,
+            SnapshotSettings.EXCERPT_SIZE,
+            SnapshotSettings.MAX_FILES,
+            SnapshotSettings.MAX_PER_TASK
+        )
+
+class JobMetaSettings(BaseConfig):
+    # Age in seconds at which job metadata is moved from Redis into the archive, 0 disables archiving
+    ARCHIVE_AFTER: int = int(os.getenv('JOB_META_ARCHIVE_AFTER', str(6 * 24 * 3600)))
+    ARCHIVE_INTERVAL: float = float(os.getenv('JOB_META_ARCHIVE_INTERVAL', '3600'))
+    # Durable directory shared by all workers, e.g. a network mount; archiving is disabled while it is not set
+    ARCHIVE_PATH: str = os.getenv('JOB_META_ARCHIVE_PATH', '')
+    # Seconds after which job metadata expires in Redis, 0 keeps it forever; by default metadata only expires after
+    # it had time to be archived, so nothing is lost while archiving is disabled
+    TTL: int = int(os.getenv('JOB_META_TTL', str(7 * 24 * 3600) if ARCHIVE_AFTER > 0 and ARCHIVE_PATH else '0'))
+
+    @staticmethod
+    def archiving() -> bool:
+        return JobMetaSettings.ARCHIVE_AFTER > 0 and bool(JobMetaSettings.ARCHIVE_PATH)
+
+    @staticmethod
+    def to_string():
+        return "TTL={}, ARCHIVE_AFTER={}, ARCHIVE_INTERVAL={}, ARCHIVE_PATH={}".format(
+            JobMetaSettings.TTL,
+            JobMetaSettings.ARCHIVE_AFTER,
+            JobMetaSettings.ARCHIVE_INTERVAL,
+            JobMetaSettings.ARCHIVE_PATH
+        )
+
+class CallbackSettings(BaseConfig):
+    # Write callbacks to the Redis outbox stream instead of posting them from the task
+    OUTBOX = True if not os.getenv('CALLBACK_OUTBOX') else os.getenv('CALLBACK_OUTBOX').lower() in ('true', '1', 't')
+    # Run a sender thread inside every worker process; disable when senders run as `python -m selenium_worker.outbox`
+    SENDER = True if not os.getenv('CALLBACK_SENDER') else os.getenv('CALLBACK_SENDER').lower() in ('true', '1', 't')
+    TIMEOUT: float = float(os.getenv('CALLBACK_TIMEOUT', '30'))
+    MAX_ATTEMPTS: int = int(os.getenv('CALLBACK_MAX_ATTEMPTS', '8'))
+    # Backoff in seconds before the first retry, doubled for every further attempt up to RETRY_MAX
+    RETRY_BASE: float = float(os.getenv('CALLBACK_RETRY_BASE', '5'))
+    RETRY_MAX: float = float(os.getenv('CALLBACK_RETRY_MAX', '900'))
+    # Outbox entries read per round trip
+    BATCH_SIZE: int = int(os.getenv('CALLBACK_BATCH_SIZE', '20'))
+    # Keep-alive connections per callback host
+    POOL_SIZE: int = int(os.getenv('CALLBACK_POOL_SIZE', '4'))
+
+    @staticmethod
+    def to_string():
+        return ("OUTBOX={}, SENDER={}, TIMEOUT={}, MAX_ATTEMPTS={}, RETRY_BASE={}, RETRY_MAX={}, BATCH_SIZE={}, "
+                "POOL_SIZE={}").format(
+                    CallbackSettings.OUTBOX,
+                    CallbackSettings.SENDER,
+                    CallbackSettings.TIMEOUT,
+                    CallbackSettings.MAX_ATTEMPTS,
+                    CallbackSettings.RETRY_BASE,
+                    CallbackSettings.RETRY_MAX,
+                    CallbackSettings.BATCH_SIZE,
+                    CallbackSettings.POOL_SIZE
+                )
+
+class RecoverySettings(BaseConfig):
+    # Attempts of a job in the same process after a failure, each preceded by a recovery action
+    MAX_ATTEMPTS: int = int(os.getenv('RECOVERY_MAX_ATTEMPTS', '2'))
+    # Seconds without failures after which recovery starts again from the mildest action
+    WINDOW: float = float(os.getenv('RECOVERY_WINDOW', '600'))
+    # Seconds to wait for pending user data deletions before the process is restarted
+    REAPER_FLUSH_TIMEOUT: float = float(os.getenv('RECOVERY_REAPER_FLUSH_TIMEOUT', '10'))
+
+    @staticmethod
+    def to_string():
+        return "MAX_ATTEMPTS={}, WINDOW={}, REAPER_FLUSH_TIMEOUT={}".format(
+            RecoverySettings.MAX_ATTEMPTS,
+            RecoverySettings.WINDOW,
+            RecoverySettings.REAPER_FLUSH_TIMEOUT
+        )
+
+class IdempotencySettings(BaseConfig):
+    # Claim every job by its complaint in Redis, so that redelivered jobs do not drive the browser again
+    ENABLED = True if not os.getenv('IDEMPOTENCY_ENABLED') else os.getenv('IDEMPOTENCY_ENABLED').lower() in (
+        'true', '1', 't')
+    # Seconds a running job holds its claim; a job cannot run longer than the task time limit
+    LEASE: int = int(os.getenv('IDEMPOTENCY_LEASE', str(task_time_limit)))
+    # Seconds the outcome of a completed job is kept for redeliveries
+    RESULT_TTL: int = int(os.getenv('IDEMPOTENCY_RESULT_TTL', str(7 * 24 * 3600)))
+    # Seconds between checks of a duplicate job on the claim of the job that is running its complaint
+    POLL_INTERVAL: int = int(os.getenv('IDEMPOTENCY_POLL_INTERVAL', '30'))
+
+    @staticmethod
+    def to_string():
+        return "ENABLED={}, LEASE={}, RESULT_TTL={}, POLL_INTERVAL={}".format(
+            IdempotencySettings.ENABLED,
+            IdempotencySettings.LEASE,
+            IdempotencySettings.RESULT_TTL,
+            IdempotencySettings.POLL_INTERVAL
+        )
+
+class DeadLetterSettings(BaseConfig):
+    # Executions of a job that may end without the job finishing, e.g. because the process was killed, before the
+    # job is quarantined in the dead-letter stream; 0 disables the quarantine
+    MAX_CRASHES: int = int(os.getenv('DEAD_LETTER_MAX_CRASHES', '3'))
+
+    @staticmethod
+    def to_string():
+        return "MAX_CRASHES={}".format(
+            DeadLetterSettings.MAX_CRASHES
+        )
+
+class DrainSettings(BaseConfig):
+    # Seconds from SIGTERM until the process exits, for the job in flight and the clean-up after it; keep it below
+    # `stopwaitsecs` of supervisor, with room for shutting the browser down
+    BUDGET: float = float(os.getenv('DRAIN_BUDGET', '35'))
+    # Seconds of the budget kept to wait for a callback delivery in progress before the process exits
+    FLUSH_TIMEOUT: float = float(os.getenv('DRAIN_FLUSH_TIMEOUT', '5'))
+
+    @staticmethod
+    def to_string():
+        return "BUDGET={}, FLUSH_TIMEOUT={}".format(
+            DrainSettings.BUDGET,
+            DrainSettings.FLUSH_TIMEOUT
+        )
+
+class WatchdogSettings(BaseConfig):
+    # Abort WebDriver commands that hang in a wedged browser, instead of waiting for the task time limit
+    ENABLED = True if not os.getenv('WATCHDOG_ENABLED') else os.getenv('WATCHDOG_ENABLED').lower() in ('true', '1', 't')
+    # Seconds between checks of the command in flight
+    INTERVAL: float = float(os.getenv('WATCHDOG_INTERVAL', '5'))
+    # Seconds a command runs before the browser is probed over its DevTools endpoint
+    PROBE_AFTER: float = float(os.getenv('WATCHDOG_PROBE_AFTER', '10'))
+    # Seconds after which a command is aborted even if the browser still responds
+    COMMAND_TIMEOUT: float = float(os.getenv('WATCHDOG_COMMAND_TIMEOUT', '45'))
+    PROBE_TIMEOUT: float = float(os.getenv('WATCHDOG_PROBE_TIMEOUT', '3'))
+
+    @staticmethod
+    def to_string():
+        return "ENABLED={}, INTERVAL={}, PROBE_AFTER={}, COMMAND_TIMEOUT={}, PROBE_TIMEOUT={}".format(
+            WatchdogSettings.ENABLED,
+            WatchdogSettings.INTERVAL,
+            WatchdogSettings.PROBE_AFTER,
+            WatchdogSettings.COMMAND_TIMEOUT,
+            WatchdogSettings.PROBE_TIMEOUT
+        )
+
+class DeadlineSettings(BaseConfig):
+    # Milliseconds a job gets in total; the timeout of every step is cut down to what is left of it
+    JOB_BUDGET_MS: int = int(os.getenv('DEADLINE_JOB_BUDGET_MS', '600000'))
+
+    @staticmethod
+    def to_string():
+        return "JOB_BUDGET_MS={}".format(DeadlineSettings.JOB_BUDGET_MS)
+
+class MetricsSettings(BaseConfig):
+    # Port of the Prometheus metrics endpoint of the worker process, 0 to disable it; one port per worker
+    PORT: int = int(os.getenv('METRICS_PORT', '0'))
+    HOST: str = '127.0.0.1' if not os.getenv('METRICS_HOST') else os.getenv('METRICS_HOST')
+
+    @staticmethod
+    def to_string():
+        return "PORT={}, HOST={}".format(MetricsSettings.PORT, MetricsSettings.HOST)
+
 class AirnoiseSettings(BaseConfig):
     SUBMISSION_VERIFIER_API_KEY: str = os.getenv('SUBMISSION_VERIFIER_API_KEY', '')
     
@@ -0,0 +1,180 @@
+"""
+Dead-letter stream of jobs that no worker can process, either because they cannot be routed to a worker of their
+type or because they were quarantined after crashing their workers too often.
+
+Inspect and requeue dead-lettered jobs from the command line:
+
+    python -m selenium_worker.deadletter list [--count N]
+    python -m selenium_worker.deadletter show ENTRY_ID
+    python -m selenium_worker.deadletter requeue ENTRY_ID [--queue QUEUE]
+    python -m selenium_worker.deadletter purge (ENTRY_ID ... | --all)
+"""
+
+import argparse
+import json
+import logging
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+from redis import Redis
+
+from selenium_worker import config as cfg
+from selenium_worker.timeline import ENQUEUED_HEADER
+
+logger = logging.getLogger(__name__)
+
+# Jobs that no worker can process
+DEAD_LETTER_STREAM = 'jobs.dead'
+
+# Approximate number of entries kept in the dead-letter stream
+STREAM_MAX_LENGTH = 100000
+
+# Name under which the worker registers its task
+WORK_TASK_NAME = 'task_worker.work'
+
+
+def dead_letter(client: Redis, job_uid: str, payload: Any, reason: str, error: str = '', snapshot_ref: str = '',
+                crashes: int = 0) -> str:
+    """
+    Move a job to the dead-letter stream.
+
+    Args:
+        client: Redis client
+        job_uid: UID of the job
+        payload: Request payload of the job, as it was received
+        reason: Why the job cannot be processed
+        error: Last error the job failed with
+        snapshot_ref: Reference of the last page snapshot of the job
+        crashes: Number of executions of the job that did not finish
+
+    Returns:
+        str: ID of the dead-letter entry
+    """
+    entry = {
+        'job': job_uid,
+        'payload': payload if isinstance(payload, (str, bytes)) else json.dumps(payload),
+        'reason': reason,
+        'worker': cfg.GeneralSettings.WORKER_UID,
+        'created': datetime.now(timezone.utc).isoformat()
+    }
+    if error:
+        entry['error'] = error
+    if snapshot_ref:
+        entry['snapshot_ref'] = snapshot_ref
+    if crashes:
+        entry['crashes'] = crashes
+
+    entry_id = client.xadd(DEAD_LETTER_STREAM, entry, maxlen=STREAM_MAX_LENGTH, approximate=True)
+    logger.error(f'Job {job_uid} was moved to the dead-letter stream: {reason}')
+    return entry_id.decode('utf-8') if isinstance(entry_id, bytes) else entry_id
+
+
+def _decode_entry(entry_id, fields: dict) -> dict:
+    entry = {key.decode('utf-8') if isinstance(key, bytes) else key:
+             value.decode('utf-8') if isinstance(value, bytes) else value for key, value in fields.items()}
+    entry['id'] = entry_id.decode('utf-8') if isinstance(entry_id, bytes) else entry_id
+    return entry
+
+
+def list_entries(client: Redis, count: int = 20) -> list[dict]:
+    """Return the most recent dead-letter entries, newest first."""
+    return [_decode_entry(entry_id, fields) for entry_id, fields in client.xrevrange(DEAD_LETTER_STREAM, count=count)]
+
+
+def get_entry(client: Redis, entry_id: str) -> Optional[dict]:
+    entries = client.xrange(DEAD_LETTER_STREAM, entry_id, entry_id)
+    return _decode_entry(*entries[0]) if entries else None
+
+
+def requeue(client: Redis, entry_id: str, queue: Optional[str] = None) -> str:
+    """
+    Publish a dead-lettered job again under its original task ID and remove its entry.
+
+    Args:
+        client: Redis client
+        entry_id: ID of the dead-letter entry
+        queue: Queue to publish to; the queue of the worker type of the job by default
+
+    Returns:
+        str: Queue the job was published to
+    """
+    from celery import Celery
+
+    entry = get_entry(client, entry_id)
+    if entry is None:
+        raise KeyError(f'No dead-letter entry {entry_id}')
+
+    payload = entry['payload']
+    if queue is None:
+        # Imported here, the queue map pulls in the task services
+        from selenium_worker.enums import WorkerType
+        from selenium_worker.vars import task_queues
+        queue = task_queues[WorkerType(json.loads(payload).get('Type'))]
+
+    # Crashes before the quarantine must not count against the requeued job
+    from selenium_worker.jobmeta import get_job_store
+    get_job_store().update(entry['job'], {'crashes': 0, 'quarantined': None})
+
+    broker = f'redis://{cfg.RedisSettings.REDIS_HOST}:{cfg.RedisSettings.REDIS_PORT}'
+    Celery('selenium_tasks', broker=broker, backend=broker).send_task(
+        WORK_TASK_NAME, args=[payload, entry['job']], queue=queue, task_id=entry['job'],
+        headers={ENQUEUED_HEADER: time.time()})
+    client.xdel(DEAD_LETTER_STREAM, entry_id)
+    logger.info(f'Job {entry["job"]} was requeued to {queue}')
+    return queue
+
+
+def purge(client: Redis, entry_ids: Optional[list[str]] = None) -> int:
+    """Remove the given dead-letter entries, or all of them if no IDs are given."""
+    if entry_ids:
+        return client.xdel(DEAD_LETTER_STREAM, *entry_ids)
+    count = client.xlen(DEAD_LETTER_STREAM)
+    client.delete(DEAD_LETTER_STREAM)
+    return count
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Inspect and requeue dead-lettered jobs')
+    commands = parser.add_subparsers(dest='command', required=True)
+    list_parser = commands.add_parser('list', help='List the most recent entries')
+    list_parser.add_argument('--count', type=int, default=20, help='Number of entries to list')
+    show_parser = commands.add_parser('show', help='Show an entry with its payload')
+    show_parser.add_argument('entry_id')
+    requeue_parser = commands.add_parser('requeue', help='Publish the job of an entry again and remove the entry')
+    requeue_parser.add_argument('entry_id')
+    requeue_parser.add_argument('--queue', help='Queue to publish to, the queue of the worker type by default')
+    purge_parser = commands.add_parser('purge', help='Remove entries')
+    purge_parser.add_argument('entry_ids', nargs='*')
+    purge_parser.add_argument('--all', action='store_true', help='Remove all entries')
+    args = parser.parse_args()
+
+    client = cfg.RedisSettings.rds()
+    if args.command == 'list':
+        for entry in list_entries(client, args.count):
+            print(f'{entry["id"]}  {entry.get("created", "")}  job {entry.get("job", "")}  '
+                  f'crashes {entry.get("crashes", 0)}  {entry.get("reason", "")}')
+    elif args.command == 'show':
+        entry = get_entry(client, args.entry_id)
+        if entry is None:
+            print(f'No dead-letter entry {args.entry_id}', file=sys.stderr)
+            return 1
+        print(json.dumps(entry, indent=2))
+    elif args.command == 'requeue':
+        try:
+            print(f'Requeued to {requeue(client, args.entry_id, args.queue)}')
+        except KeyError as e:
+            print(e.args[0], file=sys.stderr)
+            return 1
+    elif args.command == 'purge':
+        if not args.entry_ids and not args.all:
+            print('Pass entry IDs or --all', file=sys.stderr)
+            return 1
+        print(f'Removed {purge(client, args.entry_ids)} entries')
+    return 0
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())
@@ -0,0 +1,87 @@
+import time
+from collections import defaultdict
+from typing import Optional
+
+from selenium_worker import constants
+from selenium_worker.constants import STAGE_INITIAL
+from selenium_worker.exceptions import DeadlineExceededException
+
+# Names of the STAGE_* constants by value, used in reports
+STAGE_NAMES = {value: name[len('STAGE_'):].lower() for name, value in vars(constants).items()
+               if name.startswith('STAGE_')}
+
+
+def stage_name(stage: int) -> str:
+    return STAGE_NAMES.get(stage, str(stage))
+
+
+class Deadline:
+    """
+    Overall time budget of a job, shared by all of its steps.
+
+    Every step asks for its timeout through `step`, which cuts it down to the remaining budget and raises
+    `DeadlineExceededException` once nothing is left, and reports the time it took through `record`. Time spent and
+    overruns are accounted to the stage of the response the step ran in.
+    """
+
+    def __init__(self, budget_ms: int):
+        self.budget_ms = budget_ms
+        self.started = time.monotonic()
+        self.spent: dict[int, int] = defaultdict(int)
+        self.overruns: dict[int, int] = defaultdict(int)
+        self.exceeded_stage: Optional[int] = None
+
+    def elapsed_ms(self) -> int:
+        return round((time.monotonic() - self.started) * 1000)
+
+    def remaining_ms(self) -> int:
+        return self.budget_ms - self.elapsed_ms()
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining_ms() <= 0
+
+    def clamp(self, timeout_in_ms: int, minimum_ms: int = 0) -> int:
+        """Cut a step timeout down to the remaining budget, but not below `minimum_ms`."""
+        return max(minimum_ms, min(timeout_in_ms, self.remaining_ms()))
+
+    def step(self, timeout_in_ms: int, stage: int = STAGE_INITIAL) -> int:
+        """
+        Timeout for the next step of a job.
+
+        Args:
+            timeout_in_ms: Timeout of the step on its own, 0 for none
+            stage: Stage the step runs in
+
+        Returns:
+            int: The step timeout, cut down to the remaining budget
+
+        Raises:
+            DeadlineExceededException: If the budget is used up
+        """
+        remaining = self.remaining_ms()
+        if remaining <= 0:
+            if self.exceeded_stage is None:
+                self.exceeded_stage = stage
+                self.overruns[stage] += -remaining
+            raise DeadlineExceededException(f'Job budget of {self.budget_ms} ms. exceeded in stage '
+                                            f'{stage_name(stage)}')
+        return min(timeout_in_ms, remaining) if timeout_in_ms > 0 else remaining
+
+    def record(self, stage: int, allotted_ms: int, elapsed_ms: int):
+        """Account a finished step to its stage; time beyond the allotted timeout counts as an overrun."""
+        self.spent[stage] += elapsed_ms
+        if elapsed_ms > allotted_ms > 0:
+            self.overruns[stage] += elapsed_ms - allotted_ms
+
+    def summary(self) -> dict:
+        """Budget, elapsed time and, per stage name, the time spent in steps and their overruns in milliseconds."""
+        summary = {
+            'budget_ms': self.budget_ms,
+            'elapsed_ms': self.elapsed_ms(),
+            'spent': {stage_name(stage): spent for stage, spent in sorted(self.spent.items())},
+            'overruns': {stage_name(stage): overrun for stage, overrun in sorted(self.overruns.items()) if overrun}
+        }
+        if self.exceeded_stage is not None:
+            summary['exceeded_in'] = stage_name(self.exceeded_stage)
+        return summary
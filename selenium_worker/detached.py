@@ -0,0 +1,164 @@
+import json
+import logging
+import os
+import socket
+import subprocess
+import time
+import urllib.request
+from dataclasses import dataclass, asdict
+from typing import Optional
+
+import psutil
+from selenium import webdriver
+from selenium.webdriver import ChromeOptions
+from selenium.webdriver.chrome.service import Service
+
+from selenium_worker import config as cfg
+
+logger = logging.getLogger(__name__)
+
+# Seconds a freshly launched browser gets to open its remote debugging endpoint
+ENDPOINT_STARTUP_TIMEOUT = 20
+
+# Seconds a single probe of the remote debugging endpoint may take
+ENDPOINT_PROBE_TIMEOUT = 2
+
+
+@dataclass
+class BrowserState:
+    """A detached browser as recorded in the state file of a worker."""
+    pid: int
+    port: int
+    user_data_dir: str
+    launched_at: float
+
+    @staticmethod
+    def path(name: str) -> str:
+        return os.path.join(cfg.BrowserSettings.REATTACH_STATE_PATH, f'{name}.json')
+
+    @staticmethod
+    def load(name: str) -> Optional['BrowserState']:
+        try:
+            with open(BrowserState.path(name), 'r') as state_file:
+                return BrowserState(**json.load(state_file))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, TypeError) as e:
+            logger.warning(f'Ignoring unreadable browser state file {BrowserState.path(name)}: {e}')
+            return None
+
+    def save(self, name: str):
+        os.makedirs(cfg.BrowserSettings.REATTACH_STATE_PATH, exist_ok=True)
+        temporary_path = BrowserState.path(name) + '.tmp'
+        with open(temporary_path, 'w') as state_file:
+            json.dump(asdict(self), state_file)
+        # Readers never see a partially written state file
+        os.replace(temporary_path, BrowserState.path(name))
+
+    def remove(self, name: str):
+        """Remove the state file, unless it has meanwhile been overwritten with another browser."""
+        if BrowserState.load(name) == self:
+            try:
+                os.remove(BrowserState.path(name))
+            except FileNotFoundError:
+                pass
+
+    def process(self) -> Optional[psutil.Process]:
+        """Return the browser process if it is still running with the recorded user data directory."""
+        try:
+            process = psutil.Process(self.pid)
+            if f'--user-data-dir={self.user_data_dir}' in process.cmdline():
+                return process
+        except psutil.Error:
+            pass
+        return None
+
+
+def free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as probe:
+        probe.bind(('127.0.0.1', 0))
+        return probe.getsockname()[1]
+
+
+def check_endpoint(port: int, timeout: float = ENDPOINT_PROBE_TIMEOUT) -> bool:
+    """Check that a browser answers on its remote debugging endpoint."""
+    try:
+        with urllib.request.urlopen(f'http://127.0.0.1:{port}/json/version', timeout=timeout) as response:
+            return response.status == 200 and 'webSocketDebuggerUrl' in json.loads(response.read())
+    except (OSError, ValueError):
+        return False
+
+
+def wait_for_endpoint(port: int, timeout: float = ENDPOINT_STARTUP_TIMEOUT) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if check_endpoint(port, timeout=0.5):
+            return True
+        time.sleep(0.1)
+    return False
+
+
+def launch_detached_chrome(binary_path: str, user_data_dir: str, arguments: list[str]) -> BrowserState:
+    """
+    Launch Chrome in its own session with a remote debugging endpoint, so it outlives the worker process.
+
+    Args:
+        binary_path: Path to the Chrome binary
+        user_data_dir: Browser profile path
+        arguments: Additional command line arguments
+
+    Returns:
+        BrowserState: The launched browser
+
+    Raises:
+        RuntimeError: If the browser does not open its remote debugging endpoint in time
+    """
+    port = free_port()
+    command = [binary_path, f'--remote-debugging-port={port}', '--remote-debugging-address=127.0.0.1',
+               f'--user-data-dir={user_data_dir}', '--no-first-run', '--no-default-browser-check',
+               '--window-size=1920,1080', '--window-position=0,0',
+               *[argument for argument in arguments if not argument.startswith('--user-data-dir=')], 'about:blank']
+    # A new session keeps the browser out of the process group that supervisor signals when the worker stops
+    process = subprocess.Popen(command, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                               stderr=subprocess.DEVNULL, start_new_session=True)
+    state = BrowserState(process.pid, port, user_data_dir, time.time())
+
+    if not wait_for_endpoint(port):
+        kill_browser(state)
+        raise RuntimeError(f'Detached browser did not open its debugging endpoint on port {port}')
+
+    logger.info(f'Launched detached browser with PID of {process.pid}, debugging port {port}')
+    return state
+
+
+def attach_driver(state: BrowserState) -> webdriver.Chrome:
+    """Start a chromedriver that controls the already running browser."""
+    options = ChromeOptions()
+    options.debugger_address = f'127.0.0.1:{state.port}'
+    return webdriver.Chrome(service=Service(cfg.BrowserSettings.DRIVER_BINARY_PATH), options=options)
+
+
+def kill_browser(state: BrowserState, timeout: float = 5):
+    """Terminate a detached browser together with its renderer and helper processes."""
+    process = state.process()
+    if process is None:
+        return
+
+    try:
+        processes = [process, *process.children(recursive=True)]
+    except psutil.Error:
+        processes = [process]
+
+    for browser_process in processes:
+        try:
+            browser_process.terminate()
+        except psutil.Error:
+            continue
+
+    gone, alive = psutil.wait_procs(processes, timeout=timeout)
+    for browser_process in alive:
+        try:
+            browser_process.kill()
+        except psutil.Error:
+            continue
+    logger.info(f'Terminated detached browser with PID of {state.pid}')
@@ -0,0 +1,94 @@
+import logging
+import threading
+import time
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class DrainController:
+    """
+    Drains the worker once it is asked to stop.
+
+    A drain stops the worker from consuming further jobs and gives the process `budget` seconds to exit, of which
+    the job in flight may use all but `reserve` seconds. If the job does not finish in time, `on_expired` is called
+    with its UID on a timer thread, to record the interruption and take the process down before supervisor kills it.
+    """
+
+    def __init__(self):
+        self.requested_at: Optional[float] = None
+        self.budget = 0.0
+        self.job_uid: Optional[str] = None
+        self._lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+
+    @property
+    def draining(self) -> bool:
+        return self.requested_at is not None
+
+    def remaining(self, timeout: float) -> float:
+        """Cut a clean-up timeout down to what is left of the drain budget; unchanged if not draining."""
+        if self.requested_at is None:
+            return timeout
+        return max(0.0, min(timeout, self.budget - (time.monotonic() - self.requested_at)))
+
+    def job_started(self, job_uid: str):
+        with self._lock:
+            self.job_uid = job_uid
+
+    def job_finished(self):
+        with self._lock:
+            self.job_uid = None
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+    def request(self, budget: float, on_expired: Callable[[str], None], reserve: float = 0) -> Optional[str]:
+        """
+        Start draining.
+
+        Args:
+            budget: Seconds until the process has to be gone
+            on_expired: Called with the UID of the job in flight if it is still running after `budget - reserve`
+                seconds
+            reserve: Seconds of the budget kept for the clean-up after the job
+
+        Returns:
+            str: UID of the job in flight, None if the worker is idle
+        """
+        from celery.worker import state as worker_state
+
+        with self._lock:
+            if self.requested_at is None:
+                self.requested_at = time.monotonic()
+                self.budget = budget
+                # Checked by the consumer loop between jobs; the worker shuts down once the job in flight returns
+                worker_state.should_stop = 0
+
+            if self.job_uid is not None and self._timer is None:
+                job_budget = max(0.0, self.budget - reserve - (time.monotonic() - self.requested_at))
+                self._timer = threading.Timer(job_budget, self._expire, args=(on_expired,))
+                self._timer.name = 'drain-budget'
+                self._timer.daemon = True
+                self._timer.start()
+                logger.warning(f'Draining, job {self.job_uid} has {job_budget:.0f} s. to finish')
+            return self.job_uid
+
+    def _expire(self, on_expired: Callable[[str], None]):
+        with self._lock:
+            job_uid = self.job_uid
+            self._timer = None
+        if job_uid is not None:
+            logger.error(f'Job {job_uid} did not finish within the drain budget')
+            on_expired(job_uid)
+
+
+_drain: Optional[DrainController] = None
+
+
+def get_drain() -> DrainController:
+    """Return the process-wide drain controller."""
+    global _drain
+    if _drain is None:
+        _drain = DrainController()
+    return _drain
@@ -12,4 +12,10 @@ class ProxyVariation(StrEnum):
 class WorkerType(Enum):
     Unknown = "UNKNOWN"
     Montgomery = "KGAI"
-    FAA = "FAA"
\ No newline at end of file
+    FAA = "FAA"
+
+class RecoveryAction(StrEnum):
+    RETRY = 'retry'
+    SOFT_RESET = 'soft_reset'
+    RELAUNCH = 'relaunch'
+    RESTART = 'restart'
@@ -1,3 +1,15 @@
 class RetryException(Exception):
     def __init__(self, message):
-        super().__init__(message)
\ No newline at end of file
+        super().__init__(message)
+
+
+class BrowserHungException(Exception):
+    """A WebDriver command was aborted by the watchdog because the browser stopped responding."""
+    def __init__(self, message):
+        super().__init__(message)
+
+
+class DeadlineExceededException(Exception):
+    """The time budget of a job was used up before the job finished."""
+    def __init__(self, message):
+        super().__init__(message)
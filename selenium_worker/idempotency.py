@@ -0,0 +1,159 @@
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from redis import Redis
+from redis.exceptions import WatchError
+
+from selenium_worker import config as cfg
+from selenium_worker.Requests.ComplaintTaskRQ import ComplaintTaskRQ
+
+logger = logging.getLogger(__name__)
+
+CLAIM_KEY = 'claim.{}.{}'
+
+# A job holds the claim while it runs
+RUNNING = 'running'
+# The job completed and its response is stored with the claim
+DONE = 'done'
+
+
+@dataclass
+class Claim:
+    """State of the claim on a complaint as seen by a job."""
+    key: str
+    job_uid: str
+    state: str
+    owner: str
+    response: Optional[str] = None
+    ttl: int = 0
+
+    @property
+    def acquired(self) -> bool:
+        """Whether the job holds the claim and has to run."""
+        return self.state == RUNNING and self.owner == self.job_uid
+
+
+class JobClaims:
+    """
+    Claims on complaints that make job execution idempotent.
+
+    A job claims its complaint with `SET NX` and a lease before it touches the browser. A redelivery of the same job,
+    whose previous execution was lost, takes the claim over; any other job for the same complaint finds it either
+    still running or completed with a stored response. Only successful outcomes are stored; a failed job releases the
+    claim, so that the complaint can be submitted again.
+    """
+
+    def __init__(self, client: Redis, lease: int, result_ttl: int):
+        self.client = client
+        self.lease = lease
+        self.result_ttl = result_ttl
+
+    @staticmethod
+    def key(request: ComplaintTaskRQ) -> Optional[str]:
+        """Return the claim key of a request, None if the request does not identify its complaint."""
+        if request.ComplaintUuid:
+            return CLAIM_KEY.format(request.Type, request.ComplaintUuid)
+        if request.Id is not None and request.Id != -1:
+            return CLAIM_KEY.format(request.Type, request.Id)
+        return None
+
+    def claim(self, key: str, job_uid: str) -> Claim:
+        """
+        Claim a complaint for a job.
+
+        Args:
+            key: Claim key of the complaint
+            job_uid: UID of the job
+
+        Returns:
+            Claim: Acquired claim, or the claim of the job that ran or runs the complaint
+        """
+        value = json.dumps({'state': RUNNING, 'job': job_uid, 'worker': f'{cfg.GeneralSettings.WORKER_UID}:{os.getpid()}',
+                            'claimed_at': time.time()})
+        with self.client.pipeline(transaction=True) as pipeline:
+            while True:
+                if self.client.set(key, value, nx=True, ex=self.lease):
+                    return Claim(key, job_uid, RUNNING, job_uid)
+
+                try:
+                    pipeline.watch(key)
+                    raw = pipeline.get(key)
+                    if raw is None:
+                        # Expired in the meantime
+                        pipeline.unwatch()
+                        continue
+
+                    current = json.loads(raw)
+                    if current.get('state') == DONE or current.get('job') != job_uid:
+                        ttl = pipeline.ttl(key)
+                        pipeline.unwatch()
+                        return Claim(key, job_uid, current.get('state', RUNNING), current.get('job', ''),
+                                     current.get('response'), max(ttl, 0))
+
+                    pipeline.multi()
+                    pipeline.set(key, value, ex=self.lease)
+                    pipeline.execute()
+                    logger.warning(f'Job {job_uid} was redelivered after its previous execution was lost, '
+                                   f'taking over its claim')
+                    return Claim(key, job_uid, RUNNING, job_uid)
+                except WatchError:
+                    pipeline.reset()
+                    continue
+                except ValueError as e:
+                    logger.warning(f'Replacing unreadable claim {key}: {e}')
+                    pipeline.reset()
+                    self.client.delete(key)
+
+    def complete(self, claim: Claim, response: str):
+        """Store the response of a successful job as the terminal state of its claim."""
+        self._update_owned(claim, lambda pipeline: pipeline.set(claim.key, json.dumps({
+            'state': DONE,
+            'job': claim.job_uid,
+            'response': response,
+            'finished_at': time.time()
+        }), ex=self.result_ttl))
+
+    def release(self, claim: Claim):
+        """Give up the claim of a failed job."""
+        self._update_owned(claim, lambda pipeline: pipeline.delete(claim.key))
+
+    def _update_owned(self, claim: Claim, update: Callable):
+        if not claim.acquired:
+            return
+
+        with self.client.pipeline(transaction=True) as pipeline:
+            while True:
+                try:
+                    pipeline.watch(claim.key)
+                    raw = pipeline.get(claim.key)
+                    current = json.loads(raw) if raw else {}
+                    if current.get('state') != RUNNING or current.get('job') != claim.job_uid:
+                        pipeline.unwatch()
+                        logger.warning(f'Claim {claim.key} of job {claim.job_uid} was lost before the job finished')
+                        return
+
+                    pipeline.multi()
+                    update(pipeline)
+                    pipeline.execute()
+                    return
+                except WatchError:
+                    continue
+                except ValueError:
+                    pipeline.reset()
+                    return
+
+
+_job_claims: Optional[JobClaims] = None
+
+
+def get_job_claims() -> JobClaims:
+    """Return the process-wide job claims, backed by the pooled Redis client."""
+    global _job_claims
+    if _job_claims is None:
+        _job_claims = JobClaims(cfg.RedisSettings.rds(), cfg.IdempotencySettings.LEASE,
+                                cfg.IdempotencySettings.RESULT_TTL)
+    return _job_claims
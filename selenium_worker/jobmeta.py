@@ -0,0 +1,369 @@
+import gzip
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Iterable, Optional
+
+from redis import Redis
+from redis.exceptions import ResponseError, WatchError
+
+from selenium_worker import config as cfg
+from selenium_worker.utils import date_encoder
+
+logger = logging.getLogger(__name__)
+
+JOB_KEY = 'job.{}'
+
+# Sorted set of job UIDs scored by the `started_at` timestamp of the job
+STARTED_INDEX_KEY = 'jobs.by_started'
+
+# Held by the worker that currently moves old job metadata into the archive
+ARCHIVE_LOCK_KEY = 'jobs.archive.lock'
+
+# Number of jobs moved into the archive per round trip
+ARCHIVE_BATCH = 500
+
+# Fields stored as ISO 8601 strings and returned as datetime objects
+TIMESTAMP_FIELDS = frozenset({'started_at', 'finished_at', 'callback_delivered_at', 'interrupted_at'})
+
+# Fields stored as plain strings; every other field is stored JSON-encoded
+STRING_FIELDS = frozenset({'task_post_run'})
+
+
+def encode_field(name: str, value: Any) -> str:
+    if name in TIMESTAMP_FIELDS:
+        return value.isoformat() if isinstance(value, datetime) else str(value)
+    if name in STRING_FIELDS:
+        return str(value)
+    return json.dumps(value, default=date_encoder)
+
+
+def decode_field(name: str, raw: Optional[bytes]) -> Any:
+    if raw is None:
+        return None
+
+    value = raw.decode('utf-8') if isinstance(raw, bytes) else raw
+    if name in STRING_FIELDS:
+        return value
+    if name in TIMESTAMP_FIELDS:
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            return value
+    try:
+        return json.loads(value)
+    except ValueError:
+        # Written by something other than this codec
+        return value
+
+
+class JobMetaStore:
+    """
+    Job metadata kept as one Redis hash per job, `job.{uid}`.
+
+    Fields are written individually, so the task body and the post-run signal never overwrite each other's fields,
+    and several fields are written in a single round trip. Jobs that still have their metadata in the legacy JSON
+    string format are converted to a hash the first time they are touched.
+
+    Every write refreshes the expiry of the hash, and jobs are indexed by `started_at` in a sorted set so that
+    time-range queries do not need to scan the keyspace.
+    """
+
+    def __init__(self, client: Redis, ttl: int = 0):
+        self.client = client
+        self.ttl = ttl
+
+    @staticmethod
+    def key(uid: str) -> str:
+        return JOB_KEY.format(uid)
+
+    def update(self, uid: str, fields: dict[str, Any]):
+        """Set the given fields of a job, leaving all other fields untouched."""
+        if not fields:
+            return
+
+        mapping = {name: encode_field(name, value) for name, value in fields.items() if value is not None}
+        removed = [name for name, value in fields.items() if value is None]
+
+        pipeline = self.client.pipeline(transaction=True)
+        if mapping:
+            pipeline.hset(self.key(uid), mapping=mapping)
+        if removed:
+            pipeline.hdel(self.key(uid), *removed)
+        if self.ttl > 0:
+            pipeline.expire(self.key(uid), self.ttl)
+        if isinstance(fields.get('started_at'), datetime):
+            pipeline.zadd(STARTED_INDEX_KEY, {uid: fields['started_at'].timestamp()})
+        try:
+            pipeline.execute()
+        except ResponseError as e:
+            if 'WRONGTYPE' not in str(e):
+                raise
+            self.migrate(uid)
+            self.update(uid, fields)
+
+    def increment(self, uid: str, name: str, amount: int = 1) -> int:
+        """Atomically add to a numeric field of a job and return its new value."""
+        pipeline = self.client.pipeline(transaction=True)
+        pipeline.hincrby(self.key(uid), name, amount)
+        if self.ttl > 0:
+            pipeline.expire(self.key(uid), self.ttl)
+        try:
+            return pipeline.execute()[0]
+        except ResponseError as e:
+            if 'WRONGTYPE' not in str(e):
+                raise
+            self.migrate(uid)
+            return self.increment(uid, name, amount)
+
+    def get(self, uid: str, name: str) -> Any:
+        try:
+            return decode_field(name, self.client.hget(self.key(uid), name))
+        except ResponseError as e:
+            if 'WRONGTYPE' not in str(e):
+                raise
+            return self.migrate(uid).get(name)
+
+    def load(self, uid: str, names: Optional[Iterable[str]] = None) -> dict[str, Any]:
+        """
+        Read the metadata of a job.
+
+        Args:
+            uid: Job UID
+            names: Fields to read, all of them if omitted
+
+        Returns:
+            dict: Decoded fields that exist
+        """
+        try:
+            if names is None:
+                raw = self.client.hgetall(self.key(uid))
+                return {name.decode('utf-8'): decode_field(name.decode('utf-8'), value) for name, value in raw.items()}
+
+            names = list(names)
+            values = self.client.hmget(self.key(uid), names)
+            return {name: decode_field(name, value) for name, value in zip(names, values) if value is not None}
+        except ResponseError as e:
+            if 'WRONGTYPE' not in str(e):
+                raise
+            meta = self.migrate(uid)
+            return meta if names is None else {name: meta[name] for name in names if name in meta}
+
+    def migrate(self, uid: str) -> dict[str, Any]:
+        """Convert legacy JSON string metadata of a job into a hash and return its fields."""
+        key = self.key(uid)
+        with self.client.pipeline(transaction=True) as pipeline:
+            while True:
+                try:
+                    pipeline.watch(key)
+                    if pipeline.type(key) not in (b'string', 'string'):
+                        pipeline.unwatch()
+                        break
+
+                    legacy = json.loads(pipeline.get(key) or '{}')
+                    # Null fields are not stored, as with `update`
+                    mapping = {name: encode_field(name, value) for name, value in legacy.items() if value is not None}
+                    meta = {name: decode_field(name, value) for name, value in mapping.items()}
+                    ttl = pipeline.ttl(key)
+
+                    pipeline.multi()
+                    pipeline.delete(key)
+                    if mapping:
+                        pipeline.hset(key, mapping=mapping)
+                    if ttl > 0:
+                        pipeline.expire(key, ttl)
+                    elif self.ttl > 0:
+                        pipeline.expire(key, self.ttl)
+                    if isinstance(meta.get('started_at'), datetime):
+                        pipeline.zadd(STARTED_INDEX_KEY, {uid: meta['started_at'].timestamp()})
+                    pipeline.execute()
+                    logger.info(f'Converted legacy metadata of job {uid} into a hash')
+                    return meta
+                except WatchError:
+                    continue
+                except ValueError as e:
+                    logger.warning(f'Discarding unreadable legacy metadata of job {uid}: {e}')
+                    pipeline.reset()
+                    self.client.delete(key)
+                    return {}
+
+        return self.load(uid)
+
+    def load_many(self, uids: list[str], names: Optional[Iterable[str]] = None) -> list[dict[str, Any]]:
+        """Read the metadata of several jobs in one round trip; jobs whose metadata is gone yield empty dicts."""
+        names = list(names) if names is not None else None
+        pipeline = self.client.pipeline(transaction=False)
+        for uid in uids:
+            if names is None:
+                pipeline.hgetall(self.key(uid))
+            else:
+                pipeline.hmget(self.key(uid), names)
+
+        results = []
+        for raw in pipeline.execute(raise_on_error=False):
+            if isinstance(raw, Exception):
+                results.append({})
+            elif names is None:
+                results.append({name.decode('utf-8'): decode_field(name.decode('utf-8'), value)
+                                for name, value in raw.items()})
+            else:
+                results.append({name: decode_field(name, value) for name, value in zip(names, raw)
+                                if value is not None})
+        return results
+
+    def query(self, since: datetime, until: Optional[datetime] = None, min_processing_total: Optional[int] = None,
+              names: Optional[Iterable[str]] = None) -> dict[str, dict[str, Any]]:
+        """
+        Find jobs by start time using the `started_at` index.
+
+        Args:
+            since: Earliest start time, inclusive
+            until: Latest start time, inclusive; no upper bound if omitted
+            min_processing_total: Only return jobs whose `processing_total` is at least this many milliseconds
+            names: Fields to read, all of them if omitted
+
+        Returns:
+            dict: Metadata by job UID, ordered by start time
+        """
+        uids = [uid.decode('utf-8') for uid in self.client.zrangebyscore(
+            STARTED_INDEX_KEY, since.timestamp(), until.timestamp() if until is not None else '+inf')]
+        if names is not None and min_processing_total is not None:
+            names = {*names, 'processing_total'}
+
+        jobs = {}
+        for uid, meta in zip(uids, self.load_many(uids, names)):
+            if not meta:
+                continue
+            if min_processing_total is not None and (meta.get('processing_total') or 0) < min_processing_total:
+                continue
+            jobs[uid] = meta
+        return jobs
+
+
+class JobMetaArchiver:
+    """
+    Moves job metadata older than `archive_after` seconds from Redis into gzip-compressed JSON lines files, one per
+    day of `started_at`, on a background thread. A Redis lock makes sure only one worker archives at a time.
+
+    Without an archive path nothing is archived; the thread only drops jobs whose metadata expired from the started
+    index, which is not covered by the TTL of the metadata.
+    """
+
+    def __init__(self, store: JobMetaStore, archive_path: str, archive_after: int, interval: float = 3600):
+        self.store = store
+        self.archive_path = archive_path
+        self.archive_after = archive_after
+        self.interval = interval
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name='job-meta-archiver', daemon=True)
+        self._thread.start()
+
+    def archive(self) -> int:
+        """
+        Archive all jobs that started more than `archive_after` seconds ago.
+
+        Returns:
+            int: Number of archived jobs, 0 if another worker holds the archive lock
+        """
+        client = self.store.client
+        token = f'{cfg.GeneralSettings.WORKER_UID}:{os.getpid()}'
+        if not client.set(ARCHIVE_LOCK_KEY, token, nx=True, ex=max(60, int(self.interval))):
+            return 0
+
+        archived = 0
+        try:
+            cutoff = time.time() - self.archive_after
+            while True:
+                uids = [uid.decode('utf-8') for uid in
+                        client.zrangebyscore(STARTED_INDEX_KEY, '-inf', cutoff, start=0, num=ARCHIVE_BATCH)]
+                if not uids:
+                    break
+
+                days = defaultdict(list)
+                for uid, meta in zip(uids, self.store.load_many(uids)):
+                    # Jobs whose metadata already expired only have to leave the index
+                    if meta:
+                        started_at = meta.get('started_at')
+                        day = started_at.strftime('%Y-%m-%d') if isinstance(started_at, datetime) else 'unknown'
+                        days[day].append(json.dumps({'uid': uid, **meta}, default=date_encoder))
+
+                self._write(days)
+
+                pipeline = client.pipeline(transaction=False)
+                pipeline.delete(*[self.store.key(uid) for uid in uids])
+                pipeline.zrem(STARTED_INDEX_KEY, *uids)
+                pipeline.execute()
+                archived += len(uids)
+        finally:
+            if client.get(ARCHIVE_LOCK_KEY) == token.encode('utf-8'):
+                client.delete(ARCHIVE_LOCK_KEY)
+
+        if archived > 0:
+            logger.info(f'Archived metadata of {archived} jobs into {self.archive_path}')
+        return archived
+
+    def trim(self) -> int:
+        """
+        Drop jobs whose metadata expired from the started index.
+
+        Returns:
+            int: Number of jobs dropped
+        """
+        if self.store.ttl <= 0:
+            return 0
+        trimmed = self.store.client.zremrangebyscore(STARTED_INDEX_KEY, '-inf', time.time() - self.store.ttl)
+        if trimmed > 0:
+            logger.info(f'Dropped {trimmed} expired jobs from the started index')
+        return trimmed
+
+    def _write(self, days: dict[str, list[str]]):
+        os.makedirs(self.archive_path, exist_ok=True)
+        for day, lines in days.items():
+            # Appending adds a gzip member, readers see a single stream of JSON lines
+            with gzip.open(os.path.join(self.archive_path, f'jobs-{day}.jsonl.gz'), 'at', encoding='utf-8') as archive:
+                archive.write('\n'.join(lines) + '\n')
+
+    def _run(self):
+        while True:
+            try:
+                if self.archive_path:
+                    self.archive()
+                else:
+                    self.trim()
+            except Exception as e:
+                logger.error(f'Failed to archive job metadata: {e}')
+            time.sleep(self.interval)
+
+
+_job_store: Optional[JobMetaStore] = None
+_job_archiver: Optional[JobMetaArchiver] = None
+
+
+def get_job_store() -> JobMetaStore:
+    """Return the process-wide job metadata store, backed by the pooled Redis client."""
+    global _job_store
+    if _job_store is None:
+        _job_store = JobMetaStore(cfg.RedisSettings.rds(), cfg.JobMetaSettings.TTL)
+    return _job_store
+
+
+def get_job_archiver() -> JobMetaArchiver:
+    """Return the process-wide job metadata archiver, starting its thread on first use."""
+    global _job_archiver
+    if _job_archiver is None:
+        if cfg.JobMetaSettings.ARCHIVE_AFTER > 0 and not cfg.JobMetaSettings.ARCHIVE_PATH:
+            logger.warning('Job metadata is not archived, JOB_META_ARCHIVE_PATH must be set to a directory shared by '
+                           'all workers')
+        _job_archiver = JobMetaArchiver(get_job_store(),
+                                        cfg.JobMetaSettings.ARCHIVE_PATH if cfg.JobMetaSettings.archiving() else '',
+                                        cfg.JobMetaSettings.ARCHIVE_AFTER, cfg.JobMetaSettings.ARCHIVE_INTERVAL)
+        _job_archiver.start()
+    return _job_archiver
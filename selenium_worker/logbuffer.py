@@ -0,0 +1,76 @@
+import logging
+import time
+from collections import deque
+from typing import Iterator, NamedTuple
+
+# Longer messages are truncated when they are recorded
+MAX_MESSAGE_LENGTH = 2000
+
+
+class LogRecord(NamedTuple):
+    created: float
+    level: int
+    message: str
+
+    def format(self, prefix: str = '') -> str:
+        """
+        Legacy `[timestamp] - message` form the responses have always carried.
+
+        Args:
+            prefix: Already formatted UTC date and time of the record up to the seconds
+        """
+        second = int(self.created)
+        if not prefix:
+            prefix = time.strftime('%Y-%m-%d-%H:%M:%S', time.gmtime(second))
+        return f'[{prefix}.{int((self.created - second) * 1000):03d}] - {self.message}'
+
+
+class LogBuffer:
+    """
+    Ring buffer of the log records of a single task.
+
+    Only the last `capacity` records are kept; older ones are dropped and counted. Records are formatted only when
+    the response is encoded.
+    """
+
+    def __init__(self, capacity: int = 200):
+        self._records: deque[LogRecord] = deque(maxlen=max(1, capacity))
+        self.dropped = 0
+
+    def record(self, level: int, message: str) -> LogRecord:
+        if len(message) > MAX_MESSAGE_LENGTH:
+            message = message[:MAX_MESSAGE_LENGTH] + '...'
+        if len(self._records) == self._records.maxlen:
+            self.dropped += 1
+
+        log_record = LogRecord(time.time(), level, message)
+        self._records.append(log_record)
+        return log_record
+
+    def append(self, message: str):
+        self.record(logging.INFO, message)
+
+    def messages(self) -> list[str]:
+        """Formatted records, preceded by a note on how many were dropped."""
+        messages = []
+        second = None
+        prefix = ''
+        for log_record in self._records:
+            # Records of the same second share the formatted date and time
+            if int(log_record.created) != second:
+                second = int(log_record.created)
+                prefix = time.strftime('%Y-%m-%d-%H:%M:%S', time.gmtime(second))
+            messages.append(log_record.format(prefix))
+        if self.dropped > 0:
+            messages.insert(0, f'[...] - {self.dropped} earlier log records dropped')
+        return messages
+
+    def clear(self):
+        self._records.clear()
+        self.dropped = 0
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __iter__(self) -> Iterator[LogRecord]:
+        return iter(self._records)
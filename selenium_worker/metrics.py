@@ -0,0 +1,216 @@
+"""
+Metrics of the worker process in the Prometheus text format, served on `http://{MetricsSettings.HOST}:{PORT}/metrics`.
+
+Histograms use the same fixed buckets on every worker, so they can be summed across the fleet.
+"""
+
+import logging
+import math
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the latency histogram buckets in seconds
+LATENCY_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _format_value(value: float) -> str:
+    if math.isnan(value):
+        return 'NaN'
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Metric:
+    """A metric with a value per combination of label values; or a single value read from `function`."""
+    type = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.function: Optional[Callable[[], float]] = None
+        self._values: dict[tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict[str, str]) -> tuple[str, ...]:
+        return tuple(str(labels.get(name, '')) for name in self.labels)
+
+    def set_function(self, function: Callable[[], float]) -> 'Metric':
+        """Read the value from `function` on every scrape."""
+        self.function = function
+        return self
+
+    def samples(self) -> list[str]:
+        if self.function is not None:
+            try:
+                return [f'{self.name} {_format_value(self.function())}']
+            except Exception as e:
+                logger.warning(f'Failed to collect metric {self.name}: {e}')
+                return []
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f'{self.name}{_format_labels(self.labels, key)} {_format_value(value)}' for key, value in values]
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    type = 'gauge'
+
+    def set(self, value: float, **labels: str):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = (),
+                 buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+        # Per label values: count per bucket, with the +Inf bucket last, and the sum of observations
+        self._histograms: dict[tuple[str, ...], tuple[list[int], list[float]]] = {}
+
+    def observe(self, value: float, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._histograms.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0]))
+            index = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+            counts[index] += 1
+            total[0] += value
+
+    def samples(self) -> list[str]:
+        with self._lock:
+            histograms = sorted((key, (list(counts), total[0])) for key, (counts, total) in self._histograms.items())
+
+        lines = []
+        for key, (counts, total) in histograms:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                bucket = 'le="{}"'.format(_format_value(bound))
+                lines.append(f'{self.name}_bucket{_format_labels(self.labels, key, bucket)} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(self.labels, key)} {_format_value(total)}')
+            lines.append(f'{self.name}_count{_format_labels(self.labels, key)} {cumulative}')
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics: list[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labels: tuple[str, ...] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labels))
+
+    def gauge(self, name: str, documentation: str, labels: tuple[str, ...] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labels))
+
+    def histogram(self, name: str, documentation: str, labels: tuple[str, ...] = (),
+                  buckets: tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labels, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+worker_info = registry.gauge('worker_info', 'Worker identity', ('worker', 'type'))
+tasks = registry.counter('worker_tasks_total', 'Jobs received by the worker, by outcome', ('outcome',))
+task_duration = registry.histogram('worker_task_duration_seconds', 'Time from dequeue until the job finished')
+stage_duration = registry.histogram('worker_stage_duration_seconds', 'Time spent in the phases of a job',
+                                    ('phase',))
+browser_launches = registry.counter('worker_browser_launches_total', 'Browsers launched or re-attached to',
+                                    ('mode',))
+soft_resets = registry.counter('worker_soft_resets_total', 'Browsers reset in place instead of relaunched',
+                               ('result',))
+recoveries = registry.counter('worker_recoveries_total', 'Recovery actions taken after failures',
+                              ('action', 'result'))
+callbacks = registry.counter('worker_callbacks_total', 'Verification callback deliveries by the callback sender',
+                             ('result',))
+watchdog_aborts = registry.counter('worker_watchdog_aborts_total', 'WebDriver commands aborted by the watchdog')
+watchdog_reclaimed = registry.counter('worker_watchdog_reclaimed_seconds_total',
+                                      'Worker seconds reclaimed by watchdog aborts')
+browser_rss = registry.gauge('worker_browser_rss_bytes', 'Resident memory of chromedriver and the browser processes')
+since_last_task = registry.gauge('worker_seconds_since_last_task',
+                                 'Seconds since the last job finished, or since the worker started')
+
+
+def observe_timeline(summary: dict[str, int]):
+    """Record the phases of a `JobTimeline.summary` in the latency histograms."""
+    for phase, elapsed_ms in summary.items():
+        if phase == 'total_ms':
+            task_duration.observe(elapsed_ms / 1000)
+        else:
+            stage_duration.observe(elapsed_ms / 1000, phase=phase[:-len('_ms')])
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        body = registry.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Scrapes would flood the worker log
+        pass
+
+
+_server: Optional[ThreadingHTTPServer] = None
+
+
+def start_metrics_server(port: int, host: str = '127.0.0.1') -> Optional[ThreadingHTTPServer]:
+    """Serve the metrics of the process on a daemon thread; once per process."""
+    global _server
+    if _server is not None:
+        return _server
+
+    try:
+        _server = ThreadingHTTPServer((host, port), MetricsHandler)
+    except OSError as e:
+        logger.error(f'Failed to serve metrics on {host}:{port}: {e}')
+        return None
+    _server.daemon_threads = True
+    threading.Thread(target=_server.serve_forever, name='metrics-server', daemon=True).start()
+    logger.info(f'Serving metrics on http://{host}:{port}/metrics')
+    return _server
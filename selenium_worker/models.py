@@ -0,0 +1,178 @@
+import json
+from datetime import date
+from json import JSONEncoder
+from typing import Any, Callable, Optional, Union
+
+from selenium_worker.logbuffer import LogBuffer
+
+# Marks a required field that is missing when its value is falsy
+FALSY = object()
+
+_NO_DEFAULT = object()
+
+
+class Field:
+    """
+    Declaration of a model field.
+
+    Args:
+        default: Value of the field when the payload does not contain it
+        required: Whether `validate` reports the field when its value is missing
+        missing: Value that counts as missing; by default every falsy value does
+        factory: Called to create the default, for mutable defaults
+    """
+    __slots__ = ('name', 'default', 'required', 'missing', 'factory')
+
+    def __init__(self, default: Any = None, required: bool = False, missing: Any = FALSY,
+                 factory: Optional[Callable[[], Any]] = None):
+        self.name = ''
+        self.default = default
+        self.required = required
+        self.missing = missing
+        self.factory = factory
+
+    def copy(self, default: Any = _NO_DEFAULT) -> 'Field':
+        field = Field(self.default if default is _NO_DEFAULT else default, self.required, self.missing,
+                      self.factory if default is _NO_DEFAULT else None)
+        field.name = self.name
+        return field
+
+
+def _compile(name: str, source: str, namespace: dict) -> Callable:
+    exec(compile(source, f'<model {name}>', 'exec'), namespace)
+    return namespace[name]
+
+
+def _build_init(fields: list[Field]) -> Callable:
+    namespace = {'_EMPTY': {}, '_NAMES': frozenset(field.name for field in fields)}
+    lines = ['def __init__(self, j=None):',
+             '    if not j:',
+             '        j = _EMPTY',
+             '    get = j.get']
+    for index, field in enumerate(fields):
+        if field.factory is not None:
+            namespace[f'_f{index}'] = field.factory
+            lines.append(f'    value = get({field.name!r}, _EMPTY)')
+            lines.append(f'    self.{field.name} = _f{index}() if value is _EMPTY else value')
+        else:
+            namespace[f'_d{index}'] = field.default
+            lines.append(f'    self.{field.name} = get({field.name!r}, _d{index})')
+    lines += ['    self.extras = {key: value for key, value in j.items() if key not in _NAMES} '
+              'if len(j) and not _NAMES.issuperset(j) else None',
+              '    self.__post_init__()']
+    return _compile('__init__', '\n'.join(lines), namespace)
+
+
+def _build_validate(fields: list[Field]) -> Callable:
+    namespace = {}
+    lines = ['def validate(self):',
+             '    errors = []']
+    for index, field in enumerate(fields):
+        if not field.required:
+            continue
+        if field.missing is FALSY:
+            condition = f'not self.{field.name}'
+        elif field.missing is None:
+            condition = f'self.{field.name} is None'
+        else:
+            namespace[f'_m{index}'] = field.missing
+            condition = f'self.{field.name} == _m{index}'
+        lines.append(f'    if {condition}:')
+        lines.append(f'        errors.append("Missing `{field.name}` value")')
+    lines.append('    return errors')
+    return _compile('validate', '\n'.join(lines), namespace)
+
+
+def _build_to_dict(fields: list[Field]) -> Callable:
+    items = ', '.join(f'{field.name!r}: self.{field.name}' for field in fields)
+    source = '\n'.join(['def to_dict(self):',
+                        f'    result = {{{items}}}',
+                        '    if self.extras:',
+                        '        result.update(self.extras)',
+                        '    return result'])
+    return _compile('to_dict', source, {})
+
+
+class ModelMeta(type):
+    """
+    Turns annotated class attributes into slotted fields and generates `__init__`, `validate` and `to_dict`.
+
+    A class attribute may be a plain default or a `Field`; subclasses inherit the fields of their bases and may
+    override their defaults. Payload keys without a field are kept in `extras`.
+    """
+
+    def __new__(mcs, name, bases, namespace):
+        inherited: dict[str, Field] = {}
+        for base in reversed(bases):
+            inherited.update(getattr(base, '__fields__', {}))
+
+        fields = dict(inherited)
+        own_slots = []
+        annotations = namespace.get('__annotations__')
+        if annotations is None and '__annotate__' in namespace:
+            # Annotations are evaluated lazily from Python 3.14 on
+            annotations = namespace['__annotate__'](1)
+
+        for attr in annotations or {}:
+            if attr.startswith('_'):
+                continue
+            value = namespace.pop(attr, None)
+            if isinstance(value, Field):
+                field = value
+            elif attr in inherited:
+                field = inherited[attr].copy(value)
+            else:
+                field = Field(value)
+            field.name = attr
+            fields[attr] = field
+            if attr not in inherited:
+                own_slots.append(attr)
+
+        if not any(hasattr(base, '__fields__') for base in bases):
+            own_slots.append('extras')
+        namespace['__slots__'] = tuple(own_slots)
+        namespace['__fields__'] = fields
+
+        ordered = list(fields.values())
+        # Hand-written methods take precedence over the generated ones
+        namespace.setdefault('__init__', _build_init(ordered))
+        namespace.setdefault('validate', _build_validate(ordered))
+        namespace.setdefault('to_dict', _build_to_dict(ordered))
+        return super().__new__(mcs, name, bases, namespace)
+
+
+class Model(metaclass=ModelMeta):
+    """Base class of request and response models."""
+
+    def __post_init__(self):
+        pass
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({self.to_dict()!r})'
+
+
+def _default(o):
+    if isinstance(o, Model):
+        return o.to_dict()
+    if isinstance(o, LogBuffer):
+        return o.messages()
+    if isinstance(o, date):
+        return o.isoformat()
+    raise TypeError(f'Object of type {type(o).__name__} is not JSON serializable')
+
+
+def encode(model: Model) -> str:
+    """Serialize a model to JSON."""
+    return json.dumps(model.to_dict(), default=_default)
+
+
+def decode(model_type: type, data: Union[str, bytes, dict, None]) -> Model:
+    """Build a model from a JSON document or an already decoded payload."""
+    if isinstance(data, (str, bytes)):
+        data = json.loads(data) if data else None
+    return model_type(data)
+
+
+class ModelEncoder(JSONEncoder):
+    def default(self, o):
+        return _default(o)
@@ -0,0 +1,255 @@
+import json
+import logging
+import os
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+import requests
+from redis import Redis
+from redis.exceptions import ResponseError
+from requests.adapters import HTTPAdapter
+
+from selenium_worker import config as cfg
+from selenium_worker import metrics
+from selenium_worker.jobmeta import get_job_store
+
+logger = logging.getLogger(__name__)
+
+# Callbacks waiting to be delivered
+OUTBOX_STREAM = 'callbacks.outbox'
+# Failed callbacks by the time of their next attempt
+RETRY_KEY = 'callbacks.retry'
+# Callbacks that could not be delivered within the maximum number of attempts
+DEAD_STREAM = 'callbacks.dead'
+SENDER_GROUP = 'callback-senders'
+
+# Approximate number of entries kept in the outbox and dead streams
+STREAM_MAX_LENGTH = 100000
+
+# Pending entries of a sender that died are taken over after this many milliseconds
+CLAIM_IDLE_MS = 5 * 60 * 1000
+
+# Moves due retries back into the outbox; in one script, so a retry is never lost between removal and re-queueing
+RELEASE_RETRIES_SCRIPT = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+for _, member in ipairs(due) do
+    redis.call('ZREM', KEYS[1], member)
+    local fields = {}
+    for key, value in pairs(cjson.decode(member)) do
+        table.insert(fields, key)
+        table.insert(fields, tostring(value))
+    end
+    redis.call('XADD', KEYS[2], 'MAXLEN', '~', ARGV[3], '*', unpack(fields))
+end
+return #due
+"""
+
+CALLBACK_HEADERS = {
+    'Content-Type': 'application/json',
+    'Accept': 'application/json'
+}
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def get_callback_session() -> requests.Session:
+    """Return the process-wide HTTP session used for callbacks, keeping connections alive between them."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=cfg.CallbackSettings.POOL_SIZE,
+                                  pool_maxsize=cfg.CallbackSettings.POOL_SIZE)
+            _session.mount('http://', adapter)
+            _session.mount('https://', adapter)
+            _session.headers.update(CALLBACK_HEADERS)
+    return _session
+
+
+def enqueue_callback(client: Redis, url: str, body: dict, job_uid: str = '') -> str:
+    """
+    Write a callback to the outbox.
+
+    Args:
+        client: Redis client
+        url: Callback URL
+        body: JSON body of the callback
+        job_uid: UID of the job the callback belongs to
+
+    Returns:
+        str: ID of the outbox entry
+    """
+    entry_id = client.xadd(OUTBOX_STREAM, {
+        'url': url,
+        'body': json.dumps(body),
+        'job': job_uid,
+        'attempts': 0,
+        'created': datetime.now(timezone.utc).isoformat()
+    }, maxlen=STREAM_MAX_LENGTH, approximate=True)
+    return entry_id.decode('utf-8') if isinstance(entry_id, bytes) else entry_id
+
+
+def post_callback(url: str, body: dict, timeout: Optional[float] = None) -> requests.Response:
+    return get_callback_session().post(url, data=json.dumps(body),
+                                       timeout=timeout if timeout is not None else cfg.CallbackSettings.TIMEOUT)
+
+
+def retry_delay(attempts: int) -> float:
+    """Exponential backoff with jitter for the given number of failed attempts."""
+    delay = min(cfg.CallbackSettings.RETRY_MAX, cfg.CallbackSettings.RETRY_BASE * 2 ** (attempts - 1))
+    return delay * random.uniform(0.8, 1.2)
+
+
+class CallbackSender:
+    """
+    Delivers callbacks from the outbox stream.
+
+    Entries are read in batches through a consumer group, so several senders share the work and entries of a
+    sender that died are taken over by another one. Failed deliveries are rescheduled with exponential backoff;
+    after `CallbackSettings.MAX_ATTEMPTS` attempts an entry is moved to the dead stream.
+    """
+
+    def __init__(self, client: Redis, consumer: str):
+        self.client = client
+        self.consumer = consumer
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._next_claim = 0.0
+        self._release_retries = client.register_script(RELEASE_RETRIES_SCRIPT)
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, name='callback-sender', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 0):
+        self._stop.set()
+        if self._thread is not None and timeout > 0:
+            self._thread.join(timeout)
+
+    def ensure_group(self):
+        try:
+            self.client.xgroup_create(OUTBOX_STREAM, SENDER_GROUP, id='0', mkstream=True)
+        except ResponseError as e:
+            if 'BUSYGROUP' not in str(e):
+                raise
+
+    def release_due_retries(self):
+        """Move retries whose backoff has elapsed back into the outbox."""
+        self._release_retries(keys=[RETRY_KEY, OUTBOX_STREAM],
+                              args=[time.time(), cfg.CallbackSettings.BATCH_SIZE, STREAM_MAX_LENGTH])
+
+    def remove_idle_consumers(self):
+        """
+        Delete consumers of the group that have been idle for longer than `CLAIM_IDLE_MS` without pending entries.
+
+        Every sender process joins under a name of its own, so those of processes that are gone would otherwise
+        accumulate in the group.
+        """
+        for consumer in self.client.xinfo_consumers(OUTBOX_STREAM, SENDER_GROUP):
+            name = consumer['name'].decode('utf-8') if isinstance(consumer['name'], bytes) else consumer['name']
+            if name != self.consumer and consumer['pending'] == 0 and consumer['idle'] > CLAIM_IDLE_MS:
+                self.client.xgroup_delconsumer(OUTBOX_STREAM, SENDER_GROUP, name)
+                logger.info(f'Removed idle callback sender {name}')
+
+    def read_batch(self, block_ms: int) -> list[tuple]:
+        entries = []
+        if time.monotonic() >= self._next_claim:
+            claimed = self.client.xautoclaim(OUTBOX_STREAM, SENDER_GROUP, self.consumer, CLAIM_IDLE_MS, '0-0',
+                                             count=cfg.CallbackSettings.BATCH_SIZE)
+            entries.extend(claimed[1] if claimed else [])
+            # Entries of dead senders were just taken over, so they are left without pending entries
+            self.remove_idle_consumers()
+            self._next_claim = time.monotonic() + CLAIM_IDLE_MS / 1000 / 5
+
+        if not entries:
+            response = self.client.xreadgroup(SENDER_GROUP, self.consumer, {OUTBOX_STREAM: '>'},
+                                              count=cfg.CallbackSettings.BATCH_SIZE, block=block_ms)
+            for stream, stream_entries in response or []:
+                entries.extend(stream_entries)
+        return entries
+
+    def deliver(self, entry_id, fields: dict):
+        entry = {key.decode('utf-8') if isinstance(key, bytes) else key:
+                 value.decode('utf-8') if isinstance(value, bytes) else value for key, value in fields.items()}
+        attempts = int(entry.get('attempts', 0)) + 1
+        error = ''
+        status = 0
+
+        try:
+            response = post_callback(entry['url'], json.loads(entry['body']))
+            status = response.status_code
+            if status in [200, 201, 202]:
+                logger.info(f'Callback {entry_id} of job {entry.get("job")} delivered, status {status}')
+            else:
+                error = f'status {status}: {response.text[:500]}'
+        except Exception as e:
+            error = str(e)
+
+        metrics.callbacks.inc(result='failed' if error else 'delivered')
+        pipeline = self.client.pipeline(transaction=True)
+        if error and attempts >= cfg.CallbackSettings.MAX_ATTEMPTS:
+            logger.error(f'Giving up on callback {entry_id} of job {entry.get("job")} after {attempts} attempts: '
+                         f'{error}')
+            pipeline.xadd(DEAD_STREAM, {**entry, 'attempts': attempts, 'error': error},
+                          maxlen=STREAM_MAX_LENGTH, approximate=True)
+        elif error:
+            delay = retry_delay(attempts)
+            logger.warning(f'Callback {entry_id} of job {entry.get("job")} failed, attempt {attempts} out of '
+                           f'{cfg.CallbackSettings.MAX_ATTEMPTS}, retrying in {delay:.0f} s.: {error}')
+            pipeline.zadd(RETRY_KEY, {json.dumps({**entry, 'attempts': attempts, 'error': error}): time.time() + delay})
+        pipeline.xack(OUTBOX_STREAM, SENDER_GROUP, entry_id)
+        pipeline.xdel(OUTBOX_STREAM, entry_id)
+        pipeline.execute()
+
+        if entry.get('job'):
+            get_job_store().update(entry['job'], {
+                'callback_attempts': attempts,
+                'callback_status': status,
+                'callback_delivered_at': datetime.now(timezone.utc) if not error else None
+            })
+
+    def run(self):
+        logger.info(f'Callback sender {self.consumer} started')
+        while not self._stop.is_set():
+            try:
+                self.ensure_group()
+                self.release_due_retries()
+                for entry_id, fields in self.read_batch(block_ms=1000):
+                    if fields:
+                        self.deliver(entry_id, fields)
+                    else:
+                        # Deleted from the stream while it was pending
+                        self.client.xack(OUTBOX_STREAM, SENDER_GROUP, entry_id)
+            except Exception as e:
+                logger.error(f'Callback sender failed: {e}')
+                self._stop.wait(5)
+
+
+_sender: Optional[CallbackSender] = None
+
+
+def get_callback_sender() -> CallbackSender:
+    """Return the process-wide callback sender, starting its thread on first use."""
+    global _sender
+    if _sender is None:
+        _sender = CallbackSender(cfg.RedisSettings.rds(), f'{cfg.GeneralSettings.WORKER_UID}-{os.getpid()}')
+        _sender.start()
+    return _sender
+
+
+def stop_callback_sender(timeout: float = 0):
+    """Stop the process-wide callback sender if it was started, letting a delivery in progress finish."""
+    if _sender is not None:
+        _sender.stop(timeout)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    CallbackSender(cfg.RedisSettings.rds(), f'sender-{os.getpid()}').run()
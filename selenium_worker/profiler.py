@@ -0,0 +1,118 @@
+import json
+import logging
+import math
+import os
+import sys
+import time
+from collections import defaultdict
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Commands issued from modules under this package are attributed to the service method that issued them
+SERVICES_PACKAGE = 'selenium_worker.Services'
+
+
+def command_name(driver_command: str, params: Optional[dict]) -> str:
+    """Name used to group a WebDriver command; CDP commands are grouped by the CDP method."""
+    if driver_command == 'executeCdpCommand' and params:
+        return f'cdp:{params.get("cmd", "")}'
+    return driver_command
+
+
+def percentile(sorted_samples: list[float], fraction: float) -> float:
+    """Nearest-rank percentile of already sorted samples."""
+    if not sorted_samples:
+        return 0.0
+    rank = max(1, math.ceil(fraction * len(sorted_samples)))
+    return sorted_samples[rank - 1]
+
+
+def calling_helper() -> str:
+    """Name of the closest service method on the call stack, or an empty string."""
+    frame = sys._getframe(2)
+    while frame is not None:
+        if frame.f_globals.get('__name__', '').startswith(SERVICES_PACKAGE):
+            return frame.f_code.co_name
+        frame = frame.f_back
+    return ''
+
+
+class CommandProfiler:
+    """
+    Records the duration of every WebDriver command of a job.
+
+    All driver calls, including `execute_script` and `execute_cdp_cmd`, go through `WebDriver.execute`, which is
+    wrapped on the driver instance while the profiler is attached.
+    """
+
+    def __init__(self, trace: bool = False):
+        self.samples: dict[str, list[float]] = defaultdict(list)
+        self.helpers: dict[str, float] = defaultdict(float)
+        self.trace: Optional[list[tuple]] = [] if trace else None
+        self._driver = None
+        self._started = time.monotonic()
+
+    def attach(self, driver) -> 'CommandProfiler':
+        original_execute = driver.execute
+
+        def execute(driver_command, params=None):
+            started = time.monotonic()
+            try:
+                return original_execute(driver_command, params)
+            finally:
+                self.record(command_name(driver_command, params), started, time.monotonic())
+
+        execute.profiler = self
+        driver.execute = execute
+        self._driver = driver
+        return self
+
+    def detach(self):
+        if self._driver is None:
+            return
+        execute = self._driver.__dict__.get('execute')
+        if execute is not None and getattr(execute, 'profiler', None) is self:
+            del self._driver.execute
+        self._driver = None
+
+    def record(self, name: str, started: float, finished: float):
+        duration_ms = (finished - started) * 1000
+        self.samples[name].append(duration_ms)
+
+        helper = calling_helper()
+        if helper:
+            self.helpers[helper] += duration_ms
+        if self.trace is not None:
+            self.trace.append((round((started - self._started) * 1000, 1), name, helper, round(duration_ms, 1)))
+
+    def summary(self) -> dict:
+        """
+        Compact per-command statistics, slowest commands first.
+
+        Returns:
+            dict: `commands` maps command names to [count, total, p50, p99] in milliseconds, `helpers` maps service
+            methods to the total milliseconds spent in the commands they issued
+        """
+        commands = {}
+        for name, samples in sorted(self.samples.items(), key=lambda item: -sum(item[1])):
+            ordered = sorted(samples)
+            commands[name] = [len(ordered), round(sum(ordered), 1), round(percentile(ordered, 0.5), 1),
+                              round(percentile(ordered, 0.99), 1)]
+
+        return {
+            'commands': commands,
+            'helpers': {name: round(total, 1) for name, total in
+                        sorted(self.helpers.items(), key=lambda item: -item[1])}
+        }
+
+    def dump(self, path: str):
+        """Write the full trace as JSON lines of [offset, command, helper, duration] in milliseconds."""
+        if self.trace is None:
+            return
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as trace_file:
+            for entry in self.trace:
+                trace_file.write(json.dumps(entry) + '\n')
+        logger.info(f'WebDriver command trace written to {path}')
@@ -0,0 +1,207 @@
+import contextlib
+import errno
+import logging
+import os
+import shutil
+import stat
+import sys
+import tempfile
+from zipfile import is_zipfile
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Files Chrome keeps for a running instance only; they must never be shared between profiles
+PROFILE_IGNORED_FILES = ('SingletonCookie', 'SingletonLock', 'SingletonSocket', 'RunningChromeVersion',
+                         '.worker.owner')
+
+# Linux ioctl that shares the extents of one file with another (btrfs, XFS, overlayfs on top of those)
+FICLONE = 0x40049409
+
+
+def template_version(archive_path: str) -> str:
+    """
+    Version of a global cache archive, derived from its size and modification time.
+    A replaced archive gets a new version and therefore a freshly extracted template.
+    """
+    archive_stat = os.stat(archive_path)
+    return '{:x}-{:x}'.format(archive_stat.st_size, archive_stat.st_mtime_ns)
+
+
+@contextlib.contextmanager
+def _template_lock(templates_path: str, name: str, shared: bool = False, blocking: bool = True):
+    """Hold the lock of `name`; yields False if the lock is held elsewhere and `blocking` is not set."""
+    if fcntl is None:
+        yield True
+        return
+
+    with open(os.path.join(templates_path, f'.{name}.lock'), 'w') as lock_file:
+        try:
+            fcntl.flock(lock_file, (fcntl.LOCK_SH if shared else fcntl.LOCK_EX) | (0 if blocking else fcntl.LOCK_NB))
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _make_read_only(path: str):
+    for root, dirs, files in os.walk(path):
+        for file in files:
+            file_path = os.path.join(root, file)
+            if not os.path.islink(file_path):
+                os.chmod(file_path, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+        os.chmod(root, stat.S_IRUSR | stat.S_IXUSR | stat.S_IRGRP | stat.S_IXGRP | stat.S_IROTH | stat.S_IXOTH)
+
+
+def _remove_read_only(path: str):
+    def make_writable_and_retry(function, failed_path, _):
+        os.chmod(os.path.dirname(failed_path), stat.S_IRWXU)
+        if os.path.exists(failed_path) and not os.path.islink(failed_path):
+            os.chmod(failed_path, stat.S_IRWXU)
+        function(failed_path)
+
+    if sys.version_info >= (3, 12):
+        shutil.rmtree(path, onexc=make_writable_and_retry)
+    else:
+        shutil.rmtree(path, onerror=make_writable_and_retry)
+
+
+def _remove_stale_templates(templates_path: str, name: str, current: str):
+    for entry in os.listdir(templates_path):
+        entry_path = os.path.join(templates_path, entry)
+        if entry.startswith(f'{name}-') and entry_path != current and os.path.isdir(entry_path):
+            # Clones hold the lock of their template shared; one in progress keeps the template until the next version
+            with _template_lock(templates_path, entry, blocking=False) as locked:
+                if not locked:
+                    logger.info(f'Stale profile template {entry_path} is being cloned, keeping it for now')
+                    continue
+                try:
+                    _remove_read_only(entry_path)
+                    with contextlib.suppress(FileNotFoundError):
+                        os.remove(os.path.join(templates_path, f'.{entry}.lock'))
+                    logger.info(f'Removed stale profile template {entry_path}')
+                except OSError as e:
+                    logger.warning(f'Failed to remove stale profile template {entry_path}: {e}')
+
+
+def ensure_profile_template(archive_path: str, templates_path: str, name: str) -> str:
+    """
+    Extract a global cache archive into a read-only template directory, once per archive version.
+
+    Args:
+        archive_path: Path to the ZIP archive with the Chrome profile
+        templates_path: Directory where extracted templates are kept
+        name: Template name, usually the task name
+
+    Returns:
+        str: Path to the template directory, or an empty string if the archive is not a ZIP file
+    """
+    template_dir = os.path.join(templates_path, f'{name}-{template_version(archive_path)}')
+    if os.path.isdir(template_dir):
+        return template_dir
+
+    os.makedirs(templates_path, exist_ok=True)
+    with _template_lock(templates_path, name):
+        # Another worker sharing the templates path may have extracted it while we were waiting for the lock
+        if os.path.isdir(template_dir):
+            return template_dir
+
+        if not is_zipfile(archive_path):
+            return ''
+
+        logger.info(f'Extracting profile template {archive_path} into {template_dir}')
+        staging_dir = tempfile.mkdtemp(prefix=f'.{name}-', dir=templates_path)
+        try:
+            shutil.unpack_archive(archive_path, staging_dir, format='zip')
+            for ignored_file in PROFILE_IGNORED_FILES:
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(os.path.join(staging_dir, ignored_file))
+            _make_read_only(staging_dir)
+            os.rename(staging_dir, template_dir)
+        except BaseException:
+            _remove_read_only(staging_dir)
+            raise
+
+        _remove_stale_templates(templates_path, name, template_dir)
+
+    return template_dir
+
+
+def _reflink(source: str, destination: str):
+    source_fd = os.open(source, os.O_RDONLY)
+    try:
+        destination_fd = os.open(destination, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            fcntl.ioctl(destination_fd, FICLONE, source_fd)
+        finally:
+            os.close(destination_fd)
+    except OSError:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(destination)
+        raise
+    finally:
+        os.close(source_fd)
+
+
+def clone_profile(template_dir: str, destination: str) -> str:
+    """
+    Create a writable user data directory from a template.
+
+    Files are reflinked when the filesystem supports it, so the clone shares blocks with the template until
+    Chrome writes to them; otherwise they are copied.
+
+    Args:
+        template_dir: Read-only template created by `ensure_profile_template`
+        destination: User data directory to create
+
+    Returns:
+        str: Cloning method that was used, either `reflink` or `copy`
+
+    Raises:
+        FileNotFoundError: If the template was removed as stale before the clone started
+    """
+    templates_path, template_name = os.path.split(template_dir)
+    # Keeps the template from being removed as stale while it is cloned
+    with _template_lock(templates_path, template_name, shared=True):
+        if not os.path.isdir(template_dir):
+            raise FileNotFoundError(errno.ENOENT, 'Profile template was removed', template_dir)
+        return _clone_files(template_dir, destination)
+
+
+def _clone_files(template_dir: str, destination: str) -> str:
+    use_reflink = fcntl is not None and hasattr(fcntl, 'ioctl') and os.uname().sysname == 'Linux'
+
+    for root, dirs, files in os.walk(template_dir):
+        target_root = os.path.join(destination, os.path.relpath(root, template_dir))
+        os.makedirs(target_root, exist_ok=True)
+
+        for file in files:
+            if file in PROFILE_IGNORED_FILES:
+                continue
+
+            source = os.path.join(root, file)
+            target = os.path.join(target_root, file)
+            if os.path.islink(source):
+                os.symlink(os.readlink(source), target)
+                continue
+
+            if use_reflink:
+                try:
+                    _reflink(source, target)
+                    continue
+                except OSError as e:
+                    if e.errno not in (errno.EOPNOTSUPP, errno.EXDEV, errno.EINVAL, errno.ENOTTY):
+                        raise
+                    logger.info(f'Reflinks are not supported for {destination}, falling back to copying: {e}')
+                    use_reflink = False
+
+            shutil.copyfile(source, target)
+
+    return 'reflink' if use_reflink else 'copy'
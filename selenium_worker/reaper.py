@@ -0,0 +1,190 @@
+import logging
+import os
+import queue
+import shutil
+import threading
+import time
+import uuid
+from typing import Optional
+
+import psutil
+
+from selenium_worker import config as cfg
+
+logger = logging.getLogger(__name__)
+
+# File inside every user data directory naming the process that uses it
+OWNER_FILE = '.worker.owner'
+
+# Prefix of directories that were detached from their original name and wait to be deleted
+TRASH_PREFIX = '.trash-'
+
+# Unclaimed directories younger than this may still be in the middle of being created and claimed
+CLAIM_WINDOW = 60
+
+
+def claim_directory(path: str, pid: Optional[int] = None):
+    """Mark a user data directory as owned by the given process, the current one by default."""
+    os.makedirs(path, exist_ok=True)
+    process = psutil.Process(pid)
+    with open(os.path.join(path, OWNER_FILE), 'w') as owner_file:
+        owner_file.write(f'{process.pid} {process.create_time()}')
+
+
+def is_owned(path: str) -> bool:
+    """Check whether a user data directory belongs to a process that is still running."""
+    try:
+        with open(os.path.join(path, OWNER_FILE), 'r') as owner_file:
+            pid, create_time = owner_file.read().split()
+        return psutil.Process(int(pid)).create_time() == float(create_time)
+    except (OSError, ValueError, psutil.Error):
+        return False
+
+
+def directory_size(path: str) -> int:
+    total = 0
+    for root, dirs, files in os.walk(path):
+        for file in files:
+            try:
+                total += os.lstat(os.path.join(root, file)).st_size
+            except OSError:
+                continue
+    return total
+
+
+class UserDataReaper:
+    """
+    Deletes browser user data directories on a background thread.
+
+    Directories handed to `schedule` are renamed right away, which is cheap and frees the original name, and then
+    removed by the reaper thread. The thread also periodically sweeps the data path for directories whose owner
+    process is gone (e.g. after the worker was killed) and brings DATA/DISK/BROWSER paths back within the disk quota
+    by deleting orphaned user data directories early. The disk and browser paths are shared by every running browser,
+    so they count towards the quota but are never deleted from.
+    """
+
+    def __init__(self, data_path: str, cache_paths: list[str], quota_bytes: int = 0, sweep_interval: float = 300,
+                 orphan_grace: float = 300):
+        self.data_path = data_path
+        self.cache_paths = cache_paths
+        self.quota_bytes = quota_bytes
+        self.sweep_interval = sweep_interval
+        self.orphan_grace = orphan_grace
+        self._queue: queue.Queue[str] = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='user-data-reaper', daemon=True)
+            self._thread.start()
+
+    def schedule(self, path: str):
+        """Queue a directory for deletion without blocking the caller."""
+        if not path or not os.path.exists(path):
+            return
+
+        trash_path = os.path.join(os.path.dirname(path), f'{TRASH_PREFIX}{uuid.uuid4()}')
+        try:
+            os.rename(path, trash_path)
+        except OSError as e:
+            logger.warning(f'Failed to detach directory {path} before deletion: {e}')
+            trash_path = path
+
+        self.start()
+        self._queue.put(trash_path)
+
+    def flush(self, timeout: float) -> bool:
+        """Wait up to `timeout` seconds for all scheduled deletions to finish."""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks > 0:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def sweep(self):
+        """Delete detached and orphaned user data directories, then enforce the disk quota."""
+        if not os.path.isdir(self.data_path):
+            return
+
+        orphans = []
+        for entry in os.scandir(self.data_path):
+            if not entry.is_dir(follow_symlinks=False):
+                continue
+            if entry.name.startswith(TRASH_PREFIX):
+                self._delete(entry.path)
+            elif not is_owned(entry.path):
+                orphans.append(entry)
+
+        now = time.time()
+        for entry in sorted(orphans, key=lambda e: e.stat(follow_symlinks=False).st_mtime):
+            if now - entry.stat(follow_symlinks=False).st_mtime >= self.orphan_grace:
+                logger.info(f'Removing orphaned user data directory {entry.path}')
+                self._delete(entry.path)
+
+        if self.quota_bytes > 0:
+            self.enforce_quota()
+
+    def enforce_quota(self):
+        usage = sum(directory_size(path) for path in [self.data_path, *self.cache_paths] if os.path.isdir(path))
+        if usage <= self.quota_bytes:
+            return
+
+        logger.warning(f'Cache usage of {usage} bytes exceeds quota of {self.quota_bytes} bytes')
+
+        # Orphans that are still within the grace period, oldest first; live profiles are never touched
+        now = time.time()
+        orphans = [entry for entry in os.scandir(self.data_path) if entry.is_dir(follow_symlinks=False) and
+                   not is_owned(entry.path) and now - entry.stat(follow_symlinks=False).st_mtime >= CLAIM_WINDOW]
+        for entry in sorted(orphans, key=lambda e: e.stat(follow_symlinks=False).st_mtime):
+            if usage <= self.quota_bytes:
+                return
+            size = directory_size(entry.path)
+            self._delete(entry.path)
+            usage -= size
+
+        if usage > self.quota_bytes:
+            logger.warning(f'Cache usage of {usage} bytes is still above quota of {self.quota_bytes} bytes')
+
+    def _delete(self, path: str):
+        shutil.rmtree(path, ignore_errors=True)
+
+    def _run(self):
+        next_sweep = time.monotonic()
+        while True:
+            try:
+                path = self._queue.get(timeout=max(0.0, next_sweep - time.monotonic()))
+            except queue.Empty:
+                try:
+                    self.sweep()
+                except Exception as e:
+                    logger.error(f'Failed to sweep user data directories: {e}')
+                next_sweep = time.monotonic() + self.sweep_interval
+                continue
+
+            try:
+                self._delete(path)
+                logger.info(f'User data directory deleted: {path}')
+            finally:
+                self._queue.task_done()
+
+
+_reaper: Optional[UserDataReaper] = None
+
+
+def get_reaper() -> UserDataReaper:
+    """Return the process-wide reaper, starting its thread on first use."""
+    global _reaper
+    if _reaper is None:
+        _reaper = UserDataReaper(
+            cfg.CacheSettings.DATA_PATH,
+            [cfg.CacheSettings.DISK_PATH, cfg.CacheSettings.BROWSER_PATH],
+            quota_bytes=cfg.CacheSettings.QUOTA_MB * 1024 * 1024,
+            sweep_interval=cfg.CacheSettings.REAPER_INTERVAL,
+            orphan_grace=cfg.CacheSettings.ORPHAN_GRACE
+        )
+        _reaper.start()
+    return _reaper
@@ -0,0 +1,105 @@
+import logging
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from requests.exceptions import ProxyError
+from selenium.common import TimeoutException, WebDriverException
+
+from selenium_worker import config as cfg
+from selenium_worker.enums import RecoveryAction
+from selenium_worker.exceptions import BrowserHungException
+
+logger = logging.getLogger(__name__)
+
+RETRY = RecoveryAction.RETRY
+SOFT_RESET = RecoveryAction.SOFT_RESET
+RELAUNCH = RecoveryAction.RELAUNCH
+RESTART = RecoveryAction.RESTART
+
+# Escalation ladders, checked in order; the first matching exception class wins. A failed browser session cannot be
+# retried in place, and a proxy that stopped working needs a relaunch, which picks up a new proxy configuration.
+# A browser the watchdog had to abort is usually killed already.
+# The services handle the Selenium exceptions of their own steps and report them in the response, so the
+# TimeoutException and WebDriverException ladders only cover failures of the app-level browser calls around a task
+# (e.g. the CDP commands of `process_request`) and of the browser setup; `BrowserHungException` and
+# `DeadlineExceededException` are the only exceptions the services let through.
+DEFAULT_LADDERS: list[tuple[type, list[RecoveryAction]]] = [
+    (BrowserHungException, [RELAUNCH, RESTART]),
+    (TimeoutException, [RETRY, SOFT_RESET, RELAUNCH, RESTART]),
+    (ProxyError, [RETRY, RELAUNCH, RESTART]),
+    (WebDriverException, [SOFT_RESET, RELAUNCH, RESTART]),
+    (Exception, [RETRY, SOFT_RESET, RELAUNCH, RESTART]),
+    (BaseException, [RESTART])
+]
+
+
+@dataclass
+class Escalation:
+    """A recovery action that was taken for a failure and the time it cost."""
+    error: str
+    action: RecoveryAction
+    level: int
+    elapsed_ms: int = 0
+    succeeded: bool = False
+
+    def to_list(self) -> list:
+        return [self.error, self.action.value, self.level, self.elapsed_ms, self.succeeded]
+
+    @staticmethod
+    def from_list(item: list) -> 'Escalation':
+        error, action, level, elapsed_ms, succeeded = item
+        return Escalation(error, RecoveryAction(action), level, elapsed_ms, succeeded)
+
+
+class RecoveryPolicy:
+    """
+    Maps failures to escalating recovery actions.
+
+    Consecutive failures of the same exception class climb its ladder one step at a time; a successful task or a
+    quiet period of `window` seconds since the last failure brings every ladder back to its first step.
+    """
+
+    def __init__(self, ladders: Optional[list[tuple[type, list[RecoveryAction]]]] = None, window: float = 600):
+        self.ladders = ladders if ladders is not None else DEFAULT_LADDERS
+        self.window = window
+        self.levels: dict[type, int] = {}
+        self.last_failure = 0.0
+        self.history: list[Escalation] = []
+
+    def ladder(self, error: BaseException) -> tuple[type, list[RecoveryAction]]:
+        for exception_type, actions in self.ladders:
+            if isinstance(error, exception_type):
+                return exception_type, actions
+        return BaseException, [RESTART]
+
+    def escalate(self, error: BaseException) -> Escalation:
+        """Return the next recovery action for a failure and move its ladder one step up."""
+        now = time.monotonic()
+        if self.last_failure and now - self.last_failure > self.window:
+            self.levels.clear()
+        self.last_failure = now
+
+        exception_type, actions = self.ladder(error)
+        level = self.levels.get(exception_type, 0)
+        self.levels[exception_type] = level + 1
+
+        escalation = Escalation(type(error).__name__, actions[min(level, len(actions) - 1)], level)
+        self.history.append(escalation)
+        del self.history[:-100]
+        return escalation
+
+    def reset(self):
+        self.levels.clear()
+        self.last_failure = 0.0
+
+
+_policy: Optional[RecoveryPolicy] = None
+
+
+def get_recovery_policy() -> RecoveryPolicy:
+    """Return the process-wide recovery policy."""
+    global _policy
+    if _policy is None:
+        _policy = RecoveryPolicy(window=cfg.RecoverySettings.WINDOW)
+    return _policy
@@ -0,0 +1,70 @@
+import logging
+from collections import Counter
+from typing import Any
+
+from celery import Task
+
+from selenium_worker import config as cfg
+from selenium_worker.deadletter import DEAD_LETTER_STREAM, dead_letter
+from selenium_worker.enums import WorkerType
+from selenium_worker.vars import task_queues
+
+logger = logging.getLogger(__name__)
+
+# Number of rerouted jobs by destination queue, shared by all workers
+REROUTED_KEY = 'jobs.rerouted'
+
+# A job that was re-published this many times without reaching a worker of its type is dead-lettered
+MAX_HOPS = 3
+
+# Number of jobs rerouted by this process, by destination queue
+rerouted_jobs: Counter = Counter()
+
+
+def route_job(task: Task, payload: Any, job_uid: str, job_type: str, hops: int = 0) -> str:
+    """
+    Re-publish a job of another worker type to the queue of its type, under the same task ID.
+
+    Jobs of a worker type without a queue, and jobs that keep bouncing between misconfigured workers, go to the
+    dead-letter stream instead.
+
+    Args:
+        task: The running task that received the job
+        payload: Request payload of the job, as it was received
+        job_uid: UID of the job
+        job_type: Worker type of the job
+        hops: Number of times the job was already rerouted
+
+    Returns:
+        str: Queue the job was published to, or the dead-letter stream
+    """
+    try:
+        queue = task_queues.get(WorkerType(job_type))
+    except ValueError:
+        queue = None
+
+    client = cfg.RedisSettings.rds()
+    if queue is None:
+        dead_letter(client, job_uid, payload, f'No queue for worker type `{job_type}`')
+        destination = DEAD_LETTER_STREAM
+    elif hops >= MAX_HOPS:
+        dead_letter(client, job_uid, payload, f'Rerouted {hops} times without reaching a worker of type `{job_type}`')
+        destination = DEAD_LETTER_STREAM
+    else:
+        task.app.send_task(task.name, args=[payload, job_uid], kwargs={'hops': hops + 1}, queue=queue,
+                           task_id=task.request.id)
+        destination = queue
+        logger.warning(f'Job {job_uid} of worker type {job_type} was received by a worker of type '
+                       f'{cfg.GeneralSettings.WORKER_TYPE}, rerouted to {queue}')
+
+    rerouted_jobs[destination] += 1
+    try:
+        client.hincrby(REROUTED_KEY, destination)
+    except Exception as e:
+        logger.error(f'Failed to count rerouted job {job_uid}: {e}')
+    return destination
+
+
+def reroute_counts() -> dict[str, int]:
+    """Return the number of rerouted jobs by destination queue across all workers."""
+    return {queue.decode('utf-8'): int(count) for queue, count in cfg.RedisSettings.rds().hgetall(REROUTED_KEY).items()}
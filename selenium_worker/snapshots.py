@@ -0,0 +1,64 @@
+import gzip
+import logging
+import os
+from dataclasses import dataclass
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PageSnapshot:
+    """Page source captured on a failure: an inline body, capped in size, and a reference to the full artifact."""
+    body: str
+    ref: str = ''
+    size: int = 0
+
+
+def prune_snapshots(directory: str, max_files: int):
+    """Remove the oldest snapshot artifacts so that at most `max_files` are kept."""
+    if max_files <= 0:
+        return
+
+    entries = [entry for entry in os.scandir(directory) if entry.is_file() and entry.name.endswith('.html.gz')]
+    if len(entries) <= max_files:
+        return
+
+    entries.sort(key=lambda entry: entry.stat().st_mtime)
+    for entry in entries[:len(entries) - max_files]:
+        try:
+            os.remove(entry.path)
+        except OSError:
+            continue
+
+
+def store_snapshot(source: str, directory: str, name: str, inline_limit: int, excerpt_size: int,
+                   max_files: int = 0) -> PageSnapshot:
+    """
+    Keep small page sources inline, and write large ones gzip-compressed to the artifact directory.
+
+    Args:
+        source: Page source to store
+        directory: Artifact directory for large page sources
+        name: Artifact file name without extension
+        inline_limit: Largest page source in bytes that is returned inline
+        excerpt_size: Number of characters of a large page source that are returned inline
+        max_files: Number of artifacts to keep in the directory, 0 keeps all of them
+
+    Returns:
+        PageSnapshot: Inline body and, for large page sources, the path to the artifact
+    """
+    encoded = source.encode('utf-8', errors='replace')
+    if len(encoded) <= inline_limit:
+        return PageSnapshot(source, '', len(encoded))
+
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f'{name}.html.gz')
+    try:
+        with gzip.open(path, 'wb', compresslevel=6) as artifact:
+            artifact.write(encoded)
+        prune_snapshots(directory, max_files)
+    except OSError as e:
+        logger.warning(f'Failed to write page snapshot {path}: {e}')
+        path = ''
+
+    return PageSnapshot(source[:excerpt_size], path, len(encoded))
@@ -0,0 +1,76 @@
+import time
+from typing import Optional
+
+# Points of a job timeline, in the order they are reached
+ENQUEUED = 'enqueued'
+DEQUEUED = 'dequeued'
+BROWSER_READY = 'browser_ready'
+# The task page reached STAGE_OBTAINED_PAGE; usually during the tear-down of the previous job, so before dequeued
+PAGE_READY = 'page_ready'
+FIELDS_FILLED = 'fields_filled'
+SUBMITTED = 'submitted'
+# The verification callback was delivered, or written to the outbox with `CallbackSettings.OUTBOX`
+CALLBACK = 'callback'
+FINISHED = 'finished'
+TEARDOWN_COMPLETE = 'teardown_complete'
+
+POINTS = (ENQUEUED, DEQUEUED, BROWSER_READY, PAGE_READY, FIELDS_FILLED, SUBMITTED, CALLBACK, FINISHED,
+          TEARDOWN_COMPLETE)
+
+# Message header with the Unix time a job was published at
+ENQUEUED_HEADER = 'enqueued_at'
+
+
+class JobTimeline:
+    """
+    Points a job reaches, as milliseconds relative to the moment it was dequeued.
+
+    Points are taken from the monotonic clock, so they are not affected by changes of the system time; only the
+    enqueue time comes from the wall clock of the publisher. A point that is reached again, e.g. the browser being
+    ready after a relaunch, keeps the latest time.
+    """
+
+    def __init__(self, enqueued_at: Optional[float] = None):
+        self.origin = time.time()
+        self._origin_monotonic = time.monotonic()
+        self.points: dict[str, int] = {DEQUEUED: 0}
+        if enqueued_at:
+            self.points[ENQUEUED] = round((float(enqueued_at) - self.origin) * 1000)
+
+    def mark(self, point: str, at: Optional[float] = None):
+        """
+        Record a point of the timeline.
+
+        Args:
+            point: One of `POINTS`
+            at: Monotonic time the point was reached at, now by default
+        """
+        self.points[point] = round(((at if at is not None else time.monotonic()) - self._origin_monotonic) * 1000)
+
+    def _span(self, start_points: tuple[str, ...], end_point: str) -> Optional[int]:
+        starts = [self.points[point] for point in start_points if point in self.points]
+        if not starts or end_point not in self.points:
+            return None
+        return max(0, self.points[end_point] - max(starts))
+
+    def summary(self) -> dict[str, int]:
+        """Milliseconds spent in every phase of the job that has both of its points recorded."""
+        phases = {
+            'queue_wait_ms': self._span((ENQUEUED,), DEQUEUED),
+            'browser_ready_ms': self._span((DEQUEUED,), BROWSER_READY),
+            'form_ms': self._span((BROWSER_READY, PAGE_READY), FIELDS_FILLED),
+            'submit_ms': self._span((FIELDS_FILLED,), SUBMITTED),
+            'callback_ms': self._span((FIELDS_FILLED, SUBMITTED), CALLBACK),
+            'teardown_ms': self._span((FINISHED,), TEARDOWN_COMPLETE),
+            'total_ms': self._span((ENQUEUED,) if ENQUEUED in self.points else (DEQUEUED,), FINISHED)
+        }
+        return {phase: value for phase, value in phases.items() if value is not None}
+
+    def to_meta(self) -> dict:
+        """Compact form for the job metadata: the Unix time of dequeue and the offsets of `POINTS`, null if unset."""
+        return {'origin': round(self.origin, 3), 'offsets': [self.points.get(point) for point in POINTS]}
+
+
+def points_from_meta(value: dict) -> dict[str, int]:
+    """Offsets by point name of a timeline stored in the job metadata."""
+    return {point: offset for point, offset in zip(POINTS, value.get('offsets', [])) if offset is not None}
@@ -21,6 +21,7 @@ from seleniumbase import Driver
 
 from selenium_worker import config as cfg
 from selenium_worker.enums import BrowserDriverType
+from selenium_worker.waiters import wait_for_ready_state
 
 logger = logging.getLogger(__name__)
 
@@ -130,7 +131,7 @@ def archive_user_data(state_iin: int, browser_driver_type: BrowserDriverType, us
             print(f'Begin copying data from user data directory {user_data_dir} to temporary directory {tmp_state_dir}')
             shutil.copytree(user_data_dir, tmp_state_dir, dirs_exist_ok=True, ignore_dangling_symlinks=True,
                             ignore=shutil.ignore_patterns('SingletonCookie', 'SingletonLock', 'SingletonSocket',
-                                                          'RunningChromeVersion'))
+                                                          'RunningChromeVersion', '.worker.owner'))
             print('Copied user data into temporary directory')
         except Exception as e:
             print('Failed to copy user data into temporary directory: {}'.format(e))
@@ -150,7 +151,7 @@ def archive_user_data(state_iin: int, browser_driver_type: BrowserDriverType, us
 
 
 def time_diff_ms(date1: datetime, date2: datetime) -> int:
-    return round((date1 - date2).total_seconds() * 1000 + (date1 - date2).microseconds / 1000)
+    return round((date1 - date2).total_seconds() * 1000)
 
 def get_proxied_ip_address(driver: Driver) -> str:
     driver.get(cfg.ProxySettings.PROXIED_IP_SERVICE_URL)
@@ -256,8 +257,7 @@ def google_search(driver, request_to_find: List[str], timeout_in_ms: int = 5000)
 
             if timeout_in_ms > 0:
                 driver.set_page_load_timeout(timeout_in_ms / 1000)
-            while driver.execute_script("return document.readyState") != "complete":
-                pass
+            wait_for_ready_state(driver, 'complete', timeout_in_ms)
 
             time.sleep(0.1)
 
@@ -0,0 +1,331 @@
+import logging
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+from selenium.common import JavascriptException, TimeoutException
+
+logger = logging.getLogger(__name__)
+
+READY_STATES = ['loading', 'interactive', 'complete']
+
+# Resolves as soon as the document reaches the requested readyState. The browser notifies the script through
+# `readystatechange`/`load` events, so the wait costs a single WebDriver round trip instead of one per poll.
+# After `timeout_ms` the listeners are removed and the script resolves with null, so nothing is left behind in
+# the page when the wait fails.
+READY_STATE_SCRIPT = """
+var target = arguments[0];
+var timeoutMs = arguments[1];
+var done = arguments[arguments.length - 1];
+var order = ['loading', 'interactive', 'complete'];
+var expiry = null;
+function reached() {
+    return order.indexOf(document.readyState) >= order.indexOf(target);
+}
+function stop() {
+    document.removeEventListener('readystatechange', check);
+    window.removeEventListener('load', check);
+    clearTimeout(expiry);
+}
+function check() {
+    if (reached()) {
+        stop();
+        done(document.readyState);
+    }
+}
+if (reached()) {
+    done(document.readyState);
+} else {
+    document.addEventListener('readystatechange', check);
+    window.addEventListener('load', check);
+    expiry = setTimeout(function () {
+        stop();
+        done(null);
+    }, timeoutMs);
+}
+"""
+
+# Pause before re-arming the waiter when the document it was attached to got replaced by a navigation
+NAVIGATION_RETRY_DELAY = 0.05
+
+# Lower-case fragments of the script errors Chrome and Firefox raise when the document a script runs in goes away
+NAVIGATION_ERRORS = ('document unloaded', 'document was unloaded', 'execution context was destroyed',
+                     'cannot find context with specified id', 'inspected target navigated or closed')
+
+# Seconds the WebDriver script timeout exceeds the in-page timeout of a wait, so that the page resolves the wait
+# and cleans up after itself before WebDriver gives up on the script
+SCRIPT_TIMEOUT_MARGIN = 1
+
+
+def is_navigation_error(error: JavascriptException) -> bool:
+    """Whether a script failed because its document was replaced, so that it can be run again on the new one."""
+    message = (error.msg or str(error)).lower()
+    return any(fragment in message for fragment in NAVIGATION_ERRORS)
+
+
+@contextmanager
+def script_timeout(driver):
+    """Restore the async script timeout of the session after a wait changed it."""
+    previous = driver.timeouts.script
+    try:
+        yield
+    finally:
+        try:
+            driver.set_script_timeout(previous)
+        except Exception as e:
+            # Must not replace the failure of the wait, e.g. a browser that stopped responding
+            logger.debug(f'Failed to restore the script timeout: {e}')
+
+
+@dataclass
+class WaitResult:
+    """Outcome of a wait: whether the condition was met and how long the wait actually took."""
+    ready: bool
+    elapsed_ms: int
+    state: str = ''
+
+
+def wait_for_ready_state(driver, target: str = 'complete', timeout_in_ms: int = 5000) -> WaitResult:
+    """
+    Wait until the current document reaches the `target` readyState or the deadline passes.
+
+    Args:
+        driver: WebDriver instance
+        target: One of `loading`, `interactive` or `complete`
+        timeout_in_ms: Deadline for the wait in milliseconds
+
+    Returns:
+        WaitResult: Whether the state was reached, the time spent waiting and the last observed state
+    """
+    started = time.monotonic()
+    deadline = started + timeout_in_ms / 1000
+    state = ''
+
+    with script_timeout(driver):
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+
+            try:
+                driver.set_script_timeout(remaining + SCRIPT_TIMEOUT_MARGIN)
+                state = driver.execute_async_script(READY_STATE_SCRIPT, target, round(remaining * 1000))
+                if state is None:
+                    break
+                return WaitResult(True, round((time.monotonic() - started) * 1000), state)
+            except TimeoutException:
+                break
+            except JavascriptException as e:
+                # The document was unloaded while waiting, wait on the new one; other script errors are real failures
+                if not is_navigation_error(e):
+                    raise
+                logger.debug(f'Document changed while waiting for readyState {target}: {e}')
+                time.sleep(NAVIGATION_RETRY_DELAY)
+
+    return WaitResult(False, round((time.monotonic() - started) * 1000), state)
+
+
+# Locator and visibility helpers shared by the element scripts. Locators are (By, value) pairs.
+ELEMENT_HELPERS_SCRIPT = """
+function byLinkText(value, partial) {
+    var links = document.getElementsByTagName('a');
+    for (var i = 0; i < links.length; i++) {
+        var text = (links[i].innerText || links[i].textContent || '').trim();
+        if (partial ? text.indexOf(value) !== -1 : text === value) {
+            return links[i];
+        }
+    }
+    return null;
+}
+
+function find(locator) {
+    var value = locator[1];
+    switch (locator[0]) {
+        case 'id': return document.getElementById(value);
+        case 'name': return document.getElementsByName(value)[0] || null;
+        case 'css selector': return document.querySelector(value);
+        case 'class name': return document.getElementsByClassName(value)[0] || null;
+        case 'tag name': return document.getElementsByTagName(value)[0] || null;
+        case 'xpath': return document.evaluate(value, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE,
+                                               null).singleNodeValue;
+        case 'link text': return byLinkText(value, false);
+        case 'partial link text': return byLinkText(value, true);
+    }
+    return null;
+}
+
+function visible(element) {
+    var style = window.getComputedStyle(element);
+    if (style.display === 'none' || style.visibility === 'hidden' || parseFloat(style.opacity) === 0) {
+        return false;
+    }
+    var rect = element.getBoundingClientRect();
+    return rect.width > 0 && rect.height > 0;
+}
+
+function satisfies(element, condition) {
+    if (element === null) {
+        return false;
+    }
+    if (condition === 'visible') {
+        return visible(element);
+    }
+    if (condition === 'clickable') {
+        return visible(element) && !element.disabled;
+    }
+    return true;
+}
+"""
+
+# Resolves once the elements behind the given locators satisfy the condition. A MutationObserver re-checks the
+# locators whenever the DOM changes, and a slow in-page timer catches changes that do not mutate the DOM (e.g.
+# CSS transitions), so no WebDriver round trips are spent on polling. After `timeout_ms` the observer and the
+# timer are stopped and the script resolves with null, so a failed wait leaves nothing running in the page.
+ELEMENTS_WAIT_SCRIPT = ELEMENT_HELPERS_SCRIPT + """
+var locators = arguments[0];
+var condition = arguments[1];
+var match = arguments[2];
+var timeoutMs = arguments[3];
+var done = arguments[arguments.length - 1];
+
+function satisfied(element) {
+    return satisfies(element, condition);
+}
+
+var observer = null;
+var timer = null;
+var expiry = null;
+
+function stop() {
+    if (observer !== null) {
+        observer.disconnect();
+        clearInterval(timer);
+        clearTimeout(expiry);
+        observer = null;
+    }
+}
+
+function check() {
+    var elements = locators.map(find);
+    var result = null;
+    if (match === 'all') {
+        if (elements.every(satisfied)) {
+            result = [-1, elements];
+        }
+    } else {
+        for (var i = 0; i < elements.length; i++) {
+            if (satisfied(elements[i])) {
+                result = [i, [elements[i]]];
+                break;
+            }
+        }
+    }
+    if (result !== null) {
+        stop();
+        done(result);
+    }
+    return result !== null;
+}
+
+if (!check()) {
+    observer = new MutationObserver(check);
+    observer.observe(document.documentElement, {childList: true, subtree: true, attributes: true});
+    timer = setInterval(check, 100);
+    expiry = setTimeout(function () {
+        stop();
+        done(null);
+    }, timeoutMs);
+}
+"""
+
+# Resolves every locator at once and reports, per locator, the element or why it cannot be used
+ELEMENTS_RESOLVE_SCRIPT = ELEMENT_HELPERS_SCRIPT + """
+var locators = arguments[0];
+var condition = arguments[1];
+return locators.map(function (locator) {
+    var element = find(locator);
+    if (element === null) {
+        return [null, 'not found'];
+    }
+    if (!satisfies(element, condition)) {
+        return [null, 'not ' + condition];
+    }
+    return [element, ''];
+});
+"""
+
+ELEMENT_CONDITIONS = ['present', 'visible', 'clickable']
+
+
+@dataclass
+class ElementWaitResult(WaitResult):
+    """Outcome of an element wait, with the index of the matched locator and the matched elements."""
+    index: int = -1
+    elements: list = None
+
+
+def wait_for_elements(driver, locators: list[tuple[str, str]], condition: str = 'visible',
+                      timeout_in_ms: int = 5000, match: str = 'any') -> ElementWaitResult:
+    """
+    Wait until elements are present, visible or clickable, resolving as soon as the DOM satisfies the condition.
+
+    Args:
+        driver: WebDriver instance
+        locators: List of (By, value) locator pairs
+        condition: One of `present`, `visible` or `clickable`
+        timeout_in_ms: Deadline for the wait in milliseconds
+        match: `any` to resolve on the first locator that satisfies the condition, `all` to wait for every one
+
+    Returns:
+        ElementWaitResult: Outcome of the wait; `index` is the matched locator for `any`, -1 for `all`
+    """
+    if condition not in ELEMENT_CONDITIONS:
+        raise ValueError(f'Unknown element condition {condition}')
+
+    started = time.monotonic()
+    deadline = started + timeout_in_ms / 1000
+
+    with script_timeout(driver):
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+
+            try:
+                driver.set_script_timeout(remaining + SCRIPT_TIMEOUT_MARGIN)
+                result = driver.execute_async_script(ELEMENTS_WAIT_SCRIPT, [list(locator) for locator in locators],
+                                                     condition, match, round(remaining * 1000))
+                if result is None:
+                    break
+                index, elements = result
+                return ElementWaitResult(True, round((time.monotonic() - started) * 1000), condition, index,
+                                         elements)
+            except TimeoutException:
+                break
+            except JavascriptException as e:
+                # Anything else, e.g. an invalid selector, fails the same way on every retry
+                if not is_navigation_error(e):
+                    raise
+                logger.debug(f'Document changed while waiting for elements {locators}: {e}')
+                time.sleep(NAVIGATION_RETRY_DELAY)
+
+    return ElementWaitResult(False, round((time.monotonic() - started) * 1000), '', -1, [])
+
+
+def resolve_elements(driver, locators: list[tuple[str, str]], condition: str = 'visible') -> list[tuple]:
+    """
+    Resolve several locators in one WebDriver round trip without waiting.
+
+    Args:
+        driver: WebDriver instance
+        locators: List of (By, value) locator pairs
+        condition: One of `present`, `visible` or `clickable`
+
+    Returns:
+        list[tuple]: (element, reason) per locator; element is None and reason explains why when it is unusable
+    """
+    if condition not in ELEMENT_CONDITIONS:
+        raise ValueError(f'Unknown element condition {condition}')
+
+    return [tuple(item) for item in
+            driver.execute_script(ELEMENTS_RESOLVE_SCRIPT, [list(locator) for locator in locators], condition)]
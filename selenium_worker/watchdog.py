@@ -0,0 +1,263 @@
+import json
+import logging
+import threading
+import time
+import urllib.request
+from dataclasses import dataclass
+from typing import Optional
+
+import psutil
+import websocket
+
+from selenium_worker import config as cfg
+from selenium_worker.exceptions import BrowserHungException
+
+logger = logging.getLogger(__name__)
+
+# Total worker seconds reclaimed by the watchdogs of all workers
+RECLAIMED_KEY = 'watchdog.reclaimed_seconds'
+
+# Escalation steps of an abort, one per poll while the command stays stuck
+TERMINATE_SCRIPT = 1
+KILL_BROWSER = 2
+KILL_DRIVER = 3
+
+
+@dataclass
+class InFlightCommand:
+    name: str
+    started: float
+    deadline: float
+    abort_step: int = 0
+
+
+class BrowserWatchdog:
+    """
+    Detects WebDriver commands that hang in a wedged browser and aborts them.
+
+    Every command sent to chromedriver of the attached driver is tracked with its deadline. A command that runs
+    longer than `probe_after` seconds makes the watchdog probe the browser over its DevTools endpoint, outside of
+    chromedriver: the browser has to list its targets on `/json/list` and the page has to evaluate an expression. A command
+    is aborted when it passes its deadline or the probe fails twice in a row. The abort first terminates the running
+    script of the page, then kills the browser and finally chromedriver, one step per poll, which makes the pending
+    command fail with `BrowserHungException` so that the recovery policy replaces the browser.
+    """
+
+    def __init__(self, interval: float = 5, probe_after: float = 10, command_timeout: float = 45,
+                 probe_timeout: float = 3):
+        self.interval = interval
+        self.probe_after = probe_after
+        self.command_timeout = command_timeout
+        self.probe_timeout = probe_timeout
+        self.aborts = 0
+        self.reclaimed_seconds = 0.0
+        self._driver = None
+        self._browser_pid: Optional[int] = None
+        self._job_uid = ''
+        self._job_started = 0.0
+        self._command: Optional[InFlightCommand] = None
+        self._aborted = False
+        self._probe_failures = 0
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def reclaimed_minutes(self) -> float:
+        return self.reclaimed_seconds / 60
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name='browser-watchdog', daemon=True)
+        self._thread.start()
+
+    def attach(self, driver, job_uid: str = '', browser_pid: Optional[int] = None) -> 'BrowserWatchdog':
+        """
+        Track the commands of a driver.
+
+        Args:
+            driver: WebDriver whose commands are tracked
+            job_uid: UID of the job the commands belong to
+            browser_pid: PID of a browser that is not a child of chromedriver, e.g. a detached one
+        """
+        executor = driver.command_executor
+        original_execute = executor.execute
+
+        def execute(command, params=None):
+            self._begin(command)
+            try:
+                return original_execute(command, params)
+            except BaseException as e:
+                if self._aborted:
+                    raise BrowserHungException(f'{command} was aborted by the watchdog: {e}') from e
+                raise
+            finally:
+                self._end()
+
+        execute.watchdog = self
+        executor.execute = execute
+        with self._lock:
+            self._driver = driver
+            self._browser_pid = browser_pid
+            if job_uid and job_uid != self._job_uid:
+                self._job_uid = job_uid
+                self._job_started = time.monotonic()
+        return self
+
+    def detach(self, finished: bool = True):
+        with self._lock:
+            driver = self._driver
+            self._driver = None
+            self._command = None
+            if finished:
+                self._job_uid = ''
+        if driver is None:
+            return
+        execute = driver.command_executor.__dict__.get('execute')
+        if execute is not None and getattr(execute, 'watchdog', None) is self:
+            del driver.command_executor.execute
+
+    def _begin(self, command: str):
+        now = time.monotonic()
+        with self._lock:
+            self._command = InFlightCommand(command, now, now + self.command_timeout)
+            self._aborted = False
+            self._probe_failures = 0
+
+    def _end(self):
+        with self._lock:
+            self._command = None
+
+    def debugger_address(self) -> Optional[str]:
+        try:
+            return self._driver.capabilities.get('goog:chromeOptions', {}).get('debuggerAddress')
+        except Exception:
+            return None
+
+    def probe(self, address: str) -> tuple[bool, Optional[str]]:
+        """
+        Probe the browser over its DevTools endpoint.
+
+        Returns:
+            tuple: Whether the browser and its page respond, and the DevTools WebSocket URL of the page
+        """
+        try:
+            with urllib.request.urlopen(f'http://{address}/json/list', timeout=self.probe_timeout) as response:
+                targets = json.loads(response.read())
+        except (OSError, ValueError):
+            return False, None
+
+        page_url = next((target.get('webSocketDebuggerUrl') for target in targets
+                         if target.get('type') == 'page' and target.get('webSocketDebuggerUrl')), None)
+        if page_url is None:
+            return True, None
+        try:
+            self._send_cdp(page_url, 'Runtime.evaluate', {'expression': '1', 'returnByValue': True}, wait=True)
+            return True, page_url
+        except Exception:
+            return False, page_url
+
+    def _send_cdp(self, page_url: str, method: str, params: Optional[dict] = None, wait: bool = False):
+        connection = websocket.create_connection(page_url, timeout=self.probe_timeout, suppress_origin=True)
+        try:
+            connection.send(json.dumps({'id': 1, 'method': method, 'params': params or {}}))
+            while wait:
+                if json.loads(connection.recv()).get('id') == 1:
+                    return
+        finally:
+            connection.close()
+
+    def _browser_processes(self, include_driver: bool) -> list[psutil.Process]:
+        processes = {}
+        service_pid = getattr(getattr(getattr(self._driver, 'service', None), 'process', None), 'pid', None)
+        # undetected-chromedriver starts the browser itself, not as a child of chromedriver
+        for pid in (service_pid, self._browser_pid, getattr(self._driver, 'browser_pid', None)):
+            if pid is None:
+                continue
+            try:
+                process = psutil.Process(pid)
+                for child in process.children(recursive=True):
+                    processes[child.pid] = child
+                if include_driver or pid != service_pid:
+                    processes[pid] = process
+            except psutil.Error:
+                continue
+        return list(processes.values())
+
+    def abort(self, command: InFlightCommand, page_url: Optional[str], reason: str):
+        """Take the next escalation step for a stuck command."""
+        with self._lock:
+            if self._command is not command:
+                # Returned in the meantime
+                return
+            command.abort_step += 1
+            self._aborted = True
+        if command.abort_step == 1:
+            self.aborts += 1
+            reclaimed = max(0.0, cfg.task_soft_time_limit - (time.monotonic() - self._job_started))
+            self.reclaimed_seconds += reclaimed
+            logger.error(f'Watchdog aborts {command.name} of job {self._job_uid} after '
+                         f'{time.monotonic() - command.started:.0f} s.: {reason}; reclaimed {reclaimed / 60:.1f} '
+                         f'worker-minutes, {self.reclaimed_minutes:.1f} in total')
+            try:
+                cfg.RedisSettings.rds().incrbyfloat(RECLAIMED_KEY, reclaimed)
+            except Exception as e:
+                logger.error(f'Failed to record reclaimed worker time: {e}')
+
+        if command.abort_step <= TERMINATE_SCRIPT and page_url is not None:
+            try:
+                self._send_cdp(page_url, 'Runtime.terminateExecution')
+                return
+            except Exception as e:
+                logger.warning(f'Failed to terminate the script of the page: {e}')
+                command.abort_step = TERMINATE_SCRIPT
+
+        for process in self._browser_processes(include_driver=command.abort_step >= KILL_DRIVER):
+            try:
+                process.kill()
+            except psutil.Error:
+                continue
+
+    def check(self):
+        """Check the command in flight; called on every poll of the watchdog thread."""
+        with self._lock:
+            command = self._command
+        if command is None or self._driver is None:
+            return
+
+        now = time.monotonic()
+        if command.abort_step > 0:
+            # Still stuck after the previous step
+            self.abort(command, None, 'command did not return after the previous abort step')
+            return
+        if now - command.started < self.probe_after:
+            return
+
+        address = self.debugger_address()
+        healthy, page_url = self.probe(address) if address else (True, None)
+        self._probe_failures = 0 if healthy else self._probe_failures + 1
+        if self._probe_failures >= 2:
+            self.abort(command, page_url, 'browser does not respond to DevTools probes')
+        elif now > command.deadline:
+            self.abort(command, page_url, f'command exceeded its {self.command_timeout:.0f} s. deadline')
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.check()
+            except Exception as e:
+                logger.error(f'Browser watchdog check failed: {e}')
+
+
+_watchdog: Optional[BrowserWatchdog] = None
+
+
+def get_watchdog() -> BrowserWatchdog:
+    """Return the process-wide browser watchdog, starting its thread on first use."""
+    global _watchdog
+    if _watchdog is None:
+        _watchdog = BrowserWatchdog(cfg.WatchdogSettings.INTERVAL, cfg.WatchdogSettings.PROBE_AFTER,
+                                    cfg.WatchdogSettings.COMMAND_TIMEOUT, cfg.WatchdogSettings.PROBE_TIMEOUT)
+        _watchdog.start()
+    return _watchdog
@@ -0,0 +1,10 @@
+import fakeredis
+import pytest
+
+
+@pytest.fixture
+def redis_client():
+    """In-memory Redis with Lua scripting, so no server is needed."""
+    client = fakeredis.FakeRedis()
+    yield client
+    client.flushall()
@@ -0,0 +1,94 @@
+import json
+
+import pytest
+
+from selenium_worker.Requests.ComplaintTaskRQ import ComplaintTaskRQ
+from selenium_worker.idempotency import DONE, RUNNING, JobClaims
+
+KEY = 'claim.complaint.1'
+
+
+@pytest.fixture
+def claims(redis_client):
+    return JobClaims(redis_client, lease=60, result_ttl=3600)
+
+
+def stored(redis_client) -> dict:
+    raw = redis_client.get(KEY)
+    return json.loads(raw) if raw else {}
+
+
+def test_key_prefers_the_complaint_uuid():
+    assert JobClaims.key(ComplaintTaskRQ({'Type': 'complaint', 'ComplaintUuid': 'u', 'Id': 1})) == 'claim.complaint.u'
+    assert JobClaims.key(ComplaintTaskRQ({'Type': 'complaint', 'Id': 1})) == KEY
+    assert JobClaims.key(ComplaintTaskRQ({'Type': 'complaint'})) is None
+
+
+def test_first_job_acquires_the_claim(claims, redis_client):
+    claim = claims.claim(KEY, 'job-1')
+
+    assert claim.acquired
+    assert stored(redis_client)['state'] == RUNNING
+    assert 0 < redis_client.ttl(KEY) <= 60
+
+
+def test_other_job_sees_the_running_claim(claims):
+    claims.claim(KEY, 'job-1')
+    claim = claims.claim(KEY, 'job-2')
+
+    assert not claim.acquired
+    assert (claim.state, claim.owner) == (RUNNING, 'job-1')
+    assert 0 < claim.ttl <= 60
+
+
+def test_redelivered_job_takes_its_claim_over(claims, redis_client):
+    claims.claim(KEY, 'job-1')
+    redis_client.expire(KEY, 5)
+
+    claim = claims.claim(KEY, 'job-1')
+    assert claim.acquired
+    # The lease is renewed
+    assert redis_client.ttl(KEY) > 5
+
+
+def test_completed_claim_returns_the_stored_response(claims, redis_client):
+    claims.complete(claims.claim(KEY, 'job-1'), '{"ok": true}')
+    assert stored(redis_client)['state'] == DONE
+    assert redis_client.ttl(KEY) > 60
+
+    for job_uid in ('job-1', 'job-2'):
+        claim = claims.claim(KEY, job_uid)
+        assert not claim.acquired
+        assert (claim.state, claim.owner, claim.response) == (DONE, 'job-1', '{"ok": true}')
+
+
+def test_released_claim_can_be_acquired_again(claims, redis_client):
+    claims.release(claims.claim(KEY, 'job-1'))
+
+    assert not redis_client.exists(KEY)
+    assert claims.claim(KEY, 'job-2').acquired
+
+
+def test_lost_claim_is_not_overwritten(claims, redis_client):
+    claim = claims.claim(KEY, 'job-1')
+    redis_client.delete(KEY)
+    claims.claim(KEY, 'job-2')
+
+    claims.complete(claim, '{}')
+    claims.release(claim)
+    assert stored(redis_client)['job'] == 'job-2'
+    assert stored(redis_client)['state'] == RUNNING
+
+
+def test_claims_that_were_not_acquired_are_left_alone(claims, redis_client):
+    claims.claim(KEY, 'job-1')
+
+    claims.complete(claims.claim(KEY, 'job-2'), '{}')
+    assert stored(redis_client)['state'] == RUNNING
+
+
+def test_unreadable_claim_is_replaced(claims, redis_client):
+    redis_client.set(KEY, 'not json')
+
+    assert claims.claim(KEY, 'job-1').acquired
+    assert stored(redis_client)['job'] == 'job-1'
@@ -0,0 +1,120 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from selenium_worker.jobmeta import STARTED_INDEX_KEY, JobMetaArchiver, JobMetaStore, decode_field, encode_field
+
+STARTED_AT = datetime(2026, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def store(redis_client):
+    return JobMetaStore(redis_client, ttl=3600)
+
+
+@pytest.mark.parametrize('name, value', [
+    ('started_at', STARTED_AT),
+    ('task_post_run', 'plain {not json}'),
+    ('timeline', {'origin': 1.5, 'offsets': [0, None, 12]}),
+    ('attempts', 3),
+    ('retry', True)
+])
+def test_codec_round_trip(name, value):
+    assert decode_field(name, encode_field(name, value).encode('utf-8')) == value
+
+
+def test_codec_keeps_values_it_cannot_decode():
+    assert decode_field('attempts', b'not json') == 'not json'
+    assert decode_field('started_at', b'yesterday') == 'yesterday'
+    assert decode_field('attempts', None) is None
+
+
+def test_update_writes_only_the_given_fields(store, redis_client):
+    store.update('a', {'started_at': STARTED_AT, 'state': 'running'})
+    store.update('a', {'state': 'done', 'attempts': 2})
+
+    assert store.load('a') == {'started_at': STARTED_AT, 'state': 'done', 'attempts': 2}
+    assert store.load('a', ['state', 'missing']) == {'state': 'done'}
+    assert 0 < redis_client.ttl(store.key('a')) <= 3600
+
+
+def test_update_with_none_removes_the_field(store):
+    store.update('a', {'state': 'running', 'error': 'x'})
+    store.update('a', {'error': None})
+
+    assert store.load('a') == {'state': 'running'}
+
+
+def test_increment(store):
+    assert store.increment('a', 'crashes') == 1
+    assert store.increment('a', 'crashes', 2) == 3
+    assert store.get('a', 'crashes') == 3
+
+
+def test_update_indexes_the_start_time(store, redis_client):
+    store.update('a', {'started_at': STARTED_AT})
+    store.update('b', {'started_at': STARTED_AT + timedelta(hours=1)})
+
+    assert redis_client.zscore(STARTED_INDEX_KEY, 'a') == STARTED_AT.timestamp()
+    assert list(store.query(STARTED_AT + timedelta(minutes=1))) == ['b']
+    assert list(store.query(STARTED_AT, STARTED_AT)) == ['a']
+
+
+def test_query_filters_by_processing_total(store):
+    store.update('a', {'started_at': STARTED_AT, 'processing_total': 100})
+    store.update('b', {'started_at': STARTED_AT, 'processing_total': 5000})
+
+    assert list(store.query(STARTED_AT, min_processing_total=1000, names=['started_at'])) == ['b']
+
+
+def test_load_many_yields_empty_dicts_for_missing_jobs(store):
+    store.update('a', {'state': 'done'})
+
+    assert store.load_many(['a', 'gone']) == [{'state': 'done'}, {}]
+
+
+def legacy(redis_client, uid: str, meta: dict, ttl: int = 0):
+    redis_client.set(JobMetaStore.key(uid), json.dumps(meta), ex=ttl or None)
+
+
+def test_legacy_metadata_is_converted_on_read(store, redis_client):
+    legacy(redis_client, 'a', {'started_at': STARTED_AT.isoformat(), 'state': 'done', 'error': None}, ttl=100)
+
+    assert store.load('a') == {'started_at': STARTED_AT, 'state': 'done'}
+    assert redis_client.type(store.key('a')) == b'hash'
+    # The remaining lifetime of the legacy key is kept
+    assert 0 < redis_client.ttl(store.key('a')) <= 100
+    assert redis_client.zscore(STARTED_INDEX_KEY, 'a') == STARTED_AT.timestamp()
+
+
+def test_legacy_metadata_is_converted_on_write(store, redis_client):
+    legacy(redis_client, 'a', {'state': 'running', 'attempts': 1})
+
+    store.update('a', {'state': 'done'})
+    assert store.increment('a', 'attempts') == 2
+    assert store.load('a') == {'state': 'done', 'attempts': 2}
+    assert redis_client.ttl(store.key('a')) > 0
+
+
+def test_legacy_metadata_through_get_and_load_of_names(store, redis_client):
+    legacy(redis_client, 'a', {'state': 'running', 'attempts': 1})
+    assert store.get('a', 'attempts') == 1
+
+    legacy(redis_client, 'b', {'state': 'running', 'attempts': 1})
+    assert store.load('b', ['state']) == {'state': 'running'}
+
+
+def test_unreadable_legacy_metadata_is_discarded(store, redis_client):
+    redis_client.set(store.key('a'), 'not json')
+
+    assert store.migrate('a') == {}
+    assert not redis_client.exists(store.key('a'))
+
+
+def test_trim_drops_expired_jobs_from_the_index(store, redis_client):
+    store.update('old', {'started_at': datetime.now(timezone.utc) - timedelta(hours=2)})
+    store.update('new', {'started_at': datetime.now(timezone.utc)})
+
+    assert JobMetaArchiver(store, '', 0).trim() == 1
+    assert [uid.decode('utf-8') for uid in redis_client.zrange(STARTED_INDEX_KEY, 0, -1)] == ['new']
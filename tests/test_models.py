@@ -0,0 +1,89 @@
+import json
+
+import pytest
+
+from selenium_worker.models import Field, Model, decode, encode
+
+
+class Parent(Model):
+    Name: str = Field('', required=True)
+    Count: int = Field(-1, required=True, missing=-1)
+    Optional: str = ''
+    Tags: list = Field(factory=list)
+
+
+class Child(Parent):
+    Count: int = 5
+    Extra: bool = False
+
+
+def test_defaults_are_used_for_missing_keys():
+    model = Parent({'Name': 'a'})
+
+    assert (model.Name, model.Count, model.Optional, model.Tags) == ('a', -1, '', [])
+    assert model.extras is None
+
+
+def test_factory_creates_a_default_per_instance():
+    first, second = Parent(), Parent()
+    first.Tags.append('x')
+
+    assert second.Tags == []
+    assert Parent({'Tags': ['y']}).Tags == ['y']
+
+
+def test_unknown_keys_are_kept_in_extras_and_serialized():
+    model = Parent({'Name': 'a', 'Unknown': 1})
+
+    assert model.extras == {'Unknown': 1}
+    assert model.to_dict()['Unknown'] == 1
+
+
+def test_fields_are_slotted():
+    with pytest.raises(AttributeError):
+        Parent().Undeclared = 1
+
+
+def test_validate_reports_missing_required_fields():
+    assert Parent().validate() == ['Missing `Name` value', 'Missing `Count` value']
+    # Only the declared missing value counts as missing
+    assert Parent({'Name': 'a', 'Count': 0}).validate() == []
+
+
+def test_subclass_inherits_fields_and_overrides_defaults():
+    model = Child({'Name': 'a'})
+
+    assert list(Child.__fields__) == ['Name', 'Count', 'Optional', 'Tags', 'Extra']
+    assert model.Count == 5
+    assert model.Extra is False
+    # The overridden default keeps the requirement of the base field
+    assert Child.__fields__['Count'].required
+    assert Child({'Name': 'a', 'Count': -1}).validate() == ['Missing `Count` value']
+    assert Parent().Count == -1
+
+
+def test_subclass_keeps_extras():
+    assert Child({'Name': 'a', 'Unknown': 1}).extras == {'Unknown': 1}
+
+
+def test_hand_written_methods_take_precedence():
+    class Custom(Model):
+        Name: str = ''
+
+        def validate(self):
+            return ['custom']
+
+    assert Custom().validate() == ['custom']
+
+
+def test_encode_and_decode_round_trip():
+    model = Child({'Name': 'a', 'Tags': ['x'], 'Unknown': 1})
+    decoded = decode(Child, encode(model))
+
+    assert decoded.to_dict() == model.to_dict()
+    assert json.loads(encode(model))['Extra'] is False
+
+
+def test_decode_of_empty_payloads():
+    assert decode(Parent, '').to_dict() == Parent().to_dict()
+    assert decode(Parent, None).Name == ''
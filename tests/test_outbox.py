@@ -0,0 +1,126 @@
+import json
+
+import pytest
+
+from selenium_worker import config as cfg
+from selenium_worker import outbox
+from selenium_worker.jobmeta import JobMetaStore
+from selenium_worker.outbox import (DEAD_STREAM, OUTBOX_STREAM, RETRY_KEY, SENDER_GROUP, CallbackSender,
+                                    enqueue_callback)
+
+
+class FakeResponse:
+    def __init__(self, status_code: int):
+        self.status_code = status_code
+        self.text = 'response'
+
+
+@pytest.fixture
+def store(redis_client, monkeypatch):
+    store = JobMetaStore(redis_client)
+    monkeypatch.setattr(outbox, 'get_job_store', lambda: store)
+    return store
+
+
+@pytest.fixture
+def statuses(monkeypatch):
+    """Status codes returned by the next callback posts, in order."""
+    statuses = []
+    monkeypatch.setattr(outbox, 'post_callback', lambda url, body, timeout=None: FakeResponse(statuses.pop(0)))
+    return statuses
+
+
+@pytest.fixture
+def sender(redis_client, store, monkeypatch):
+    monkeypatch.setattr(cfg.CallbackSettings, 'MAX_ATTEMPTS', 2)
+    monkeypatch.setattr(outbox, 'retry_delay', lambda attempts: 0)
+    sender = CallbackSender(redis_client, 'sender-1')
+    sender.ensure_group()
+    return sender
+
+
+def deliver_batch(sender: CallbackSender) -> int:
+    entries = sender.read_batch(block_ms=0)
+    for entry_id, fields in entries:
+        sender.deliver(entry_id, fields)
+    return len(entries)
+
+
+def test_delivered_callback_leaves_the_outbox(sender, redis_client, store, statuses):
+    enqueue_callback(redis_client, 'http://callback', {'ok': True}, 'job-1')
+    statuses.append(200)
+
+    assert deliver_batch(sender) == 1
+    assert redis_client.xlen(OUTBOX_STREAM) == 0
+    assert redis_client.xpending(OUTBOX_STREAM, SENDER_GROUP)['pending'] == 0
+    assert store.load('job-1', ['callback_attempts', 'callback_status']) == {'callback_attempts': 1,
+                                                                            'callback_status': 200}
+    assert store.get('job-1', 'callback_delivered_at') is not None
+
+
+def test_failed_callback_is_retried_and_then_dead_lettered(sender, redis_client, store, statuses):
+    enqueue_callback(redis_client, 'http://callback', {'ok': True}, 'job-1')
+    statuses.extend([500, 503])
+
+    assert deliver_batch(sender) == 1
+    assert redis_client.xlen(OUTBOX_STREAM) == 0
+    retry, = redis_client.zrange(RETRY_KEY, 0, -1)
+    assert json.loads(retry)['attempts'] == 1
+
+    sender.release_due_retries()
+    assert redis_client.zcard(RETRY_KEY) == 0
+    (entry_id, fields), = redis_client.xrange(OUTBOX_STREAM)
+    assert fields[b'attempts'] == b'1'
+    assert json.loads(fields[b'body']) == {'ok': True}
+
+    assert deliver_batch(sender) == 1
+    assert redis_client.xlen(OUTBOX_STREAM) == 0
+    assert redis_client.zcard(RETRY_KEY) == 0
+    (_, dead), = redis_client.xrange(DEAD_STREAM)
+    assert dead[b'attempts'] == b'2'
+    assert dead[b'error'].startswith(b'status 503')
+    assert store.load('job-1', ['callback_attempts', 'callback_status']) == {'callback_attempts': 2,
+                                                                            'callback_status': 503}
+    assert store.get('job-1', 'callback_delivered_at') is None
+
+
+def test_retries_are_not_released_before_they_are_due(sender, redis_client):
+    redis_client.zadd(RETRY_KEY, {json.dumps({'url': 'http://callback', 'attempts': 1}): 2 ** 40})
+
+    sender.release_due_retries()
+    assert redis_client.zcard(RETRY_KEY) == 1
+    assert redis_client.xlen(OUTBOX_STREAM) == 0
+
+
+def test_exception_counts_as_failed_attempt(sender, redis_client, monkeypatch):
+    def post_callback(url, body, timeout=None):
+        raise ConnectionError('refused')
+
+    monkeypatch.setattr(outbox, 'post_callback', post_callback)
+    enqueue_callback(redis_client, 'http://callback', {}, '')
+
+    assert deliver_batch(sender) == 1
+    retry, = redis_client.zrange(RETRY_KEY, 0, -1)
+    assert json.loads(retry)['error'] == 'refused'
+
+
+def test_pending_entries_of_a_dead_sender_are_taken_over(sender, redis_client, store, statuses, monkeypatch):
+    enqueue_callback(redis_client, 'http://callback', {}, 'job-1')
+    redis_client.xreadgroup(SENDER_GROUP, 'dead-sender', {OUTBOX_STREAM: '>'})
+    monkeypatch.setattr(outbox, 'CLAIM_IDLE_MS', 0)
+    statuses.append(200)
+
+    assert deliver_batch(sender) == 1
+    assert redis_client.xlen(OUTBOX_STREAM) == 0
+
+
+def test_idle_consumers_without_pending_entries_are_removed(sender, redis_client, monkeypatch):
+    enqueue_callback(redis_client, 'http://callback', {}, '')
+    redis_client.xreadgroup(SENDER_GROUP, 'busy-sender', {OUTBOX_STREAM: '>'})
+    redis_client.xreadgroup(SENDER_GROUP, 'idle-sender', {OUTBOX_STREAM: '>'})
+    redis_client.xreadgroup(SENDER_GROUP, sender.consumer, {OUTBOX_STREAM: '>'})
+    monkeypatch.setattr(outbox, 'CLAIM_IDLE_MS', -1)
+
+    sender.remove_idle_consumers()
+    names = {consumer['name'] for consumer in redis_client.xinfo_consumers(OUTBOX_STREAM, SENDER_GROUP)}
+    assert names == {b'busy-sender', sender.consumer.encode('utf-8')}
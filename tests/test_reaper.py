@@ -0,0 +1,28 @@
+import os
+import time
+
+from selenium_worker.reaper import UserDataReaper, claim_directory
+
+
+def write(path: str, size: int, age: float = 0):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as file:
+        file.write(b'x' * size)
+    if age:
+        then = time.time() - age
+        os.utime(path, (then, then))
+        os.utime(os.path.dirname(path), (then, then))
+
+
+def test_quota_deletes_orphans_but_not_live_profiles_or_shared_caches(tmp_path):
+    data_path, disk_path = str(tmp_path / 'data'), str(tmp_path / 'disk')
+    write(os.path.join(data_path, 'orphan', 'Preferences'), 1000, age=3600)
+    write(os.path.join(data_path, 'live', 'Preferences'), 1000, age=3600)
+    claim_directory(os.path.join(data_path, 'live'))
+    write(os.path.join(disk_path, 'Cache_Data', 'index'), 5000, age=3600)
+
+    UserDataReaper(data_path, [disk_path], quota_bytes=100).enforce_quota()
+
+    assert not os.path.exists(os.path.join(data_path, 'orphan'))
+    assert os.path.exists(os.path.join(data_path, 'live', 'Preferences'))
+    assert os.path.exists(os.path.join(disk_path, 'Cache_Data', 'index'))
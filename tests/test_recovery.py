@@ -0,0 +1,87 @@
+import pytest
+from requests.exceptions import ProxyError
+from selenium.common import TimeoutException, WebDriverException
+
+from selenium_worker import recovery
+from selenium_worker.exceptions import BrowserHungException
+from selenium_worker.recovery import RELAUNCH, RESTART, RETRY, SOFT_RESET, Escalation, RecoveryPolicy
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(recovery.time, 'monotonic', clock)
+    return clock
+
+
+def actions(policy: RecoveryPolicy, error: BaseException, count: int) -> list:
+    return [policy.escalate(error).action for _ in range(count)]
+
+
+@pytest.mark.parametrize('error, ladder', [
+    (BrowserHungException('hung'), [RELAUNCH, RESTART]),
+    (TimeoutException('timeout'), [RETRY, SOFT_RESET, RELAUNCH, RESTART]),
+    (ProxyError('proxy'), [RETRY, RELAUNCH, RESTART]),
+    (WebDriverException('session'), [SOFT_RESET, RELAUNCH, RESTART]),
+    (ValueError('other'), [RETRY, SOFT_RESET, RELAUNCH, RESTART]),
+    (KeyboardInterrupt(), [RESTART])
+])
+def test_failures_climb_their_ladder(clock, error, ladder):
+    # The last step is repeated once the ladder is exhausted
+    assert actions(RecoveryPolicy(), error, len(ladder) + 1) == ladder + [ladder[-1]]
+
+
+def test_ladders_are_climbed_per_exception_class(clock):
+    policy = RecoveryPolicy()
+
+    assert actions(policy, TimeoutException(), 2) == [RETRY, SOFT_RESET]
+    assert actions(policy, ProxyError(), 1) == [RETRY]
+    assert actions(policy, TimeoutException(), 1) == [RELAUNCH]
+
+
+def test_escalation_levels_and_history(clock):
+    policy = RecoveryPolicy()
+    first, second = policy.escalate(ValueError()), policy.escalate(ValueError())
+
+    assert (first.error, first.level, second.level) == ('ValueError', 0, 1)
+    assert policy.history == [first, second]
+
+
+def test_quiet_window_resets_the_ladders(clock):
+    policy = RecoveryPolicy(window=60)
+    assert actions(policy, TimeoutException(), 2) == [RETRY, SOFT_RESET]
+
+    clock.now += 30
+    assert actions(policy, TimeoutException(), 1) == [RELAUNCH]
+
+    # The window counts from the last failure
+    clock.now += 61
+    assert actions(policy, TimeoutException(), 1) == [RETRY]
+
+
+def test_reset_brings_ladders_back_to_their_first_step(clock):
+    policy = RecoveryPolicy()
+    actions(policy, TimeoutException(), 3)
+
+    policy.reset()
+    assert actions(policy, TimeoutException(), 1) == [RETRY]
+
+
+def test_custom_ladders_fall_back_to_restart(clock):
+    policy = RecoveryPolicy(ladders=[(TimeoutException, [RETRY])])
+
+    assert actions(policy, ValueError(), 1) == [RESTART]
+
+
+def test_escalation_list_round_trip():
+    escalation = Escalation('TimeoutException', SOFT_RESET, 1, 250, True)
+
+    assert Escalation.from_list(escalation.to_list()) == escalation
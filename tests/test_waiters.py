@@ -0,0 +1,62 @@
+from types import SimpleNamespace
+
+import pytest
+from selenium.common import JavascriptException
+
+from selenium_worker.waiters import wait_for_elements, wait_for_ready_state
+
+
+class FakeDriver:
+    """Driver whose async scripts raise the queued errors first and then return `result`."""
+
+    def __init__(self, errors: list, result):
+        self.errors = errors
+        self.result = result
+        self.calls = 0
+        self.timeouts = SimpleNamespace(script=30)
+
+    def set_script_timeout(self, timeout: float):
+        self.timeouts.script = timeout
+
+    def execute_async_script(self, script, *args):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return self.result
+
+
+NAVIGATION = JavascriptException('javascript error: document unloaded while waiting for result')
+INVALID_SELECTOR = JavascriptException("SyntaxError: '##x' is not a valid selector")
+
+
+def test_element_wait_is_repeated_after_a_navigation():
+    driver = FakeDriver([NAVIGATION], [0, ['element']])
+
+    result = wait_for_elements(driver, [('css selector', '#x')], timeout_in_ms=1000)
+    assert (result.ready, result.index, result.elements, driver.calls) == (True, 0, ['element'], 2)
+    assert driver.timeouts.script == 30
+
+
+def test_element_wait_fails_fast_on_script_errors():
+    driver = FakeDriver([INVALID_SELECTOR], [0, []])
+
+    with pytest.raises(JavascriptException):
+        wait_for_elements(driver, [('css selector', '##x')], timeout_in_ms=5000)
+    assert driver.calls == 1
+    assert driver.timeouts.script == 30
+
+
+def test_ready_state_wait_is_repeated_after_a_navigation():
+    driver = FakeDriver([NAVIGATION], 'complete')
+
+    result = wait_for_ready_state(driver, 'complete', 1000)
+    assert (result.ready, result.state, driver.calls) == (True, 'complete', 2)
+
+
+def test_ready_state_wait_fails_fast_on_script_errors():
+    driver = FakeDriver([JavascriptException('ReferenceError: order is not defined')], 'complete')
+
+    with pytest.raises(JavascriptException):
+        wait_for_ready_state(driver, 'complete', 5000)
+    assert driver.calls == 1
+    assert driver.timeouts.script == 30